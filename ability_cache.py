@@ -0,0 +1,95 @@
+"""
+Per-frame cache of available abilities.
+
+`get_available_abilities` is a round-trip to the game. Managers ask the cache to `refresh` the
+units they care about, the cache sends one batched query for all units that were not queried yet
+this frame, and every manager reads the shared result with `available`.
+
+Units that cannot have the ability back yet are not queried at all: after a warp-in the warpgate
+is put on a local cooldown timer, and units without enough energy for an energy ability (e.g.
+chrono boost) are skipped based on their observed energy.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sc2.ids.ability_id import AbilityId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+
+GAME_LOOPS_PER_SECOND = 22.4
+# Energy regeneration per game loop (0.7875 energy per second on faster)
+ENERGY_PER_LOOP = 0.7875 / GAME_LOOPS_PER_SECOND
+# Warpgate cooldown after warping in a unit, in game loops
+WARP_IN_COOLDOWN = {
+    UnitTypeId.ZEALOT: int(20 * GAME_LOOPS_PER_SECOND),
+    UnitTypeId.ADEPT: int(20 * GAME_LOOPS_PER_SECOND),
+    UnitTypeId.STALKER: int(23 * GAME_LOOPS_PER_SECOND),
+    UnitTypeId.SENTRY: int(23 * GAME_LOOPS_PER_SECOND),
+    UnitTypeId.HIGHTEMPLAR: int(32 * GAME_LOOPS_PER_SECOND),
+    UnitTypeId.DARKTEMPLAR: int(32 * GAME_LOOPS_PER_SECOND),
+}
+
+
+class AbilityCache:
+    def __init__(self, bot):
+        self.bot = bot
+        self.abilities: Dict[int, Set[AbilityId]] = {}
+        # Game loop in which the abilities of a unit were queried
+        self.queried_loop: Dict[int, int] = {}
+        # (unit tag, ability) -> game loop before which the ability cannot be available again
+        self.ready_at: Dict[Tuple[int, AbilityId], int] = {}
+
+        self.queries = 0
+        self.units_queried = 0
+        self.units_skipped = 0
+
+    async def refresh(self, units: Iterable[Unit], ability: Optional[AbilityId] = None, energy_cost: float = 0):
+        """Query the abilities of all given units in one request, skipping units that cannot have `ability` yet."""
+        game_loop = self.bot.state.game_loop
+        to_query: List[Unit] = []
+        for unit in units:
+            if self.queried_loop.get(unit.tag) == game_loop:
+                continue
+            if ability is not None and self.ready_at.get((unit.tag, ability), 0) > game_loop:
+                self.units_skipped += 1
+                continue
+            if energy_cost and unit.energy < energy_cost:
+                # Remember when the unit will have regenerated enough energy
+                if ability is not None:
+                    self.ready_at[(unit.tag, ability)] = game_loop + int((energy_cost - unit.energy) / ENERGY_PER_LOOP)
+                self.units_skipped += 1
+                continue
+            to_query.append(unit)
+
+        if not to_query:
+            return
+        results = await self.bot.get_available_abilities(to_query)
+        self.queries += 1
+        self.units_queried += len(to_query)
+        for unit, abilities in zip(to_query, results):
+            self.abilities[unit.tag] = set(abilities)
+            self.queried_loop[unit.tag] = game_loop
+
+    def available(self, unit: Unit, ability: AbilityId) -> bool:
+        """True if the ability was available when the unit was queried this frame."""
+        game_loop = self.bot.state.game_loop
+        if self.queried_loop.get(unit.tag) != game_loop:
+            return False
+        if self.ready_at.get((unit.tag, ability), 0) > game_loop:
+            return False
+        return ability in self.abilities.get(unit.tag, ())
+
+    def start_cooldown(self, unit_tag: int, ability: AbilityId, loops: int):
+        """The ability was used, do not query or offer it again for the given number of game loops."""
+        self.ready_at[(unit_tag, ability)] = self.bot.state.game_loop + loops
+        self.invalidate(unit_tag)
+
+    def invalidate(self, unit_tag: int):
+        """Drop the cached abilities of a unit, e.g. after it used one of them."""
+        self.abilities.pop(unit_tag, None)
+        self.queried_loop.pop(unit_tag, None)
+
+    def forget(self, unit_tag: int):
+        self.invalidate(unit_tag)
+        for key in [key for key in self.ready_at if key[0] == unit_tag]:
+            del self.ready_at[key]
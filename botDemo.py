@@ -4,6 +4,9 @@ from pysc2.lib import actions, features, units
 from absl import app
 import random
 
+from observation_view import ObservationView
+from screen_placement import BuildSpots
+
 ban = 0
 hatch = True
 harvest = False
@@ -19,6 +22,11 @@ class ZergAgent(base_agent.BaseAgent):
     self.attack_coordinates = None
     self.safe_coordinates = None
     self.expand = None
+    # views of the observation and feature_units grouped by unit type, rebuilt at the start of every step
+    self.view = None
+    self.unit_index = None
+    # build spot searches, a structure that fit nowhere is skipped for a few steps
+    self.build_spots = BuildSpots()
 
 
 
@@ -36,13 +44,6 @@ class ZergAgent(base_agent.BaseAgent):
 
     return False
 
-  def get_units_by_type(self, obs, unit_type):
-
-    """utility fuction to simply sintax of unit
-    selection by type"""
-    return [unit for unit in obs.observation.feature_units
-            if unit.unit_type == unit_type]
-
   def can_do(self, obs, action):
 
     """utility fuction to simply sintax of
@@ -51,8 +52,8 @@ class ZergAgent(base_agent.BaseAgent):
 
   # def my_attack(self, obs):
   #   #if enough zerglings,send attack
-  #   zerglings = self.get_units_by_type(obs, units.Zerg.Zergling)
-  #   if len(zerglings) >= 20:
+  #   zerglings = self.unit_index.count(units.Zerg.Zergling)
+  #   if zerglings >= 20:
   #       #send attack at attack locations
   #       if self.unit_type_is_selected(obs, units.Zerg.Zergling):
   #           if self.can_do(obs, actions.FUNCTIONS.Attack_minimap.id):
@@ -64,12 +65,9 @@ class ZergAgent(base_agent.BaseAgent):
 
   def my_attack(self, obs):
     #if enough zerglings,send attack
-    zerglings = self.get_units_by_type(obs, units.Zerg.Zergling)
-    mutalisk = self.get_units_by_type(obs, units.Zerg.Mutalisk)
-    corruptor = self.get_units_by_type(obs, units.Zerg.Corruptor)
-    hydras = self.get_units_by_type(obs, units.Zerg.Hydralisk)
-    lurker = self.get_units_by_type(obs, units.Zerg.Lurker)
-    if len(zerglings) >= 5 and len(lurker) >= 1 :
+    zerglings = self.unit_index.count(units.Zerg.Zergling)
+    lurker = self.unit_index.count(units.Zerg.Lurker)
+    if zerglings >= 5 and lurker >= 1 :
         #send attack at attack locations
         if self.unit_type_is_selected(obs, units.Zerg.Zergling) or self.unit_type_is_selected(obs, units.Zerg.Mutalisk) or self.unit_type_is_selected(obs, units.Zerg.Corruptor) or self.unit_type_is_selected(obs, units.Zerg.Hydralisk) or self.unit_type_is_selected(obs, units.Zerg.Lurker):
             if self.can_do(obs, actions.FUNCTIONS.Attack_minimap.id):
@@ -81,62 +79,57 @@ class ZergAgent(base_agent.BaseAgent):
 
   def my_spawning_pool(self, obs):
     #if there is no barraks (spawning pool) build one
-    spawning_pools = self.get_units_by_type(obs, units.Zerg.SpawningPool)
-    if len (spawning_pools) == 0 :
+    spawning_pools = self.unit_index.count(units.Zerg.SpawningPool)
+    if spawning_pools == 0 :
+        # no spot fitted a few steps ago, do not select another drone for it yet
+        if self.build_spots.waiting(units.Zerg.SpawningPool, self.steps):
+            return None
         # if drone is selected build spawning pool
         if self.unit_type_is_selected(obs, units.Zerg.Drone):
             if self.can_do(obs,actions.FUNCTIONS.Build_SpawningPool_screen.id):
-                x = random.randint(0,63)
-                y = random.randint(0,63)
-
-                return actions.FUNCTIONS.Build_SpawningPool_screen("now", (x,y))
+                # free spot for the whole footprint, closest to the hatchery
+                spot = self.build_spots.find(self.view, units.Zerg.SpawningPool, self.steps)
+                if spot is not None:
+                    return actions.FUNCTIONS.Build_SpawningPool_screen("now", spot)
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x, drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_extractor(self, obs):
     #if there is no barraks (spawning pool) build one
-    extractor = self.get_units_by_type(obs, units.Zerg.Extractor)
-    if len (extractor) < 2 :
+    extractor = self.unit_index.count(units.Zerg.Extractor)
+    if extractor < 2 :
         # if drone is selected build spawning pool
         if self.unit_type_is_selected(obs, units.Zerg.Drone):
             if self.can_do(obs,actions.FUNCTIONS.Build_Extractor_screen.id):
-                geysers = self.get_units_by_type(obs, units.Neutral.VespeneGeyser)
-                if len(geysers) > 0 :
-                    geyser = random.choice(geysers)
+                geyser = self.view.random_position(self.view.of_type(units.Neutral.VespeneGeyser))
+                if geyser is not None:
                     #VespeneGeyser
-                    return actions.FUNCTIONS.Build_Extractor_screen("now", (geyser.x,geyser.y))
+                    return actions.FUNCTIONS.Build_Extractor_screen("now", geyser)
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x,drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_harvest_gas(self,obs):
-        extractor = self.get_units_by_type(obs, units.Zerg.Extractor)
-        if len(extractor) > 0:
-            extractor = random.choice(extractor)
-            if extractor['assigned_harvesters'] < 3:
-                global harvest
-                if self.unit_type_is_selected(obs, units.Zerg.Drone) and harvest:
-                    if len(obs.observation.single_select) < 2 and len(obs.observation.multi_select) < 2 :
-                        if self.can_do(obs,actions.FUNCTIONS.Harvest_Gather_screen.id):
-                            harvest = False
-                            return actions.FUNCTIONS.Harvest_Gather_screen("now",(extractor.x, extractor.y))
-
-
-                drones = self.get_units_by_type(obs, units.Zerg.Drone)
-                if len(drones) > 0 :
-                    drone = random.choice(drones)
-                    if drone.x >= 0 and drone.y >= 0:
-                        harvest = True
-                        return actions.FUNCTIONS.select_point("select",(drone.x,drone.y))
+        # a random own extractor that still has room for harvesters
+        extractor = self.view.random_position(self.view.under_harvesters(units.Zerg.Extractor, 3))
+        if extractor is not None:
+            global harvest
+            if self.unit_type_is_selected(obs, units.Zerg.Drone) and harvest:
+                if len(obs.observation.single_select) < 2 and len(obs.observation.multi_select) < 2 :
+                    if self.can_do(obs,actions.FUNCTIONS.Harvest_Gather_screen.id):
+                        harvest = False
+                        return actions.FUNCTIONS.Harvest_Gather_screen("now", extractor)
+
+
+            drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+            if drone is not None:
+                harvest = True
+                return actions.FUNCTIONS.select_point("select", drone)
 
   def my_more_units(self, obs, type):
     #make units
@@ -169,11 +162,9 @@ class ZergAgent(base_agent.BaseAgent):
             if self.can_do(obs, actions.FUNCTIONS.Train_Hydralisk_quick.id):
                     return actions.FUNCTIONS.Train_Hydralisk_quick("now")
 
-    larvae = self.get_units_by_type(obs, units.Zerg.Larva)
-    if len(larvae) > 0 :
-        larva = random.choice(larvae)
-        if larva.x >= 0 and larva.y >= 0:
-            return actions.FUNCTIONS.select_point("select_all_type", (larva.x, larva.y))
+    larva = self.view.random_position(self.view.own(units.Zerg.Larva, on_screen=True))
+    if larva is not None:
+        return actions.FUNCTIONS.select_point("select_all_type", larva)
 
   def my_lurker(self, obs):
     #make units
@@ -181,11 +172,9 @@ class ZergAgent(base_agent.BaseAgent):
         if self.can_do(obs, actions.FUNCTIONS.Morph_Lurker_quick.id):
                 return actions.FUNCTIONS.Morph_Lurker_quick("now")
 
-    hyd = self.get_units_by_type(obs, units.Zerg.Hydralisk)
-    if len(hyd) > 0 :
-        hyd = random.choice(hyd)
-        if hyd.x >= 0 and hyd.y >= 0:
-            return actions.FUNCTIONS.select_point("select_all_type", (hyd.x, hyd.y))
+    hyd = self.view.random_position(self.view.own(units.Zerg.Hydralisk, on_screen=True))
+    if hyd is not None:
+        return actions.FUNCTIONS.select_point("select_all_type", hyd)
 
   def my_build_hatchery(self, obs):
     #if there is no barraks (spawning pool) build one
@@ -206,119 +195,107 @@ class ZergAgent(base_agent.BaseAgent):
                 return actions.FUNCTIONS.Build_Hatchery_screen("now", (32,32))
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x, drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_harvest_mineral(self,obs):
-      hatchery = self.get_units_by_type(obs, units.Zerg.Hatchery)
-      lair = self.get_units_by_type(obs, units.Zerg.Lair)
-      if len(hatchery) > 0 or len(lair) > 0:
-          bool = False
-          if len(hatchery) > 0:
-              hatchery = random.choice(hatchery)
-              if hatchery['assigned_harvesters'] < 7:
-                bool = True
-          elif len(lair) > 0:
-              lair = random.choice(lair)
-              if lair['assigned_harvesters'] < 7:
-                bool = True
-          if bool:
+      # only while one of the own hatcheries / lairs has fewer than 7 harvesters
+      if self.view.under_harvesters((units.Zerg.Hatchery, units.Zerg.Lair), 7).any():
                 global harvest
                 if self.unit_type_is_selected(obs, units.Zerg.Drone) and harvest:
                     if len(obs.observation.single_select) < 2 and len(obs.observation.multi_select) < 2 :
                         if self.can_do(obs,actions.FUNCTIONS.Harvest_Gather_screen.id):
-                            minerals = self.get_units_by_type(obs, units.Neutral.MineralField)
-                            if len(minerals) > 0 :
+                            mineral = self.view.random_position(self.view.of_type(units.Neutral.MineralField))
+                            if mineral is not None:
                                 #mineral
-                                mineral = random.choice(minerals)
                                 harvest = False
-                                return actions.FUNCTIONS.Harvest_Gather_screen("now", (mineral.x,mineral.y))
+                                return actions.FUNCTIONS.Harvest_Gather_screen("now", mineral)
 
                 # select some random drone for the next choice
-                drones = self.get_units_by_type(obs, units.Zerg.Drone)
-                if len(drones) > 0 :
-                    drone = random.choice(drones)
-                    if drone.x >= 0 and drone.y >= 0:
-                        harvest = True
-                        return actions.FUNCTIONS.select_point("select",(drone.x,drone.y))
+                drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+                if drone is not None:
+                    harvest = True
+                    return actions.FUNCTIONS.select_point("select", drone)
 
   def my_den(self, obs):
-    den = self.get_units_by_type(obs, units.Zerg.HydraliskDen)
-    if len(den) == 0 :
+    den = self.unit_index.count(units.Zerg.HydraliskDen)
+    if den == 0 :
+        # no spot fitted a few steps ago, do not select another drone for it yet
+        if self.build_spots.waiting(units.Zerg.HydraliskDen, self.steps):
+            return None
         if self.unit_type_is_selected(obs, units.Zerg.Drone):
             if self.can_do(obs,actions.FUNCTIONS.Build_HydraliskDen_screen.id):
-                x = random.randint(0,63)
-                y = random.randint(0,63)
-
-                return actions.FUNCTIONS.Build_HydraliskDen_screen("now", (x,y))
+                # free spot for the whole footprint, closest to the hatchery
+                spot = self.build_spots.find(self.view, units.Zerg.HydraliskDen, self.steps)
+                if spot is not None:
+                    return actions.FUNCTIONS.Build_HydraliskDen_screen("now", spot)
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x, drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_spire(self, obs):
-    spire = self.get_units_by_type(obs, units.Zerg.Spire)
-    if len(spire) == 0 :
+    spire = self.unit_index.count(units.Zerg.Spire)
+    if spire == 0 :
+        # no spot fitted a few steps ago, do not select another drone for it yet
+        if self.build_spots.waiting(units.Zerg.Spire, self.steps):
+            return None
         if self.unit_type_is_selected(obs, units.Zerg.Drone):
             if self.can_do(obs,actions.FUNCTIONS.Build_Spire_screen.id):
-                x = random.randint(0,63)
-                y = random.randint(0,63)
-
-                return actions.FUNCTIONS.Build_Spire_screen("now", (x,y))
+                # free spot for the whole footprint, closest to the hatchery
+                spot = self.build_spots.find(self.view, units.Zerg.Spire, self.steps)
+                if spot is not None:
+                    return actions.FUNCTIONS.Build_Spire_screen("now", spot)
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x, drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_lurkerd(self, obs):
-    lurkerd = self.get_units_by_type(obs, units.Zerg.LurkerDen)
-    if len(lurkerd) == 0 :
+    lurkerd = self.unit_index.count(units.Zerg.LurkerDen)
+    if lurkerd == 0 :
+        # no spot fitted a few steps ago, do not select another drone for it yet
+        if self.build_spots.waiting(units.Zerg.LurkerDen, self.steps):
+            return None
         if self.unit_type_is_selected(obs, units.Zerg.Drone):
             if self.can_do(obs,actions.FUNCTIONS.Build_LurkerDen_screen.id):
-                x = random.randint(0,63)
-                y = random.randint(0,63)
-
-                return actions.FUNCTIONS.Build_LurkerDen_screen("now", (x,y))
+                # free spot for the whole footprint, closest to the hatchery
+                spot = self.build_spots.find(self.view, units.Zerg.LurkerDen, self.steps)
+                if spot is not None:
+                    return actions.FUNCTIONS.Build_LurkerDen_screen("now", spot)
 
         # select some random drone for the next choice
-        drones = self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 0 :
-            drone = random.choice(drones)
-            if drone.x >= 0 and drone.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(drone.x, drone.y))
+        drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+        if drone is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", drone)
 
   def my_lairs(self, obs):
     #if there is no barraks (spawning pool) build one
-    lairs = self.get_units_by_type(obs, units.Zerg.Lair)
-    if len(lairs) == 0 :
+    lairs = self.unit_index.count(units.Zerg.Lair)
+    if lairs == 0 :
         # if drone is selected build spawning pool
         if self.unit_type_is_selected(obs, units.Zerg.Hatchery):
             if self.can_do(obs,actions.FUNCTIONS.Morph_Lair_quick.id):
                 return actions.FUNCTIONS.Morph_Lair_quick("now")
 
         # select some random drone for the next choice
-        hatchery = self.get_units_by_type(obs, units.Zerg.Hatchery)
-        if len(hatchery) > 0 :
-            hatchery = random.choice(hatchery)
-            if hatchery.x >= 0 and hatchery.y >= 0:
-                return actions.FUNCTIONS.select_point("select_all_type",(hatchery.x, hatchery.y))
+        hatchery = self.view.random_position(self.view.own(units.Zerg.Hatchery, on_screen=True))
+        if hatchery is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", hatchery)
 
   def step(self, obs):
     super(ZergAgent, self).step(obs)
+    # array views of the observation and its feature_units grouped by type, every helper below queries them
+    self.view = ObservationView(obs)
+    self.unit_index = self.view.index
 
 
     #select/guess the location of the enemies
     if obs.first():
-        player_y, player_x = (obs.observation.feature_minimap.player_relative == features.PlayerRelative.SELF).nonzero()
+        player_y, player_x = (self.view.minimap.player_relative == features.PlayerRelative.SELF).nonzero()
 
         xmean = player_x.mean()
         ymean = player_y.mean()
@@ -344,46 +321,46 @@ class ZergAgent(base_agent.BaseAgent):
     if attack:
         return attack
 
-    minerals = self.get_units_by_type(obs, units.Neutral.MineralField)
-    if len(minerals) < 4 and ban == 0:
+    minerals = self.unit_index.count(units.Neutral.MineralField)
+    if minerals < 4 and ban == 0:
         #make more zerglings
-        zerglings =  self.get_units_by_type(obs, units.Zerg.Zergling)
-        if len(zerglings) <= 5:
+        zerglings = self.unit_index.count(units.Zerg.Zergling)
+        if zerglings <= 5:
             make_units = self.my_more_units(obs,"zergling")
             if make_units:
                 return make_units
         #make more mutalisk
-        spire =  self.get_units_by_type(obs, units.Zerg.Spire)
-        if len(spire) > 0:
-            mutalisk =  self.get_units_by_type(obs, units.Zerg.Mutalisk)
-            if len(mutalisk) <= 1:
+        spire = self.unit_index.count(units.Zerg.Spire)
+        if spire > 0:
+            mutalisk = self.unit_index.count(units.Zerg.Mutalisk)
+            if mutalisk <= 1:
                 make_units = self.my_more_units(obs,"mutalisk")
                 if make_units:
                     return make_units
 
         #make more corruptor
-        spire =  self.get_units_by_type(obs, units.Zerg.Spire)
-        if len(spire) > 0:
-            corruptor =  self.get_units_by_type(obs, units.Zerg.Corruptor)
-            if len(corruptor) <= 1:
+        spire = self.unit_index.count(units.Zerg.Spire)
+        if spire > 0:
+            corruptor = self.unit_index.count(units.Zerg.Corruptor)
+            if corruptor <= 1:
                 make_units = self.my_more_units(obs,"corruptor")
                 if make_units:
                     return make_units
 
         #make more hydras
-        lair =  self.get_units_by_type(obs, units.Zerg.Lair)
-        if len(lair) > 0:
-            hydras =  self.get_units_by_type(obs, units.Zerg.Hydralisk)
-            if len(hydras) <= 1:
+        lair = self.unit_index.count(units.Zerg.Lair)
+        if lair > 0:
+            hydras = self.unit_index.count(units.Zerg.Hydralisk)
+            if hydras <= 1:
                 make_units = self.my_more_units(obs,"hydralisk")
                 if make_units:
                     return make_units
 
         #make more lurker
-        hyd =  self.get_units_by_type(obs, units.Zerg.Hydralisk)
-        if len(hyd) > 0:
-            lurker =  self.get_units_by_type(obs, units.Zerg.Lurker)
-            if len(lurker) <= 1:
+        hyd = self.unit_index.count(units.Zerg.Hydralisk)
+        if hyd > 0:
+            lurker = self.unit_index.count(units.Zerg.Lurker)
+            if lurker <= 1:
                 make_units = self.my_lurker(obs)
                 if make_units:
                     return make_units
@@ -392,11 +369,11 @@ class ZergAgent(base_agent.BaseAgent):
 
         return actions.FUNCTIONS.move_camera(self.expand)
 
-    hatchery = self.get_units_by_type(obs, units.Zerg.Hatchery)
-    lair = self.get_units_by_type(obs, units.Zerg.Lair)
+    hatchery = self.unit_index.count(units.Zerg.Hatchery)
+    lair = self.unit_index.count(units.Zerg.Lair)
 
     #build spawning pool
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         spawning_pool = self.my_spawning_pool(obs)
         if spawning_pool:
             return spawning_pool
@@ -408,15 +385,15 @@ class ZergAgent(base_agent.BaseAgent):
 
     #mine minerals
     if ban == 1:
-        drones =  self.get_units_by_type(obs, units.Zerg.Drone)
-        if len(drones) > 6:
+        drones = self.unit_index.count(units.Zerg.Drone)
+        if drones > 6:
             mine = self.my_harvest_mineral(obs)
             if mine:
                 return mine
 
     #make more drones
-    drones =  self.get_units_by_type(obs, units.Zerg.Drone)
-    size = len(drones)
+    drones = self.unit_index.count(units.Zerg.Drone)
+    size = drones
     # if ban == 1:
     #     size = size * 2 - 1
     if size <= 11:
@@ -425,18 +402,18 @@ class ZergAgent(base_agent.BaseAgent):
             return make_units
 
     #make more zerglings
-    zerglings =  self.get_units_by_type(obs, units.Zerg.Zergling)
-    if len(zerglings) <= 5:
+    zerglings = self.unit_index.count(units.Zerg.Zergling)
+    if zerglings <= 5:
         make_units = self.my_more_units(obs,"zergling")
         if make_units:
             return make_units
 
     global hatch
-    hatchery = self.get_units_by_type(obs, units.Zerg.Hatchery)
-    lair = self.get_units_by_type(obs, units.Zerg.Lair)
+    hatchery = self.unit_index.count(units.Zerg.Hatchery)
+    lair = self.unit_index.count(units.Zerg.Lair)
 
     #build extractor
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         if ban == 0:
             extractor = self.my_extractor(obs)
             if extractor:
@@ -447,21 +424,21 @@ class ZergAgent(base_agent.BaseAgent):
                 return extractor
 
     #harvest gas
-    lurks =  self.get_units_by_type(obs, units.Zerg.LurkerDen)
-    if len(lurks) < 1:
-        if len(hatchery) == 1 or len(lair) == 1:
+    lurks = self.unit_index.count(units.Zerg.LurkerDen)
+    if lurks < 1:
+        if hatchery == 1 or lair == 1:
             gas = self.my_harvest_gas(obs)
             if gas:
                 return gas
 
     #build Lair
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         lairs = self.my_lairs(obs)
         if lairs:
             return lairs
 
     #build Spire
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         if ban == 0:
             spire = self.my_spire(obs)
             if spire:
@@ -472,7 +449,7 @@ class ZergAgent(base_agent.BaseAgent):
                 return spire
 
     #build Den
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         if ban == 0:
             den = self.my_den(obs)
             if den:
@@ -483,7 +460,7 @@ class ZergAgent(base_agent.BaseAgent):
                 return den
 
     #build lurker den
-    if len(hatchery) == 1 or len(lair) == 1:
+    if hatchery == 1 or lair == 1:
         if ban == 0:
             lurkerd = self.my_lurkerd(obs)
             if lurkerd:
@@ -494,37 +471,37 @@ class ZergAgent(base_agent.BaseAgent):
                 return lurkerd
 
     #make more mutalisk
-    spire =  self.get_units_by_type(obs, units.Zerg.Spire)
-    if len(spire) > 0:
-        mutalisk =  self.get_units_by_type(obs, units.Zerg.Mutalisk)
-        if len(mutalisk) <= 1:
+    spire = self.unit_index.count(units.Zerg.Spire)
+    if spire > 0:
+        mutalisk = self.unit_index.count(units.Zerg.Mutalisk)
+        if mutalisk <= 1:
             make_units = self.my_more_units(obs,"mutalisk")
             if make_units:
                 return make_units
 
     #make more corruptor
-    spire =  self.get_units_by_type(obs, units.Zerg.Spire)
-    if len(spire) > 0:
-        corruptor =  self.get_units_by_type(obs, units.Zerg.Corruptor)
-        if len(corruptor) <= 1:
+    spire = self.unit_index.count(units.Zerg.Spire)
+    if spire > 0:
+        corruptor = self.unit_index.count(units.Zerg.Corruptor)
+        if corruptor <= 1:
             make_units = self.my_more_units(obs,"corruptor")
             if make_units:
                 return make_units
 
     #make more hydras
-    lair =  self.get_units_by_type(obs, units.Zerg.Lair)
-    if len(lair) > 0:
-        hydras =  self.get_units_by_type(obs, units.Zerg.Hydralisk)
-        if len(hydras) <= 1:
+    lair = self.unit_index.count(units.Zerg.Lair)
+    if lair > 0:
+        hydras = self.unit_index.count(units.Zerg.Hydralisk)
+        if hydras <= 1:
             make_units = self.my_more_units(obs,"hydralisk")
             if make_units:
                 return make_units
 
     #make more lurker
-    hyd =  self.get_units_by_type(obs, units.Zerg.Hydralisk)
-    if len(hyd) > 0:
-        lurker =  self.get_units_by_type(obs, units.Zerg.Lurker)
-        if len(lurker) <= 1:
+    hyd = self.unit_index.count(units.Zerg.Hydralisk)
+    if hyd > 0:
+        lurker = self.unit_index.count(units.Zerg.Lurker)
+        if lurker <= 1:
             make_units = self.my_lurker(obs)
             if make_units:
                 return make_units
@@ -533,8 +510,8 @@ class ZergAgent(base_agent.BaseAgent):
         ban = 1
         return actions.FUNCTIONS.move_camera(self.expand)
     elif ban == 1:
-        hatchery = self.get_units_by_type(obs, units.Zerg.Hatchery)
-        if len(hatchery) < 1:
+        hatchery = self.unit_index.count(units.Zerg.Hatchery)
+        if hatchery < 1:
             hatch = True
         ban = 2
 
@@ -0,0 +1,265 @@
+"""
+Declarative build orders.
+
+A build order is a JSON (or YAML, if PyYAML is installed) file in `build_orders/` listing what to
+build or research, in order:
+
+    {
+        "name": "zealot_charge",
+        "steps": [
+            {"build": "PYLON", "supply": 14},
+            {"build": "GATEWAY"},
+            {"build": "NEXUS", "count": 2},
+            {"research": "CHARGE"}
+        ]
+    }
+
+`count` is the total number of structures of that type wanted (default 1), `supply` the supply
+used before the step may start. Compiling checks the names and inserts the structures a step
+needs but the order forgot (a Cybernetics Core needs a Gateway, Charge needs a Twilight Council)
+from the tech tree below.
+
+The engine returns the first step that is neither started nor in flight. Structure counts are
+kept from the construction hooks of the bot instead of `self.structures(...)` queries. A step is
+only passed for good once its structures exist (or its research runs). While a worker carries the
+build order, or for a few game loops after it was issued until the order shows up, the step is in
+flight and the engine looks at the following ones. A build order that got lost (worker died, order
+replaced) is no longer in flight, and the engine goes back to its step.
+"""
+
+import json
+import os
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sc2.ids.ability_id import AbilityId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+from placement import UNPOWERED_BUILDINGS
+
+BUILD_ORDER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_orders")
+# A build or research order shows up on its unit a few game loops after it was issued
+ISSUE_GRACE = 16
+
+# Structure -> structures that have to be ready before it can be started (pylon power comes on top)
+TECH_REQUIREMENTS: Dict[UnitTypeId, Tuple[UnitTypeId, ...]] = {
+    UnitTypeId.GATEWAY: (UnitTypeId.NEXUS,),
+    UnitTypeId.FORGE: (UnitTypeId.NEXUS,),
+    UnitTypeId.CYBERNETICSCORE: (UnitTypeId.GATEWAY,),
+    UnitTypeId.PHOTONCANNON: (UnitTypeId.FORGE,),
+    UnitTypeId.SHIELDBATTERY: (UnitTypeId.CYBERNETICSCORE,),
+    UnitTypeId.TWILIGHTCOUNCIL: (UnitTypeId.CYBERNETICSCORE,),
+    UnitTypeId.STARGATE: (UnitTypeId.CYBERNETICSCORE,),
+    UnitTypeId.ROBOTICSFACILITY: (UnitTypeId.CYBERNETICSCORE,),
+    UnitTypeId.TEMPLARARCHIVE: (UnitTypeId.TWILIGHTCOUNCIL,),
+    UnitTypeId.DARKSHRINE: (UnitTypeId.TWILIGHTCOUNCIL,),
+    UnitTypeId.ROBOTICSBAY: (UnitTypeId.ROBOTICSFACILITY,),
+    UnitTypeId.FLEETBEACON: (UnitTypeId.STARGATE,),
+}
+# Upgrade -> structure researching it
+RESEARCHED_FROM: Dict[UpgradeId, UnitTypeId] = {
+    UpgradeId.WARPGATERESEARCH: UnitTypeId.CYBERNETICSCORE,
+    UpgradeId.CHARGE: UnitTypeId.TWILIGHTCOUNCIL,
+    UpgradeId.BLINKTECH: UnitTypeId.TWILIGHTCOUNCIL,
+    UpgradeId.ADEPTPIERCINGATTACK: UnitTypeId.TWILIGHTCOUNCIL,
+    UpgradeId.PROTOSSGROUNDWEAPONSLEVEL1: UnitTypeId.FORGE,
+    UpgradeId.PROTOSSGROUNDARMORSLEVEL1: UnitTypeId.FORGE,
+    UpgradeId.PROTOSSSHIELDSLEVEL1: UnitTypeId.FORGE,
+}
+# Structures that turn into another type keep counting as the original one
+TYPE_ALIASES = {UnitTypeId.WARPGATE: UnitTypeId.GATEWAY}
+BUILD_ABILITIES = {ability for ability in AbilityId if ability.name.startswith("PROTOSSBUILD_")}
+
+
+class BuildStep(NamedTuple):
+    target: Union[UnitTypeId, UpgradeId]
+    # Total number of structures of this type wanted, always 1 for research
+    count: int
+    # Supply used before the step may start
+    supply: int
+    # Structures that have to be ready
+    requires: Tuple[UnitTypeId, ...]
+
+    @property
+    def is_research(self) -> bool:
+        return isinstance(self.target, UpgradeId)
+
+    @property
+    def researched_from(self) -> Optional[UnitTypeId]:
+        return RESEARCHED_FROM.get(self.target) if self.is_research else None
+
+
+def load_build_order(path: str) -> List[dict]:
+    """The raw steps of a build order file, a bare name is looked up in build_orders/."""
+    if not os.path.splitext(path)[1]:
+        path = os.path.join(BUILD_ORDER_DIR, f"{path}.json")
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml  # optional, JSON needs nothing extra
+
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return data["steps"] if isinstance(data, dict) else data
+
+
+def requirements(structure: UnitTypeId) -> Tuple[UnitTypeId, ...]:
+    needed = TECH_REQUIREMENTS.get(structure, ())
+    if structure not in UNPOWERED_BUILDINGS:
+        needed = (UnitTypeId.PYLON,) + needed
+    return needed
+
+
+def compile_build_order(entries: List[dict], initial: Tuple[UnitTypeId, ...] = (UnitTypeId.NEXUS,)) -> List[BuildStep]:
+    """Turn the raw steps into BuildSteps, with the missing prerequisites inserted before the step needing them."""
+    steps: List[BuildStep] = []
+    provided = set(initial)
+
+    def add_structure(structure: UnitTypeId, count: int, supply: int):
+        for requirement in requirements(structure):
+            if requirement not in provided:
+                add_structure(requirement, 1, supply)
+        steps.append(BuildStep(structure, count, supply, requirements(structure)))
+        provided.add(structure)
+
+    for entry in entries:
+        supply = entry.get("supply", 0)
+        if "build" in entry:
+            try:
+                structure = UnitTypeId[entry["build"].upper()]
+            except KeyError:
+                raise ValueError(f"Unknown structure {entry['build']}") from None
+            add_structure(structure, entry.get("count", 1), supply)
+        elif "research" in entry:
+            try:
+                upgrade = UpgradeId[entry["research"].upper()]
+            except KeyError:
+                raise ValueError(f"Unknown upgrade {entry['research']}") from None
+            if upgrade not in RESEARCHED_FROM:
+                raise ValueError(f"No research structure known for {upgrade}")
+            if RESEARCHED_FROM[upgrade] not in provided:
+                add_structure(RESEARCHED_FROM[upgrade], 1, supply)
+            steps.append(BuildStep(upgrade, 1, supply, (RESEARCHED_FROM[upgrade],)))
+        else:
+            raise ValueError(f"Build order step without build or research: {entry}")
+    return steps
+
+
+def free_geyser(bot) -> Optional[Unit]:
+    """A vespene geyser next to a ready townhall without a gas building on it."""
+    for townhall in bot.townhalls.ready:
+        for geyser in bot.vespene_geyser.closer_than(10, townhall):
+            if not bot.gas_buildings.closer_than(1, geyser):
+                return geyser
+    return None
+
+
+class BuildOrder:
+    def __init__(self, steps: List[BuildStep]):
+        self.steps = steps
+        self.index = 0
+        # Structure tag -> type, all structures that were started, and the ready ones
+        self.structures: Dict[int, UnitTypeId] = {}
+        self.ready: Dict[int, UnitTypeId] = {}
+        self.started_count: Counter = Counter()
+        self.ready_count: Counter = Counter()
+        # Game loops of the build orders issued for a type that did not start a structure yet
+        self.issued_loops: Dict[UnitTypeId, List[int]] = {}
+        # Upgrade -> game loop its research was issued, until the order shows up on the structure
+        self.researching: Dict[UpgradeId, int] = {}
+        # Worker tag -> game loop of the last build order it was given
+        self.builder_loops: Dict[int, int] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "BuildOrder":
+        return cls(compile_build_order(load_build_order(path)))
+
+    @property
+    def done(self) -> bool:
+        return self.index >= len(self.steps)
+
+    # Structure bookkeeping, called from the bot hooks
+
+    def setup(self, structures: Units):
+        """Count the structures the game starts with."""
+        for structure in structures:
+            self.add_structure(structure)
+            if structure.is_ready:
+                self.complete_structure(structure)
+
+    def add_structure(self, unit: Unit):
+        structure = TYPE_ALIASES.get(unit.type_id, unit.type_id)
+        if unit.tag in self.structures:
+            return
+        self.structures[unit.tag] = structure
+        self.started_count[structure] += 1
+        issued = self.issued_loops.get(structure)
+        if issued:
+            issued.pop(0)
+
+    def complete_structure(self, unit: Unit):
+        if unit.tag not in self.structures:
+            self.add_structure(unit)
+        if unit.tag not in self.ready:
+            self.ready[unit.tag] = self.structures[unit.tag]
+            self.ready_count[self.structures[unit.tag]] += 1
+
+    def remove_structure(self, tag: int):
+        structure = self.structures.pop(tag, None)
+        if structure is None:
+            return
+        self.started_count[structure] -= 1
+        if self.ready.pop(tag, None) is not None:
+            self.ready_count[structure] -= 1
+
+    # Evaluation
+
+    def issued(self, step: BuildStep, game_loop: int, worker_tag: Optional[int] = None):
+        """The bot sent a worker (or a research order) for this step."""
+        if step.is_research:
+            self.researching[step.target] = game_loop
+        else:
+            self.issued_loops.setdefault(step.target, []).append(game_loop)
+            if worker_tag is not None:
+                self.builder_loops[worker_tag] = game_loop
+
+    def builder_busy(self, worker: Unit, game_loop: int) -> bool:
+        """The worker holds a build order, or got one too recently for it to show. A new build would replace it."""
+        if any(order.ability.id in BUILD_ABILITIES for order in worker.orders):
+            return True
+        issued = self.builder_loops.get(worker.tag)
+        return issued is not None and game_loop - issued <= ISSUE_GRACE
+
+    def next_step(self, bot) -> Optional[BuildStep]:
+        """The first step neither started nor in flight, None while it waits for supply or tech."""
+        while not self.done and self._started(self.steps[self.index], bot):
+            self.index += 1
+        for step in self.steps[self.index:]:
+            if self._started(step, bot) or self._in_flight(step, bot):
+                continue
+            if bot.supply_used < step.supply:
+                return None
+            if any(self.ready_count[requirement] <= 0 for requirement in step.requires):
+                return None
+            return step
+        return None
+
+    def _started(self, step: BuildStep, bot) -> bool:
+        if step.is_research:
+            return bot.already_pending_upgrade(step.target) > 0
+        return self.started_count[step.target] >= step.count
+
+    def _in_flight(self, step: BuildStep, bot) -> bool:
+        game_loop = bot.state.game_loop
+        if step.is_research:
+            issued = self.researching.get(step.target)
+            return issued is not None and game_loop - issued <= ISSUE_GRACE
+        issued = self.issued_loops.get(step.target, [])
+        while issued and game_loop - issued[0] > ISSUE_GRACE:
+            issued.pop(0)
+        # Orders visible on the workers, or issued too recently to be visible
+        en_route = max(int(bot.worker_en_route_to_build(step.target)), len(issued))
+        return self.started_count[step.target] + en_route >= step.count
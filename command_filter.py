@@ -0,0 +1,135 @@
+"""
+Filter between the bots and `BotAI.do` that drops unit orders which would change nothing.
+
+The mining managers re-issue gather / move / return orders whenever a cheap check fails, and some
+managers are called several times per frame. An order is dropped when
+- the unit is already executing it (same ability and target as its current order, or as the last
+  queued order for queued commands),
+- the same order was already sent to that unit this frame, or during the last few game loops
+  before the observation could reflect it,
+- it is a stop for a unit that has no orders.
+
+Only orders that describe what a unit is doing are filtered. Production, research, build and
+ability orders always go through, since repeating them is meaningful (e.g. queueing a second probe).
+"""
+
+from typing import Dict, Tuple, Union
+
+from sc2.ids.ability_id import AbilityId
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.unit_command import UnitCommand
+
+# Orders that can safely be compared with the order the unit is already executing
+FILTERED_ABILITIES = {
+    AbilityId.MOVE,
+    AbilityId.MOVE_MOVE,
+    AbilityId.ATTACK,
+    AbilityId.ATTACK_ATTACK,
+    AbilityId.SMART,
+    AbilityId.HOLDPOSITION,
+    AbilityId.STOP,
+    AbilityId.STOP_STOP,
+    AbilityId.HARVEST_GATHER,
+    AbilityId.HARVEST_GATHER_PROBE,
+    AbilityId.HARVEST_RETURN,
+    AbilityId.HARVEST_RETURN_PROBE,
+}
+STOP_ABILITIES = {AbilityId.STOP, AbilityId.STOP_STOP}
+
+Target = Union[int, Point2, None]
+
+
+class CommandFilter:
+    def __init__(self, memory_loops: int = 2, point_tolerance: float = 0.1):
+        # How many game loops an order we sent is remembered while the observation catches up
+        self.memory_loops = memory_loops
+        self.point_tolerance = point_tolerance
+        # Last order sent per unit tag: (ability, target, queue, game loop)
+        self.last_orders: Dict[int, Tuple[AbilityId, Target, bool, int]] = {}
+
+        self.game_loop = -1
+        self.sent = 0
+        self.suppressed = 0
+        # Counts of the last finished frame, and of the whole game
+        self.last_frame_sent = 0
+        self.last_frame_suppressed = 0
+        self.total_sent = 0
+        self.total_suppressed = 0
+
+    def allow(self, action: UnitCommand, game_loop: int) -> bool:
+        """Return False if the order is redundant and should not be sent."""
+        if game_loop != self.game_loop:
+            self._next_frame(game_loop)
+        if not isinstance(action, UnitCommand):
+            return True
+
+        if action.ability in FILTERED_ABILITIES and self._is_redundant(action, game_loop):
+            self.suppressed += 1
+            self.total_suppressed += 1
+            return False
+
+        self.last_orders[action.unit.tag] = (action.ability, self._target(action.target), action.queue, game_loop)
+        self.sent += 1
+        self.total_sent += 1
+        return True
+
+    def forget(self, unit_tag: int):
+        self.last_orders.pop(unit_tag, None)
+
+    def summary(self) -> str:
+        return (
+            f"Commands last frame: {self.last_frame_sent} sent, {self.last_frame_suppressed} suppressed. "
+            f"Total: {self.total_sent} sent, {self.total_suppressed} suppressed"
+        )
+
+    def _next_frame(self, game_loop: int):
+        self.last_frame_sent, self.last_frame_suppressed = self.sent, self.suppressed
+        self.sent = self.suppressed = 0
+        self.game_loop = game_loop
+
+    def _is_redundant(self, action: UnitCommand, game_loop: int) -> bool:
+        unit: Unit = action.unit
+        target = self._target(action.target)
+        orders = unit.orders
+
+        if action.ability in STOP_ABILITIES:
+            return not orders
+
+        last = self.last_orders.get(unit.tag)
+        if (
+            last is not None
+            and game_loop - last[3] <= self.memory_loops
+            and last[2] == action.queue
+            and self._same_order(last[0], last[1], action.ability, target)
+        ):
+            return True
+
+        if not orders:
+            return False
+        # A non-queued order replaces the current order, a queued one is appended after the last order
+        order = orders[-1] if action.queue else orders[0]
+        if not action.queue and len(orders) > 1:
+            # Re-issuing the current order would also drop everything queued after it
+            return False
+        return self._same_order(order.ability.id, order.target, action.ability, target) or self._same_order(
+            order.ability.exact_id, order.target, action.ability, target
+        )
+
+    def _same_order(self, ability_a: AbilityId, target_a: Target, ability_b: AbilityId, target_b: Target) -> bool:
+        if ability_a != ability_b:
+            return False
+        # Orders without an explicit target (e.g. return cargo) get their target filled in by the game
+        if target_b is None:
+            return True
+        if isinstance(target_a, Point2) and isinstance(target_b, Point2):
+            return target_a.distance_to_point2(target_b) <= self.point_tolerance
+        return target_a == target_b
+
+    @staticmethod
+    def _target(target: Union[Unit, Point2, None]) -> Target:
+        if isinstance(target, Unit):
+            return target.tag
+        if target is not None:
+            return Point2(target[:2])
+        return None
@@ -0,0 +1,859 @@
+"""
+Offline stand-in for a StarCraft II game.
+
+`FakeGame` keeps a small synthetic world (a flat map with two main bases and two expansions, mineral
+lines, geysers, workers, structures and some enemies) and turns it into the same protobuf messages
+the real client sends. `FakeClient` answers the requests BotAI makes (actions, available
+abilities, placement and pathing queries, chat). `run_fake_game` drives any BotAI subclass through
+the same calls as `sc2.main._play_game_ai`, frame by frame, and captures every action it emits.
+
+The world has simple kinematics: units move in straight lines, probes gather and return minerals
+and gas, structures train, research, get built and warped in. There is no combat.
+
+    python fake_game.py ZealotChargeBot --loops 6720
+"""
+
+import argparse
+import asyncio
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import numpy as np
+from loguru import logger
+from s2clientprotocol import common_pb2 as common_pb
+from s2clientprotocol import data_pb2 as data_pb
+from s2clientprotocol import raw_pb2 as raw_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.data import ActionResult
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.ids.ability_id import AbilityId
+from sc2.ids.buff_id import BuffId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.unit_command import UnitCommand
+
+from manager_profiler import LatencyHistogram
+
+GAME_LOOPS_PER_SECOND = 22.4
+SELF = 1
+NEUTRAL = 3
+ENEMY = 4
+PLAYER_ID = 1
+ENEMY_PLAYER_ID = 2
+NEUTRAL_PLAYER_ID = 16
+
+MINING_LOOPS = 64
+GAS_LOOPS = 45
+MINERALS_PER_TRIP = 5
+VESPENE_PER_TRIP = 4
+WARP_IN_LOOPS = 112
+CHRONO_LOOPS = int(20 * GAME_LOOPS_PER_SECOND)
+CHRONO_SPEEDUP = 1.5
+ENERGY_PER_LOOP = 0.7875 / GAME_LOOPS_PER_SECOND
+# Extra distance at which a worker reaches a mineral patch / townhall / building spot
+REACH = 0.3
+
+
+class UnitSpec(NamedTuple):
+    minerals: int
+    vespene: int
+    food_required: float
+    food_provided: float
+    ability: AbilityId
+    build_time: int
+    # Movement speed on normal speed, BotAI scales it by 1.4
+    speed: float
+    radius: float
+    health: float
+    shield: float
+    energy: float
+    structure: bool
+
+
+# The unit types the synthetic world can contain
+UNIT_SPECS: Dict[UnitTypeId, UnitSpec] = {
+    UnitTypeId.PROBE: UnitSpec(50, 0, 1, 0, AbilityId.NEXUSTRAIN_PROBE, 272, 2.8125, 0.375, 20, 20, 0, False),
+    UnitTypeId.ZEALOT: UnitSpec(100, 0, 2, 0, AbilityId.GATEWAYTRAIN_ZEALOT, 608, 2.25, 0.5, 100, 50, 0, False),
+    UnitTypeId.NEXUS: UnitSpec(400, 0, 0, 15, AbilityId.PROTOSSBUILD_NEXUS, 1592, 0, 2.75, 1000, 1000, 50, True),
+    UnitTypeId.PYLON: UnitSpec(100, 0, 0, 8, AbilityId.PROTOSSBUILD_PYLON, 400, 0, 1.125, 200, 200, 0, True),
+    UnitTypeId.ASSIMILATOR: UnitSpec(75, 0, 0, 0, AbilityId.PROTOSSBUILD_ASSIMILATOR, 480, 0, 1.8125, 300, 300, 0, True),
+    UnitTypeId.GATEWAY: UnitSpec(150, 0, 0, 0, AbilityId.PROTOSSBUILD_GATEWAY, 1040, 0, 1.8125, 500, 500, 0, True),
+    UnitTypeId.WARPGATE: UnitSpec(150, 0, 0, 0, AbilityId.MORPH_WARPGATE, 160, 0, 1.8125, 500, 500, 0, True),
+    UnitTypeId.FORGE: UnitSpec(150, 0, 0, 0, AbilityId.PROTOSSBUILD_FORGE, 720, 0, 1.8125, 400, 400, 0, True),
+    UnitTypeId.CYBERNETICSCORE: UnitSpec(150, 0, 0, 0, AbilityId.PROTOSSBUILD_CYBERNETICSCORE, 800, 0, 1.8125, 550, 550, 0, True),
+    UnitTypeId.TWILIGHTCOUNCIL: UnitSpec(150, 100, 0, 0, AbilityId.PROTOSSBUILD_TWILIGHTCOUNCIL, 800, 0, 1.8125, 500, 500, 0, True),
+    UnitTypeId.MINERALFIELD: UnitSpec(0, 0, 0, 0, AbilityId.NULL_NULL, 0, 0, 1.125, 10000, 0, 0, True),
+    UnitTypeId.VESPENEGEYSER: UnitSpec(0, 0, 0, 0, AbilityId.NULL_NULL, 0, 0, 1.8125, 10000, 0, 0, True),
+    UnitTypeId.SCV: UnitSpec(50, 0, 1, 0, AbilityId.COMMANDCENTERTRAIN_SCV, 272, 2.8125, 0.375, 45, 0, 0, False),
+    UnitTypeId.MARINE: UnitSpec(50, 0, 1, 0, AbilityId.BARRACKSTRAIN_MARINE, 400, 2.25, 0.375, 45, 0, 0, False),
+    UnitTypeId.COMMANDCENTER: UnitSpec(400, 0, 0, 15, AbilityId.TERRANBUILD_COMMANDCENTER, 1590, 0, 2.75, 1500, 0, 0, True),
+}
+# Research ability -> upgrade, cost and research time
+UPGRADE_SPECS: Dict[AbilityId, Tuple[UpgradeId, int, int, int]] = {
+    AbilityId.RESEARCH_WARPGATE: (UpgradeId.WARPGATERESEARCH, 50, 50, 2240),
+    AbilityId.RESEARCH_CHARGE: (UpgradeId.CHARGE, 100, 100, 2240),
+}
+# Specific abilities reported by the game, and the general ability they remap to
+ABILITY_REMAPS = {
+    AbilityId.HARVEST_GATHER_PROBE: AbilityId.HARVEST_GATHER,
+    AbilityId.HARVEST_RETURN_PROBE: AbilityId.HARVEST_RETURN,
+    AbilityId.HARVEST_GATHER_SCV: AbilityId.HARVEST_GATHER,
+    AbilityId.HARVEST_RETURN_SCV: AbilityId.HARVEST_RETURN,
+    AbilityId.MOVE_MOVE: AbilityId.MOVE,
+    AbilityId.ATTACK_ATTACK: AbilityId.ATTACK,
+    AbilityId.STOP_STOP: AbilityId.STOP,
+    AbilityId.HOLDPOSITION_HOLD: AbilityId.HOLDPOSITION,
+}
+# Target types of AbilityData, as the game reports them
+TARGET_NONE, TARGET_POINT, TARGET_UNIT, TARGET_POINT_OR_UNIT, TARGET_POINT_OR_NONE = (
+    data_pb.AbilityData.Target.Value(name) for name in ("None", "Point", "Unit", "PointOrUnit", "PointOrNone")
+)
+# Abilities whose target the name rules of ability_target get wrong
+ABILITY_TARGETS = {
+    AbilityId.PROTOSSBUILD_ASSIMILATOR: TARGET_UNIT,
+    AbilityId.TERRANBUILD_REFINERY: TARGET_UNIT,
+    AbilityId.ZERGBUILD_EXTRACTOR: TARGET_UNIT,
+    AbilityId.EFFECT_CHRONOBOOSTENERGYCOST: TARGET_UNIT,
+    AbilityId.EFFECT_CHRONOBOOST: TARGET_UNIT,
+    AbilityId.BUILD_INTERCEPTORS: TARGET_NONE,
+    AbilityId.BUILD_NUKE: TARGET_NONE,
+}
+# Name prefixes of the abilities without a target, e.g. NEXUSTRAIN_PROBE and MORPH_WARPGATE
+NO_TARGET_PREFIXES = (
+    "STOP", "HOLDPOSITION", "HARVEST_RETURN", "RESEARCH_", "MORPH_", "UPGRADETO", "HALT", "BURROW", "LIFT",
+)
+GATHER_ABILITIES = {AbilityId.HARVEST_GATHER, AbilityId.HARVEST_GATHER_PROBE}
+RETURN_ABILITIES = {AbilityId.HARVEST_RETURN, AbilityId.HARVEST_RETURN_PROBE}
+MOVE_ABILITIES = {AbilityId.MOVE, AbilityId.MOVE_MOVE, AbilityId.ATTACK, AbilityId.ATTACK_ATTACK}
+STOP_ABILITIES = {AbilityId.STOP, AbilityId.STOP_STOP, AbilityId.HOLDPOSITION, AbilityId.HOLDPOSITION_HOLD}
+TRAIN_ABILITIES = {spec.ability: unit_type for unit_type, spec in UNIT_SPECS.items() if not spec.structure}
+BUILD_ABILITIES = {
+    spec.ability: unit_type
+    for unit_type, spec in UNIT_SPECS.items()
+    if spec.structure and spec.build_time and unit_type != UnitTypeId.WARPGATE
+}
+WARP_IN_ABILITIES = {AbilityId.WARPGATETRAIN_ZEALOT: UnitTypeId.ZEALOT}
+TOWNHALLS = {UnitTypeId.NEXUS, UnitTypeId.COMMANDCENTER}
+# Structures that can be placed without pylon power
+UNPOWERED = {UnitTypeId.NEXUS, UnitTypeId.PYLON, UnitTypeId.ASSIMILATOR}
+PYLON_POWER_RADIUS = 6.5
+
+
+class CapturedAction(NamedTuple):
+    game_loop: int
+    ability: int
+    unit_tags: Tuple[int, ...]
+    # Unit tag, (x, y) or None
+    target: Union[int, Tuple[float, float], None]
+    queue: bool
+
+
+class FakeOrder:
+    def __init__(self, ability: AbilityId, target_tag: int = 0, target_pos: Optional[Point2] = None):
+        self.ability = ability
+        self.target_tag = target_tag
+        self.target_pos = target_pos
+        # Game loops of work done for production, research and mining
+        self.progress = 0.0
+
+
+class FakeUnit:
+    def __init__(self, tag: int, unit_type: UnitTypeId, alliance: int, position: Point2, build_progress: float = 1.0):
+        spec = UNIT_SPECS[unit_type]
+        self.tag = tag
+        self.unit_type = unit_type
+        self.alliance = alliance
+        self.position = position
+        self.build_progress = build_progress
+        self.health = spec.health
+        self.shield = spec.shield
+        self.energy = spec.energy
+        self.orders: List[FakeOrder] = []
+        self.mineral_contents = 0
+        self.vespene_contents = 0
+        # Resource the worker carries: None, "minerals" or "vespene", with the amount
+        self.carrying: Optional[str] = None
+        self.carry_amount = 0
+        # Mineral patch / assimilator the worker goes back to after returning cargo
+        self.resource_tag = 0
+        self.chrono_until = 0
+        self.warp_ready_loop = 0
+
+    @property
+    def spec(self) -> UnitSpec:
+        return UNIT_SPECS[self.unit_type]
+
+    @property
+    def is_ready(self) -> bool:
+        return self.build_progress >= 1
+
+
+class FakeGame:
+    def __init__(
+        self,
+        workers: int = 12,
+        enemy_workers: int = 12,
+        enemy_army: int = 0,
+        map_size: Tuple[int, int] = (96, 96),
+        minerals: int = 50,
+    ):
+        self.map_width, self.map_height = map_size
+        self.game_loop = 0
+        self.minerals = minerals
+        self.vespene = 0
+        self.upgrades: Set[UpgradeId] = set()
+        self.units: Dict[int, FakeUnit] = {}
+        self.dead_units: List[int] = []
+        self.actions: List[CapturedAction] = []
+        self.action_errors = 0
+        self.minerals_collected = 0
+        self.vespene_collected = 0
+        self._next_tag = 0x100000001
+
+        self.start_location = Point2((24.5, 24.5))
+        self.enemy_start_location = Point2((self.map_width - 24.5, self.map_height - 24.5))
+        self.add_base(self.start_location, towards=-1)
+        self.add_base(self.enemy_start_location, towards=1)
+        self.add_base(Point2((24.5, self.map_height - 24.5)), towards=-1)
+        self.add_base(Point2((self.map_width - 24.5, 24.5)), towards=1)
+
+        self.add_unit(UnitTypeId.NEXUS, SELF, self.start_location)
+        for index in range(workers):
+            self.add_unit(UnitTypeId.PROBE, SELF, self.start_location.offset((-3.5, -2.5 + index * 0.45)))
+        self.add_unit(UnitTypeId.COMMANDCENTER, ENEMY, self.enemy_start_location)
+        for index in range(enemy_workers):
+            self.add_unit(UnitTypeId.SCV, ENEMY, self.enemy_start_location.offset((3.5, -2.5 + index * 0.45)))
+        for index in range(enemy_army):
+            self.add_unit(UnitTypeId.MARINE, ENEMY, self.enemy_start_location.offset((-6, -6 + index * 0.8)))
+
+    def add_unit(self, unit_type: UnitTypeId, alliance: int, position: Point2, build_progress: float = 1.0) -> FakeUnit:
+        unit = FakeUnit(self._next_tag, unit_type, alliance, Point2(position), build_progress)
+        self._next_tag += 1
+        self.units[unit.tag] = unit
+        return unit
+
+    def add_base(self, townhall: Point2, towards: int):
+        """Eight mineral patches in two columns and two geysers on one side of a townhall position."""
+        column = int(townhall.x) + 7 * towards
+        for index in range(8):
+            x = column + (index % 2) * towards
+            y = int(townhall.y) - 4 + index + 0.5
+            mineral = self.add_unit(UnitTypeId.MINERALFIELD, NEUTRAL, Point2((x, y)))
+            mineral.mineral_contents = 1800 if index % 2 else 900
+        for offset in ((0, -7), (0, 7)):
+            geyser = self.add_unit(UnitTypeId.VESPENEGEYSER, NEUTRAL, townhall.offset(offset))
+            geyser.vespene_contents = 2250
+
+    def kill(self, tag: int):
+        if self.units.pop(tag, None) is not None:
+            self.dead_units.append(tag)
+
+    # Protobuf messages
+
+    def game_info(self) -> sc_pb.ResponseGameInfo:
+        width, height = self.map_width, self.map_height
+        playable = np.zeros((height, width), dtype=bool)
+        playable[2 : height - 2, 2 : width - 2] = True
+        start_raw = raw_pb.StartRaw(
+            map_size=common_pb.Size2DI(x=width, y=height),
+            pathing_grid=_image(playable, bits=1),
+            terrain_height=_image(np.full((height, width), 127, dtype=np.uint8), bits=8),
+            placement_grid=_image(playable, bits=1),
+            playable_area=common_pb.RectangleI(p0=common_pb.PointI(x=2, y=2), p1=common_pb.PointI(x=width - 2, y=height - 2)),
+            start_locations=[common_pb.Point2D(x=self.enemy_start_location.x, y=self.enemy_start_location.y)],
+        )
+        players = [
+            sc_pb.PlayerInfo(player_id=PLAYER_ID, type=sc_pb.Participant, race_requested=common_pb.Protoss, race_actual=common_pb.Protoss),
+            sc_pb.PlayerInfo(
+                player_id=ENEMY_PLAYER_ID, type=sc_pb.Computer, race_requested=common_pb.Terran, race_actual=common_pb.Terran,
+                difficulty=sc_pb.Easy,
+            ),
+        ]
+        return sc_pb.ResponseGameInfo(map_name="FakeGame", player_info=players, start_raw=start_raw)
+
+    @staticmethod
+    def game_data() -> sc_pb.ResponseData:
+        abilities = []
+        building_abilities = {spec.ability: unit_type for unit_type, spec in UNIT_SPECS.items() if spec.structure}
+        for ability in AbilityId:
+            if ability.value == 0:
+                continue
+            building = building_abilities.get(ability)
+            abilities.append(
+                data_pb.AbilityData(
+                    ability_id=ability.value,
+                    link_name=ability.name,
+                    button_name=ability.name,
+                    friendly_name=ability.name,
+                    remaps_to_ability_id=ABILITY_REMAPS[ability].value if ability in ABILITY_REMAPS else 0,
+                    available=True,
+                    target=ability_target(ability),
+                    is_building=building is not None,
+                    footprint_radius=UNIT_SPECS[building].radius if building is not None else 0,
+                )
+            )
+        units = []
+        for unit_type, spec in UNIT_SPECS.items():
+            units.append(
+                data_pb.UnitTypeData(
+                    unit_id=unit_type.value,
+                    name=unit_type.name,
+                    available=True,
+                    mineral_cost=spec.minerals,
+                    vespene_cost=spec.vespene,
+                    food_required=spec.food_required,
+                    food_provided=spec.food_provided,
+                    ability_id=spec.ability.value,
+                    build_time=spec.build_time,
+                    movement_speed=spec.speed,
+                    sight_range=8,
+                    attributes=[data_pb.Structure] if spec.structure else [],
+                    tech_alias=[UnitTypeId.GATEWAY.value] if unit_type == UnitTypeId.WARPGATE else [],
+                )
+            )
+        upgrades = [
+            data_pb.UpgradeData(
+                upgrade_id=upgrade.value,
+                name=upgrade.name,
+                mineral_cost=minerals,
+                vespene_cost=vespene,
+                research_time=research_time,
+                ability_id=ability.value,
+            )
+            for ability, (upgrade, minerals, vespene, research_time) in UPGRADE_SPECS.items()
+        ]
+        return sc_pb.ResponseData(abilities=abilities, units=units, upgrades=upgrades)
+
+    def observation(self) -> sc_pb.ResponseObservation:
+        food_cap = sum(u.spec.food_provided for u in self.units.values() if u.alliance == SELF and u.is_ready)
+        own_units = [u for u in self.units.values() if u.alliance == SELF and not u.spec.structure]
+        food_used = sum(u.spec.food_required for u in own_units) + sum(
+            UNIT_SPECS[TRAIN_ABILITIES[o.ability]].food_required
+            for u in self.units.values()
+            if u.alliance == SELF
+            for o in u.orders
+            if o.ability in TRAIN_ABILITIES
+        )
+        workers = [u for u in own_units if u.unit_type == UnitTypeId.PROBE]
+        player_common = sc_pb.PlayerCommon(
+            player_id=PLAYER_ID,
+            minerals=int(self.minerals),
+            vespene=int(self.vespene),
+            food_cap=int(min(food_cap, 200)),
+            food_used=int(food_used),
+            food_army=int(sum(u.spec.food_required for u in own_units if u.unit_type != UnitTypeId.PROBE)),
+            food_workers=len(workers),
+            idle_worker_count=sum(1 for u in workers if not u.orders),
+            army_count=len(own_units) - len(workers),
+            warp_gate_count=sum(1 for u in self.units.values() if u.unit_type == UnitTypeId.WARPGATE and u.alliance == SELF),
+        )
+        power_sources = [
+            raw_pb.PowerSource(pos=_point(u.position), radius=PYLON_POWER_RADIUS, tag=u.tag)
+            for u in self.units.values()
+            if u.unit_type == UnitTypeId.PYLON and u.alliance == SELF and u.is_ready
+        ]
+        visible = np.full((self.map_height, self.map_width), 2, dtype=np.uint8)
+        creep = np.zeros((self.map_height, self.map_width), dtype=bool)
+        raw_data = raw_pb.ObservationRaw(
+            player=raw_pb.PlayerRaw(power_sources=power_sources, upgrade_ids=[u.value for u in self.upgrades]),
+            units=[self._unit_proto(u) for u in self.units.values()],
+            map_state=raw_pb.MapState(visibility=_image(visible, bits=8), creep=_image(creep, bits=1)),
+            event=raw_pb.Event(dead_units=self.dead_units),
+        )
+        self.dead_units = []
+        observation = sc_pb.Observation(game_loop=self.game_loop, player_common=player_common, raw_data=raw_data)
+        return sc_pb.ResponseObservation(observation=observation)
+
+    def _unit_proto(self, unit: FakeUnit) -> raw_pb.Unit:
+        spec = unit.spec
+        owner = {SELF: PLAYER_ID, ENEMY: ENEMY_PLAYER_ID}.get(unit.alliance, NEUTRAL_PLAYER_ID)
+        proto = raw_pb.Unit(
+            display_type=raw_pb.Visible,
+            alliance=unit.alliance,
+            tag=unit.tag,
+            unit_type=unit.unit_type.value,
+            owner=owner,
+            pos=_point(unit.position),
+            radius=spec.radius,
+            build_progress=min(unit.build_progress, 1.0),
+            health=unit.health,
+            health_max=spec.health,
+            shield=unit.shield,
+            shield_max=spec.shield,
+            energy=unit.energy,
+            energy_max=200 if spec.energy else 0,
+            mineral_contents=unit.mineral_contents,
+            vespene_contents=unit.vespene_contents,
+            cloak=raw_pb.NotCloaked,
+            is_powered=True,
+        )
+        for order in unit.orders[:8]:
+            order_proto = raw_pb.UnitOrder(ability_id=order.ability.value, progress=self._order_progress(unit, order))
+            if order.target_tag:
+                order_proto.target_unit_tag = order.target_tag
+            elif order.target_pos is not None:
+                order_proto.target_world_space_pos.CopyFrom(_point(order.target_pos))
+            proto.orders.append(order_proto)
+        if unit.carrying == "minerals":
+            proto.buff_ids.append(BuffId.CARRYMINERALFIELDMINERALS.value)
+        elif unit.carrying == "vespene":
+            proto.buff_ids.append(BuffId.CARRYHARVESTABLEVESPENEGEYSERGASPROTOSS.value)
+        if unit.chrono_until > self.game_loop:
+            proto.buff_ids.append(BuffId.CHRONOBOOSTENERGYCOST.value)
+        if unit.unit_type in TOWNHALLS and unit.is_ready:
+            patches = [m for m in self._minerals() if m.position.distance_to_point2(unit.position) < 10]
+            proto.ideal_harvesters = 2 * len(patches)
+            patch_tags = {m.tag for m in patches}
+            proto.assigned_harvesters = sum(1 for u in self.units.values() if u.resource_tag in patch_tags)
+        if unit.unit_type == UnitTypeId.ASSIMILATOR and unit.is_ready:
+            proto.ideal_harvesters = 3
+            proto.assigned_harvesters = sum(1 for u in self.units.values() if u.resource_tag == unit.tag)
+        return proto
+
+    def _order_progress(self, unit: FakeUnit, order: FakeOrder) -> float:
+        if order.ability in TRAIN_ABILITIES:
+            return min(order.progress / UNIT_SPECS[TRAIN_ABILITIES[order.ability]].build_time, 1.0)
+        if order.ability in UPGRADE_SPECS:
+            return min(order.progress / UPGRADE_SPECS[order.ability][3], 1.0)
+        return 0.0
+
+    # Actions
+
+    def apply(self, action: UnitCommand):
+        """Capture an action and turn it into orders of the fake units."""
+        target = action.target
+        if isinstance(target, Unit):
+            captured_target: Union[int, Tuple[float, float], None] = target.tag
+        elif target is not None:
+            captured_target = (float(target[0]), float(target[1]))
+        else:
+            captured_target = None
+        tags = tuple(unit.tag for unit in ([action.unit] if isinstance(action.unit, Unit) else action.unit))
+        self.actions.append(CapturedAction(self.game_loop, action.ability.value, tags, captured_target, action.queue))
+
+        for tag in tags:
+            unit = self.units.get(tag)
+            if unit is None or unit.alliance != SELF:
+                self.action_errors += 1
+                continue
+            if not self._apply_to_unit(unit, action.ability, captured_target, action.queue):
+                self.action_errors += 1
+
+    def _apply_to_unit(self, unit: FakeUnit, ability: AbilityId, target, queue: bool) -> bool:
+        target_unit = self.units.get(target) if isinstance(target, int) else None
+        target_pos = Point2(target) if isinstance(target, tuple) else None
+
+        if ability == AbilityId.SMART:
+            if target_unit is not None and (target_unit.mineral_contents or target_unit.unit_type == UnitTypeId.ASSIMILATOR):
+                ability = AbilityId.HARVEST_GATHER
+            else:
+                ability = AbilityId.MOVE
+        if ability in STOP_ABILITIES:
+            unit.orders.clear()
+            return True
+        if ability in GATHER_ABILITIES:
+            if target_unit is None:
+                return False
+            unit.resource_tag = target_unit.tag
+            return self._order(unit, FakeOrder(AbilityId.HARVEST_GATHER_PROBE, target_unit.tag), queue)
+        if ability in RETURN_ABILITIES:
+            if not unit.carrying:
+                return False
+            return self._order(unit, FakeOrder(AbilityId.HARVEST_RETURN_PROBE), queue)
+        if ability in MOVE_ABILITIES:
+            if target_unit is not None:
+                target_pos = target_unit.position
+            if target_pos is None:
+                return False
+            return self._order(unit, FakeOrder(ability, target_pos=target_pos), queue)
+        if ability in TRAIN_ABILITIES:
+            spec = UNIT_SPECS[TRAIN_ABILITIES[ability]]
+            if not unit.is_ready or len(unit.orders) >= 5 or not self._spend(spec.minerals, spec.vespene):
+                return False
+            unit.orders.append(FakeOrder(ability))
+            return True
+        if ability in UPGRADE_SPECS:
+            upgrade, minerals, vespene, _ = UPGRADE_SPECS[ability]
+            if upgrade in self.upgrades or not self._spend(minerals, vespene):
+                return False
+            unit.orders.append(FakeOrder(ability))
+            return True
+        if ability in BUILD_ABILITIES:
+            if target_unit is not None:
+                target_pos = target_unit.position
+            if target_pos is None:
+                return False
+            return self._order(unit, FakeOrder(ability, target_tag=target_unit.tag if target_unit else 0, target_pos=target_pos), queue)
+        if ability in WARP_IN_ABILITIES:
+            spec = UNIT_SPECS[WARP_IN_ABILITIES[ability]]
+            if unit.unit_type != UnitTypeId.WARPGATE or unit.warp_ready_loop > self.game_loop or target_pos is None:
+                return False
+            if not self._spend(spec.minerals, spec.vespene):
+                return False
+            self.add_unit(WARP_IN_ABILITIES[ability], SELF, target_pos, build_progress=0.0)
+            unit.warp_ready_loop = self.game_loop + int(20 * GAME_LOOPS_PER_SECOND)
+            return True
+        if ability == AbilityId.EFFECT_CHRONOBOOSTENERGYCOST:
+            if unit.energy < 50 or target_unit is None:
+                return False
+            unit.energy -= 50
+            target_unit.chrono_until = self.game_loop + CHRONO_LOOPS
+            return True
+        # Anything else is captured but has no effect on the world
+        return True
+
+    def _order(self, unit: FakeUnit, order: FakeOrder, queue: bool) -> bool:
+        if not queue:
+            unit.orders.clear()
+        unit.orders.append(order)
+        return True
+
+    def _spend(self, minerals: int, vespene: int) -> bool:
+        if self.minerals < minerals or self.vespene < vespene:
+            return False
+        self.minerals -= minerals
+        self.vespene -= vespene
+        return True
+
+    def available_abilities(self, tag: int) -> List[AbilityId]:
+        unit = self.units.get(tag)
+        if unit is None:
+            return []
+        abilities = [AbilityId.STOP_STOP]
+        if unit.unit_type == UnitTypeId.NEXUS and unit.is_ready:
+            abilities.append(AbilityId.NEXUSTRAIN_PROBE)
+            if unit.energy >= 50:
+                abilities.append(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST)
+        if unit.unit_type == UnitTypeId.WARPGATE and unit.is_ready and unit.warp_ready_loop <= self.game_loop:
+            abilities.append(AbilityId.WARPGATETRAIN_ZEALOT)
+        if not unit.spec.structure:
+            abilities += [AbilityId.MOVE_MOVE, AbilityId.ATTACK_ATTACK]
+        return abilities
+
+    def can_place(self, ability: AbilityId, position: Point2) -> bool:
+        unit_type = BUILD_ABILITIES.get(ability)
+        if unit_type is None:
+            return False
+        size = round(2 * UNIT_SPECS[unit_type].radius)
+        x0, y0 = position.x - size / 2, position.y - size / 2
+        if x0 < 2 or y0 < 2 or x0 + size > self.map_width - 2 or y0 + size > self.map_height - 2:
+            return False
+        for unit in self.units.values():
+            if not unit.spec.structure:
+                continue
+            if unit.unit_type == UnitTypeId.MINERALFIELD:
+                half_width, half_height = 1, 0.5
+            else:
+                half_width = half_height = round(2 * unit.spec.radius) / 2
+            if abs(unit.position.x - position.x) < half_width + size / 2 and abs(unit.position.y - position.y) < half_height + size / 2:
+                return False
+        if unit_type in UNPOWERED:
+            return True
+        return any(
+            u.unit_type == UnitTypeId.PYLON and u.alliance == SELF and u.is_ready and u.position.distance_to_point2(position) <= PYLON_POWER_RADIUS
+            for u in self.units.values()
+        )
+
+    # Simulation
+
+    def step(self, loops: int = 1):
+        for _ in range(loops):
+            self.game_loop += 1
+            for unit in list(self.units.values()):
+                if unit.tag not in self.units:
+                    continue
+                if not unit.is_ready:
+                    self._construct(unit)
+                    continue
+                if unit.spec.energy and unit.energy < 200:
+                    unit.energy = min(unit.energy + ENERGY_PER_LOOP, 200)
+                if unit.orders:
+                    self._work(unit)
+
+    def _construct(self, unit: FakeUnit):
+        build_time = WARP_IN_LOOPS if not unit.spec.structure else unit.spec.build_time
+        unit.build_progress = min(unit.build_progress + 1 / build_time, 1.0)
+
+    def _work(self, unit: FakeUnit):
+        order = unit.orders[0]
+        if order.ability in TRAIN_ABILITIES or order.ability in UPGRADE_SPECS:
+            self._produce(unit, order)
+        elif order.ability in GATHER_ABILITIES:
+            self._gather(unit, order)
+        elif order.ability in RETURN_ABILITIES:
+            self._return_cargo(unit)
+        elif order.ability in MOVE_ABILITIES:
+            if self._move(unit, order.target_pos, 0):
+                unit.orders.pop(0)
+        elif order.ability in BUILD_ABILITIES:
+            self._build(unit, order)
+        else:
+            unit.orders.pop(0)
+
+    def _move(self, unit: FakeUnit, target: Point2, distance: float) -> bool:
+        """Move towards the target, True once the unit is within distance of it."""
+        remaining = unit.position.distance_to_point2(target) - distance
+        if remaining <= 0:
+            return True
+        # Movement speed on faster is 1.4 times the normal speed, per game loop
+        step = unit.spec.speed * 1.4 / GAME_LOOPS_PER_SECOND
+        if remaining <= step:
+            unit.position = unit.position.towards(target, unit.position.distance_to_point2(target) - distance)
+            return True
+        unit.position = unit.position.towards(target, step)
+        return False
+
+    def _produce(self, unit: FakeUnit, order: FakeOrder):
+        order.progress += CHRONO_SPEEDUP if unit.chrono_until > self.game_loop else 1
+        if order.ability in TRAIN_ABILITIES:
+            unit_type = TRAIN_ABILITIES[order.ability]
+            if order.progress < UNIT_SPECS[unit_type].build_time:
+                return
+            angle = (unit.tag % 16) / 16 * 2 * math.pi
+            spawn = unit.position.offset((math.cos(angle) * (unit.spec.radius + 0.5), math.sin(angle) * (unit.spec.radius + 0.5)))
+            self.add_unit(unit_type, unit.alliance, spawn)
+        else:
+            upgrade, _, _, research_time = UPGRADE_SPECS[order.ability]
+            if order.progress < research_time:
+                return
+            self.upgrades.add(upgrade)
+            if upgrade == UpgradeId.WARPGATERESEARCH:
+                # Gateways transform into warpgates on their own once the research is done
+                for gateway in self.units.values():
+                    if gateway.unit_type == UnitTypeId.GATEWAY and gateway.alliance == SELF and gateway.is_ready:
+                        gateway.unit_type = UnitTypeId.WARPGATE
+        unit.orders.pop(0)
+
+    def _gather(self, unit: FakeUnit, order: FakeOrder):
+        resource = self.units.get(order.target_tag)
+        if resource is None:
+            unit.orders.pop(0)
+            return
+        if unit.carrying:
+            # A worker with cargo first brings it back
+            unit.orders.insert(0, FakeOrder(AbilityId.HARVEST_RETURN_PROBE))
+            return
+        if not self._move(unit, resource.position, resource.spec.radius + unit.spec.radius + REACH):
+            return
+        is_gas = resource.unit_type == UnitTypeId.ASSIMILATOR
+        if not resource.mineral_contents and not (is_gas and resource.is_ready):
+            unit.orders.pop(0)
+            self.action_errors += 1
+            return
+        order.progress += 1
+        if order.progress < (GAS_LOOPS if is_gas else MINING_LOOPS):
+            return
+        order.progress = 0
+        if is_gas:
+            unit.carrying, unit.carry_amount = "vespene", min(VESPENE_PER_TRIP, resource.vespene_contents)
+            resource.vespene_contents -= unit.carry_amount
+        else:
+            unit.carrying, unit.carry_amount = "minerals", min(MINERALS_PER_TRIP, resource.mineral_contents)
+            resource.mineral_contents -= unit.carry_amount
+            if resource.mineral_contents <= 0:
+                self.kill(resource.tag)
+        # Return the cargo, then keep gathering from the same resource
+        unit.orders.insert(0, FakeOrder(AbilityId.HARVEST_RETURN_PROBE))
+
+    def _return_cargo(self, unit: FakeUnit):
+        townhalls = [u for u in self.units.values() if u.unit_type in TOWNHALLS and u.alliance == unit.alliance and u.is_ready]
+        if not unit.carrying or not townhalls:
+            unit.orders.pop(0)
+            return
+        townhall = min(townhalls, key=lambda t: t.position.distance_to_point2(unit.position))
+        if not self._move(unit, townhall.position, townhall.spec.radius + unit.spec.radius + REACH):
+            return
+        if unit.carrying == "minerals":
+            self.minerals += unit.carry_amount
+            self.minerals_collected += unit.carry_amount
+        else:
+            self.vespene += unit.carry_amount
+            self.vespene_collected += unit.carry_amount
+        unit.carrying, unit.carry_amount = None, 0
+        unit.orders.pop(0)
+        if not unit.orders and unit.resource_tag in self.units:
+            unit.orders.append(FakeOrder(AbilityId.HARVEST_GATHER_PROBE, unit.resource_tag))
+
+    def _build(self, unit: FakeUnit, order: FakeOrder):
+        unit_type = BUILD_ABILITIES[order.ability]
+        spec = UNIT_SPECS[unit_type]
+        if not self._move(unit, order.target_pos, spec.radius + REACH):
+            return
+        unit.orders.pop(0)
+        if unit_type == UnitTypeId.ASSIMILATOR:
+            geyser = self.units.get(order.target_tag)
+            if geyser is None or geyser.unit_type != UnitTypeId.VESPENEGEYSER or not self._spend(spec.minerals, spec.vespene):
+                self.action_errors += 1
+                return
+            assimilator = self.add_unit(unit_type, SELF, geyser.position, build_progress=0.0)
+            assimilator.vespene_contents = geyser.vespene_contents
+            return
+        if not self.can_place(order.ability, order.target_pos) or not self._spend(spec.minerals, spec.vespene):
+            self.action_errors += 1
+            return
+        self.add_unit(unit_type, SELF, order.target_pos, build_progress=0.0)
+
+    def _minerals(self) -> List[FakeUnit]:
+        return [u for u in self.units.values() if u.unit_type == UnitTypeId.MINERALFIELD]
+
+
+class FakeClient:
+    """Answers the requests BotAI sends to the game client from a FakeGame."""
+
+    def __init__(self, game: FakeGame):
+        self.game = game
+        self.game_step = 1
+        self.round_trips = 0
+        self.chat: List[str] = []
+
+    async def _execute(self, **kwargs):
+        self.round_trips += 1
+
+    async def actions(self, actions: List[UnitCommand], return_successes: bool = False):
+        await self._execute(action=None)
+        for action in actions:
+            self.game.apply(action)
+        return []
+
+    async def query_available_abilities(self, units, ignore_resource_requirements: bool = False) -> List[List[AbilityId]]:
+        await self._execute(query=None)
+        if isinstance(units, Unit):
+            units = [units]
+        return [self.game.available_abilities(unit.tag) for unit in units]
+
+    async def _query_building_placement_fast(self, ability: AbilityId, positions: List[Point2], ignore_resources: bool = True) -> List[bool]:
+        await self._execute(query=None)
+        return [self.game.can_place(ability, Point2(position)) for position in positions]
+
+    async def query_building_placement(self, ability, positions: List[Point2], ignore_resources: bool = True) -> List:
+        results = await self._query_building_placement_fast(ability.id if hasattr(ability, "id") else ability, positions)
+        return [ActionResult.Success if result else ActionResult.CantBuildLocationInvalid for result in results]
+
+    async def query_pathing(self, start: Union[Unit, Point2], end: Point2) -> Optional[float]:
+        await self._execute(query=None)
+        start = start.position if isinstance(start, Unit) else start
+        return Point2(start).distance_to_point2(Point2(end))
+
+    async def query_pathings(self, zipped_list) -> List[float]:
+        await self._execute(query=None)
+        return [Point2(start.position if isinstance(start, Unit) else start).distance_to_point2(Point2(end)) for start, end in zipped_list]
+
+    async def chat_send(self, message: str, team_only: bool):
+        self.chat.append(message)
+
+    async def _send_debug(self):
+        pass
+
+    def debug_text_screen(self, *args, **kwargs):
+        pass
+
+    def debug_text_world(self, *args, **kwargs):
+        pass
+
+    def debug_sphere_out(self, *args, **kwargs):
+        pass
+
+    def debug_box_out(self, *args, **kwargs):
+        pass
+
+    def debug_line_out(self, *args, **kwargs):
+        pass
+
+
+async def run_fake_game(bot: BotAI, game: Optional[FakeGame] = None, game_loops: int = 6720) -> Tuple[FakeGame, LatencyHistogram]:
+    """Play the bot against the fake game for the given number of game loops, returns the game and the on_step wall times."""
+    game = game or FakeGame()
+    client = FakeClient(game)
+    latencies = LatencyHistogram()
+
+    bot._initialize_variables()
+    bot._prepare_start(client, PLAYER_ID, GameInfo(game.game_info()), GameData(game.game_data()), realtime=False)
+    proto_game_info = sc_pb.Response(game_info=game.game_info())
+    bot._prepare_step(GameState(game.observation()), proto_game_info)
+    await bot.on_before_start()
+    bot._prepare_first_step()
+    await bot.on_start()
+
+    iteration = 0
+    while game.game_loop < game_loops:
+        bot._prepare_step(GameState(game.observation()), proto_game_info)
+        start = time.perf_counter()
+        await bot.issue_events()
+        await bot.on_step(iteration)
+        await bot._after_step()
+        latencies.record(time.perf_counter() - start)
+        game.step(max(client.game_step, 1))
+        iteration += 1
+
+    await bot.on_end(None)
+    return game, latencies
+
+
+def ability_target(ability: AbilityId) -> int:
+    """Target type of the ability in the game data, PointOrUnit for the ones no rule covers."""
+    if ability in ABILITY_TARGETS:
+        return ABILITY_TARGETS[ability]
+    name = ability.name
+    if "CANCEL" in name:
+        return TARGET_NONE
+    if name.startswith("HARVEST_GATHER"):
+        return TARGET_UNIT
+    # Addons are built next to the producer, optionally after moving it
+    if name.startswith(("BUILD_TECHLAB", "BUILD_REACTOR")):
+        return TARGET_POINT_OR_NONE
+    # Warp ins and structures go to a point, trained units come out of the producer
+    if "WARPGATETRAIN_" in name or name.startswith("TRAINWARP_") or "BUILD_" in name or name.startswith("LAND"):
+        return TARGET_POINT
+    if "TRAIN_" in name or "RESEARCH_" in name or name.startswith(NO_TARGET_PREFIXES):
+        return TARGET_NONE
+    return TARGET_POINT_OR_UNIT
+
+
+def load_bot(name: str) -> BotAI:
+    bots = {
+        "ZealotChargeBot": ("zealot_charge_bot", "ZealotChargeBot"),
+        "WorkerStackBot": ("protoss_bot", "WorkerStackBot"),
+        "WorkerRushBot": ("workerRushBot", "WorkerStackBot"),
+    }
+    module_name, class_name = bots[name]
+    module = __import__(module_name)
+    return getattr(module, class_name)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a bot against the offline fake game")
+    parser.add_argument("bot", choices=["ZealotChargeBot", "WorkerStackBot", "WorkerRushBot"])
+    parser.add_argument("--loops", type=int, default=6720, help="game loops to play (6720 = 5 game minutes)")
+    parser.add_argument("--workers", type=int, default=12)
+    args = parser.parse_args()
+
+    game, latencies = asyncio.run(run_fake_game(load_bot(args.bot), FakeGame(workers=args.workers), args.loops))
+    logger.info(
+        f"{args.bot}: {latencies.count} steps, on_step p50 {latencies.percentile(50) * 1000:.3f}ms "
+        f"p95 {latencies.percentile(95) * 1000:.3f}ms p99 {latencies.percentile(99) * 1000:.3f}ms max {latencies.max * 1000:.3f}ms"
+    )
+    logger.info(
+        f"{len(game.actions)} actions ({game.action_errors} errors), "
+        f"{game.minerals_collected} minerals and {game.vespene_collected} vespene collected"
+    )
+
+
+def _image(grid: np.ndarray, bits: int) -> common_pb.ImageData:
+    height, width = grid.shape
+    data = np.packbits(grid.astype(bool)).tobytes() if bits == 1 else grid.astype(np.uint8).tobytes()
+    return common_pb.ImageData(bits_per_pixel=bits, size=common_pb.Size2DI(x=width, y=height), data=data)
+
+
+def _point(position: Point2) -> common_pb.Point:
+    return common_pb.Point(x=position.x, y=position.y, z=0)
+
+
+if __name__ == "__main__":
+    main()
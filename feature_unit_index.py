@@ -0,0 +1,75 @@
+"""
+One-pass index of the pysc2 `feature_units` observation by unit type.
+
+`get_units_by_type` ran a Python list comprehension over all feature units for every query, and
+one `ZergAgent.step` asks about thirty of them, often the same type twice. `FeatureUnitIndex`
+sorts the unit_type column of the underlying array once with NumPy and keeps the row indices of
+every type, so a count is a dict lookup and the units, coordinates or a random unit of a type
+come straight from those rows. The agents build it once per observation at the start of `step`:
+
+    self.unit_index = FeatureUnitIndex(obs.observation.feature_units)
+    if self.unit_index.count(units.Zerg.SpawningPool) == 0:
+        drone = self.unit_index.random(units.Zerg.Drone)
+
+Every query takes a unit type or a sequence of them (e.g. hatcheries and lairs together).
+"""
+
+import random
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from pysc2.lib import features
+
+UnitTypes = Union[int, Sequence[int]]
+
+NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+class FeatureUnitIndex:
+    def __init__(self, feature_units):
+        # The named array of the observation, rows keep their .x / ['assigned_harvesters'] access
+        self.feature_units = feature_units
+        self.array = np.asarray(feature_units)
+        # Unit type -> row indices, and the unit lists handed out for this observation
+        self.groups: Dict[int, np.ndarray] = {}
+        self.unit_lists: Dict[int, List] = {}
+        if self.array.ndim != 2 or not len(self.array):
+            return
+        types = self.array[:, features.FeatureUnit.unit_type]
+        order = np.argsort(types, kind="stable")
+        unit_types, starts, counts = np.unique(types[order], return_index=True, return_counts=True)
+        for unit_type, start, count in zip(unit_types.tolist(), starts.tolist(), counts.tolist()):
+            self.groups[unit_type] = order[start:start + count]
+
+    def rows(self, unit_types: UnitTypes) -> np.ndarray:
+        """Row indices of the units of the given type(s)."""
+        if isinstance(unit_types, (int, np.integer)):
+            return self.groups.get(int(unit_types), NO_ROWS)
+        if not unit_types:
+            return NO_ROWS
+        return np.concatenate([self.rows(unit_type) for unit_type in unit_types])
+
+    def count(self, unit_types: UnitTypes) -> int:
+        return len(self.rows(unit_types))
+
+    def units(self, unit_type: int) -> List:
+        """The feature units of one type, same rows as the old list comprehension returned."""
+        unit_list = self.unit_lists.get(unit_type)
+        if unit_list is None:
+            unit_list = [self.feature_units[row] for row in self.rows(unit_type).tolist()]
+            self.unit_lists[unit_type] = unit_list
+        return unit_list
+
+    def coordinates(self, unit_types: UnitTypes) -> np.ndarray:
+        """Screen (x, y) of the units of the given type(s), one row per unit."""
+        rows = self.rows(unit_types)
+        if not len(rows):
+            return np.zeros((0, 2), dtype=self.array.dtype)
+        return self.array[rows][:, [features.FeatureUnit.x, features.FeatureUnit.y]]
+
+    def random(self, unit_types: UnitTypes) -> Optional[object]:
+        """A random feature unit of the given type(s), None if there is none."""
+        rows = self.rows(unit_types)
+        if not len(rows):
+            return None
+        return self.feature_units[int(rows[random.randrange(len(rows))])]
@@ -0,0 +1,105 @@
+"""
+Rosters of the workers mining each assimilator.
+
+`manage_gas` used to look for workers with `closer_than(10, assimilator)` every time it ran and
+moved at most one worker per call, based on the harvester counts the game reports. The roster
+keeps the workers of every assimilator explicitly, so the whole split between gas and mineral
+workers is decided in one call to `plan`: missing slots are filled with the closest mineral
+workers that are not carrying anything, and surplus workers (or all of them once gas is no
+longer needed) are released at once.
+
+Dead workers and destroyed or depleted assimilators are dropped through `remove_unit`, which the
+bot calls from `on_unit_destroyed`.
+"""
+
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from sc2.position import Point2
+
+WORKERS_PER_ASSIMILATOR = 3
+
+
+class GasCandidate(NamedTuple):
+    tag: int
+    position: Point2
+
+
+class Assimilator(NamedTuple):
+    tag: int
+    position: Point2
+    ideal_harvesters: int
+
+
+class GasManager:
+    def __init__(self):
+        self.rosters: Dict[int, Set[int]] = {}
+        self.worker_to_assimilator: Dict[int, int] = {}
+
+    def __contains__(self, worker_tag: int) -> bool:
+        return worker_tag in self.worker_to_assimilator
+
+    def __len__(self) -> int:
+        return len(self.worker_to_assimilator)
+
+    def roster(self, assimilator_tag: int) -> Set[int]:
+        return self.rosters.get(assimilator_tag, set())
+
+    def assign(self, worker_tag: int, assimilator_tag: int):
+        self.release(worker_tag)
+        self.rosters.setdefault(assimilator_tag, set()).add(worker_tag)
+        self.worker_to_assimilator[worker_tag] = assimilator_tag
+
+    def release(self, worker_tag: int):
+        assimilator_tag = self.worker_to_assimilator.pop(worker_tag, None)
+        if assimilator_tag is not None:
+            self.rosters[assimilator_tag].discard(worker_tag)
+
+    def remove_unit(self, tag: int) -> Set[int]:
+        """Drop a worker or an assimilator. Returns the workers that lost their assimilator."""
+        if tag in self.worker_to_assimilator:
+            self.release(tag)
+            return set()
+        workers = self.rosters.pop(tag, set())
+        for worker_tag in workers:
+            del self.worker_to_assimilator[worker_tag]
+        return workers
+
+    def plan(
+        self, assimilators: Sequence[Assimilator], candidates: Sequence[GasCandidate], target: int
+    ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Bring the number of gas workers to `target` (at most the ideal harvesters of the ready assimilators).
+        Returns the (worker, assimilator) pairs sent to gas and the ones sent back to minerals,
+        the rosters are already updated.
+        """
+        known = {assimilator.tag for assimilator in assimilators}
+        released = []
+        for assimilator_tag in [tag for tag in self.rosters if tag not in known]:
+            released.extend((worker_tag, assimilator_tag) for worker_tag in self.remove_unit(assimilator_tag))
+
+        # Spread the target over the assimilators, in the given order
+        wanted: Dict[int, int] = {}
+        remaining = max(target, 0)
+        for assimilator in assimilators:
+            wanted[assimilator.tag] = min(assimilator.ideal_harvesters, remaining)
+            remaining -= wanted[assimilator.tag]
+
+        for assimilator in assimilators:
+            roster = self.rosters.setdefault(assimilator.tag, set())
+            surplus = len(roster) - wanted[assimilator.tag]
+            for worker_tag in sorted(roster)[:max(surplus, 0)]:
+                self.release(worker_tag)
+                released.append((worker_tag, assimilator.tag))
+
+        sent = []
+        free = [candidate for candidate in candidates if candidate.tag not in self.worker_to_assimilator]
+        for assimilator in assimilators:
+            missing = wanted[assimilator.tag] - len(self.rosters[assimilator.tag])
+            for _ in range(missing):
+                if not free:
+                    break
+                closest = min(free, key=lambda candidate: candidate.position.distance_to_point2(assimilator.position))
+                free.remove(closest)
+                self.assign(closest.tag, assimilator.tag)
+                sent.append((closest.tag, assimilator.tag))
+        return sent, released
@@ -0,0 +1,161 @@
+"""
+Per-manager profiling for on_step.
+
+Every manager call is timed and the number of requests it sent to the SC2 client (round-trips,
+e.g. `get_available_abilities`, `find_placement`, `chat_send`) is counted by wrapping
+`client._execute`. Both go into per-manager histograms: wall time into log-spaced buckets
+(about 5% relative error), round-trips into an exact counter. Recording is a bisect and two
+increments, so the profiler can stay enabled in real games.
+
+Percentiles can be logged every N game seconds and are dumped to JSON and CSV in `on_end`.
+"""
+
+import csv
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    def __init__(self, min_value: float = 1e-6, max_value: float = 10.0, growth: float = 1.05):
+        bucket_count = int(math.log(max_value / min_value) / math.log(growth)) + 1
+        # Upper bounds of the buckets in seconds, values above max_value go to the last bucket
+        self.bounds: List[float] = [min_value * growth**i for i in range(bucket_count)]
+        self.counts: List[int] = [0] * (bucket_count + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                # Never report more than the largest value actually recorded
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+
+class ManagerProfile:
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = LatencyHistogram()
+        self.round_trips: Counter = Counter()
+
+    def round_trip_percentile(self, percent: float) -> int:
+        calls = sum(self.round_trips.values())
+        if not calls:
+            return 0
+        rank = math.ceil(calls * percent / 100)
+        seen = 0
+        for value in sorted(self.round_trips):
+            seen += self.round_trips[value]
+            if seen >= rank:
+                return value
+        return 0
+
+    def summary(self) -> Dict[str, float]:
+        calls = self.latency.count
+        summary = {
+            "manager": self.name,
+            "calls": calls,
+            "mean_ms": self.latency.total / calls * 1000 if calls else 0.0,
+            "max_ms": self.latency.max * 1000,
+            "total_ms": self.latency.total * 1000,
+        }
+        for percent in PERCENTILES:
+            summary[f"p{percent}_ms"] = self.latency.percentile(percent) * 1000
+        total_round_trips = sum(value * amount for value, amount in self.round_trips.items())
+        summary["round_trips_total"] = total_round_trips
+        summary["round_trips_mean"] = total_round_trips / calls if calls else 0.0
+        for percent in PERCENTILES:
+            summary[f"round_trips_p{percent}"] = self.round_trip_percentile(percent)
+        return summary
+
+
+class ManagerProfiler:
+    def __init__(self, log_interval: Optional[float] = None):
+        # Log the percentiles every log_interval game seconds, None disables periodic logging
+        self.log_interval = log_interval
+        self.profiles: Dict[str, ManagerProfile] = {}
+        self.round_trips = 0
+        self._next_log_time = log_interval
+
+    def attach(self, client):
+        """Count every request sent through the client (call once the client exists, e.g. in on_start)."""
+        execute = client._execute
+
+        async def counting_execute(**kwargs):
+            self.round_trips += 1
+            return await execute(**kwargs)
+
+        client._execute = counting_execute
+
+    async def run(self, name: str, manager: Callable[[], Awaitable]):
+        """Await a manager and record its wall time and round-trips."""
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = ManagerProfile(name)
+        round_trips_before = self.round_trips
+        start = time.perf_counter()
+        result = await manager()
+        profile.latency.record(time.perf_counter() - start)
+        profile.round_trips[self.round_trips - round_trips_before] += 1
+        return result
+
+    def wrap(self, name: str, manager: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+        """Return a coroutine function that profiles every call of the manager."""
+
+        async def profiled_manager():
+            return await self.run(name, manager)
+
+        profiled_manager.__name__ = name
+        return profiled_manager
+
+    def summaries(self) -> List[Dict[str, float]]:
+        return [profile.summary() for profile in self.profiles.values()]
+
+    def maybe_log(self, game_time: float):
+        """Log the per-manager percentiles if log_interval game seconds passed since the last log."""
+        if self._next_log_time is None or game_time < self._next_log_time:
+            return
+        self._next_log_time = game_time + self.log_interval
+        for summary in self.summaries():
+            logger.info(
+                f"{summary['manager']}: {summary['calls']} calls, "
+                f"p50 {summary['p50_ms']:.3f}ms p95 {summary['p95_ms']:.3f}ms p99 {summary['p99_ms']:.3f}ms "
+                f"max {summary['max_ms']:.3f}ms, round-trips mean {summary['round_trips_mean']:.2f} p99 {summary['round_trips_p99']}"
+            )
+
+    def dump(self, path_prefix: str):
+        """Write the summaries to <path_prefix>.json and <path_prefix>.csv."""
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        summaries = self.summaries()
+        with open(f"{path_prefix}.json", "w") as f:
+            json.dump(summaries, f, indent=2)
+        if summaries:
+            with open(f"{path_prefix}.csv", "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(summaries[0]))
+                writer.writeheader()
+                writer.writerows(summaries)
+        logger.info(f"Wrote manager profile to {path_prefix}.json and {path_prefix}.csv")
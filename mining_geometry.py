@@ -0,0 +1,179 @@
+"""
+Static mining geometry for the worker stacking micro.
+
+Mineral patches and townhalls (almost) never move, so the townhall a patch returns to and the
+point in front of that townhall where a carrying worker should be stopped are computed once
+and looked up afterwards. The cache is rebuilt when a townhall finishes or dies.
+
+`BaseGeometryCache` goes one step further and analyzes every expansion location at game start:
+ordered patches, near / far rows, worker counts per patch and drop points.
+"""
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+class DropPoint(NamedTuple):
+    townhall_tag: int
+    townhall_position: Point2
+    townhall_radius: float
+    # Point just in front of the townhall, on the straight line between the townhall and the patch
+    position: Point2
+
+
+class DropPointCache:
+    def __init__(self, distance_offset: float = 0.0, distance_factor: float = 1.0):
+        # The drop point lies `townhall.radius * distance_factor + distance_offset` away from the townhall center
+        self.distance_offset = distance_offset
+        self.distance_factor = distance_factor
+        self.drop_points: Dict[int, DropPoint] = {}
+
+    def __len__(self) -> int:
+        return len(self.drop_points)
+
+    def rebuild(self, townhalls: Units, mineral_field: Units):
+        """Map every mineral patch to its closest townhall and the drop point in front of it."""
+        self.drop_points = {}
+        if not townhalls:
+            return
+        for mineral in mineral_field:
+            th = townhalls.closest_to(mineral)
+            distance = th.radius * self.distance_factor + self.distance_offset
+            self.drop_points[mineral.tag] = DropPoint(
+                th.tag, th.position, th.radius, th.position.towards(mineral.position, distance)
+            )
+
+    def get(self, mineral_tag: int) -> Optional[DropPoint]:
+        return self.drop_points.get(mineral_tag)
+
+    def forget(self, mineral_tag: int):
+        self.drop_points.pop(mineral_tag, None)
+
+
+# Workers per patch that still add income: a third worker only pays off on the far patches
+NEAR_PATCH_WORKERS = 2
+FAR_PATCH_WORKERS = 3
+
+
+class PatchGeometry(NamedTuple):
+    tag: int
+    position: Point2
+    # Distance between the patch and the townhall center
+    distance: float
+    # Near patches are in the row closer to the townhall
+    near: bool
+    optimal_workers: int
+    # Where a carrying worker is stopped in front of the townhall, and how far it walks to get there
+    drop_point: Point2
+    return_distance: float
+
+
+class BaseGeometry:
+    def __init__(self, location: Point2, patches: List[PatchGeometry]):
+        self.location = location
+        # Closest patches first
+        self.patches: List[PatchGeometry] = sorted(patches, key=lambda patch: patch.distance)
+        self.by_tag: Dict[int, PatchGeometry] = {patch.tag: patch for patch in self.patches}
+
+    @property
+    def optimal_workers(self) -> int:
+        return sum(patch.optimal_workers for patch in self.patches)
+
+    def ranked(self) -> Iterator[Tuple[int, int]]:
+        """(patch tag, rank) pairs for WorkerLedger.add_base, closest patch first."""
+        return ((patch.tag, rank) for rank, patch in enumerate(self.patches))
+
+    def remove(self, patch_tag: int):
+        if self.by_tag.pop(patch_tag, None) is not None:
+            self.patches = [patch for patch in self.patches if patch.tag != patch_tag]
+
+
+class BaseGeometryCache:
+    """
+    Mineral line geometry of every base, computed once in on_start from `expansion_locations_dict`.
+
+    A townhall is bound to the geometry of the base it stands on the first time it is looked up,
+    so a new nexus can be saturated the moment it finishes without sorting any minerals.
+    """
+
+    def __init__(self, distance_offset: float = 0.0, distance_factor: float = 1.0, townhall_radius: float = 2.75):
+        self.distance_offset = distance_offset
+        self.distance_factor = distance_factor
+        self.townhall_radius = townhall_radius
+        self.bases: Dict[Point2, BaseGeometry] = {}
+        # Townhall tag -> geometry of the base it stands on
+        self.townhall_bases: Dict[int, BaseGeometry] = {}
+        # Patch tag -> geometry of its base
+        self.patch_bases: Dict[int, BaseGeometry] = {}
+
+    def analyze(self, expansion_locations: Dict[Point2, Units]):
+        """Precompute the patch order, near / far rows, worker counts and drop points of every base."""
+        self.bases = {}
+        self.townhall_bases = {}
+        self.patch_bases = {}
+        for location, resources in expansion_locations.items():
+            minerals = [resource for resource in resources if resource.is_mineral_field]
+            if minerals:
+                self._add(self._analyze_base(location, [(m.tag, m.position) for m in minerals]))
+
+    def for_townhall(self, townhall: Unit) -> Optional[BaseGeometry]:
+        geometry = self.townhall_bases.get(townhall.tag)
+        if geometry is not None or not self.bases:
+            return geometry
+        location = min(self.bases, key=lambda base: base.distance_to_point2(townhall.position))
+        if location.distance_to_point2(townhall.position) > 4:
+            # Not built on an expansion location
+            return None
+        geometry = self.bases[location]
+        if location.distance_to_point2(townhall.position) > 0.01:
+            # Drop points are in front of the actual townhall, not the computed expansion center
+            geometry = self._analyze_base(townhall.position, [(patch.tag, patch.position) for patch in geometry.patches])
+            self.bases.pop(location)
+            self._add(geometry)
+        self.townhall_bases[townhall.tag] = geometry
+        return geometry
+
+    def patch(self, patch_tag: int) -> Optional[PatchGeometry]:
+        geometry = self.patch_bases.get(patch_tag)
+        return geometry.by_tag.get(patch_tag) if geometry is not None else None
+
+    def optimal_workers(self, patch_tag: int) -> int:
+        patch = self.patch(patch_tag)
+        return patch.optimal_workers if patch is not None else NEAR_PATCH_WORKERS
+
+    def forget(self, unit_tag: int):
+        """A patch mined out or a townhall died."""
+        self.townhall_bases.pop(unit_tag, None)
+        geometry = self.patch_bases.pop(unit_tag, None)
+        if geometry is not None:
+            geometry.remove(unit_tag)
+
+    def _add(self, geometry: BaseGeometry):
+        self.bases[geometry.location] = geometry
+        for patch in geometry.patches:
+            self.patch_bases[patch.tag] = geometry
+
+    def _analyze_base(self, location: Point2, minerals: List[Tuple[int, Point2]]) -> BaseGeometry:
+        distances = [location.distance_to_point2(position) for _, position in minerals]
+        # Patches closer than halfway between the closest and the furthest one are in the near row
+        split = (min(distances) + max(distances)) / 2
+        drop_distance = self.townhall_radius * self.distance_factor + self.distance_offset
+        patches = []
+        for (tag, position), distance in zip(minerals, distances):
+            near = distance < split
+            drop_point = location.towards(position, drop_distance)
+            patches.append(
+                PatchGeometry(
+                    tag,
+                    position,
+                    distance,
+                    near,
+                    NEAR_PATCH_WORKERS if near else FAR_PATCH_WORKERS,
+                    drop_point,
+                    position.distance_to_point2(drop_point),
+                )
+            )
+        return BaseGeometry(location, patches)
@@ -0,0 +1,206 @@
+"""
+Vectorized simulator of the mineral mining economy of one base.
+
+Used to evaluate worker stacking parameters (`townhall_distance_threshold`, the drop point offset
+and `townhall_distance_factor`) without launching games. Every simulation runs the same base
+layout with its own stacking policy.
+
+Per trip a worker travels to its patch, waits while another worker mines it, mines, carries the
+minerals back and drops them at the townhall. Workers only meet at their own patch, so every
+patch is a small first come, first served queue. The simulation steps from trip to trip instead of
+from game loop to game loop: each step, every patch of every simulation serves the worker that
+reached it first, as NumPy arrays of shape (simulations, patches, workers per patch). A game takes
+about as many steps as a patch has trips. Travel times come from a constant acceleration
+model. A native return decelerates to a stop at the townhall. A stacked return (move to the drop
+point, return cargo once within the threshold) keeps its speed and drops on contact. If the bot
+misses the threshold window between two frames the worker stops at the drop point first. If the
+drop point plus threshold lies inside the townhall collision, the worker never gets close enough
+and stalls.
+
+    python mining_sim.py --simulations 400 --minutes 5
+"""
+
+import argparse
+import math
+import time
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+GAME_LOOPS_PER_SECOND = 22.4
+LOOPS_PER_MINUTE = 60 * GAME_LOOPS_PER_SECOND
+# The game data is in normal speed seconds of 16 game loops (faster plays 22.4 loops per second)
+LOOPS_PER_GAME_SECOND = 16
+# Probe movement from the game data, speed 2.8125 (3.94 on faster) and acceleration 2.5, distances in game units
+PROBE_SPEED = 2.8125 / LOOPS_PER_GAME_SECOND
+PROBE_ACCELERATION = 2.5 / LOOPS_PER_GAME_SECOND**2
+PROBE_RADIUS = 0.375
+# 2.786 game seconds, 1.99 seconds on faster
+MINING_LOOPS = 2.786 * LOOPS_PER_GAME_SECOND
+MINERALS_PER_TRIP = 5
+
+
+class BaseLayout(NamedTuple):
+    # Distance of every patch center to the townhall center, and the angle of the patch
+    patch_distances: np.ndarray
+    patch_angles: np.ndarray
+    # Townhall radius as reported by the API (used for the drop point), and half its footprint (used for collisions)
+    townhall_radius: float = 2.75
+    townhall_half_size: float = 2.5
+    patch_radius: float = 1.0
+
+
+class StackingPolicy(NamedTuple):
+    # Distance to the drop point at which the return cargo order is issued, None means no stacking
+    threshold: Optional[float] = None
+    # The drop point lies townhall_radius * distance_factor + distance_offset away from the townhall center
+    distance_offset: float = 0.0
+    distance_factor: float = 1.0
+
+
+def standard_layout() -> BaseLayout:
+    """Eight patches in an arc, near and far patches alternating, like most ladder map bases."""
+    angles = np.radians(np.linspace(-70, 70, 8))
+    distances = np.where(np.arange(8) % 2 == 0, 6.1, 7.1)
+    return BaseLayout(distances, angles)
+
+
+def travel_loops(distance: np.ndarray, v_start: float = 0.0, stop: bool = True,
+                 speed: float = PROBE_SPEED, acceleration: float = PROBE_ACCELERATION) -> np.ndarray:
+    """Time to cover distance starting with v_start, accelerating up to speed and, if stop, decelerating to 0 at the end."""
+    distance = np.maximum(np.asarray(distance, dtype=float), 0.0)
+    accelerate_distance = (speed**2 - v_start**2) / (2 * acceleration)
+    decelerate_distance = speed**2 / (2 * acceleration) if stop else 0.0
+    cruise = distance - accelerate_distance - decelerate_distance
+    full = (speed - v_start) / acceleration + (speed / acceleration if stop else 0.0) + np.maximum(cruise, 0) / speed
+    # Too short to reach full speed
+    if stop:
+        peak = np.sqrt(np.maximum((2 * acceleration * distance + v_start**2) / 2, v_start**2))
+        short = (peak - v_start) / acceleration + peak / acceleration
+    else:
+        short = (np.sqrt(v_start**2 + 2 * acceleration * distance) - v_start) / acceleration
+    return np.where(cruise >= 0, full, short)
+
+
+def trip_geometry(layout: BaseLayout):
+    """Per patch the distance of the mining position and of the townhall contact point to the townhall center."""
+    mining_distance = layout.patch_distances - layout.patch_radius - PROBE_RADIUS
+    # The footprint is a square, a worker touches it earlier on the diagonals
+    axis = np.maximum(np.abs(np.cos(layout.patch_angles)), np.abs(np.sin(layout.patch_angles)))
+    contact_distance = layout.townhall_half_size / axis + PROBE_RADIUS
+    return mining_distance, contact_distance
+
+
+def return_loops(layout: BaseLayout, policies: Sequence[StackingPolicy], game_step: int = 1) -> np.ndarray:
+    """Expected return trip time per policy and patch, inf where workers stall."""
+    mining_distance, contact_distance = trip_geometry(layout)
+    native = travel_loops(mining_distance - contact_distance)
+    stacking = np.array([policy.threshold is not None for policy in policies])[:, None]
+    threshold = np.array([policy.threshold or 0.0 for policy in policies])[:, None]
+    distance_offset = np.array([policy.distance_offset for policy in policies], dtype=float)[:, None]
+    distance_factor = np.array([policy.distance_factor for policy in policies], dtype=float)[:, None]
+
+    drop_distance = layout.townhall_radius * distance_factor + distance_offset
+    switch_distance = drop_distance + threshold
+    # Return issued in the threshold window: no deceleration, the cargo is dropped on contact
+    caught = travel_loops(mining_distance - contact_distance, stop=False)
+    # Window missed between two frames: stop at the drop point (or at the townhall), then return
+    missed = np.where(
+        drop_distance >= contact_distance,
+        travel_loops(mining_distance - drop_distance) + travel_loops(drop_distance - contact_distance, stop=False),
+        native + game_step,
+    )
+    window = switch_distance - np.maximum(contact_distance, drop_distance - threshold)
+    caught_probability = np.clip(window / (PROBE_SPEED * game_step), 0.0, 1.0)
+    loops = caught_probability * caught + (1 - caught_probability) * missed
+    loops = np.where(switch_distance < contact_distance, np.inf, loops)
+    return np.where(stacking, loops, native)
+
+
+def assign_workers(patches: int, workers: int, patch_distances: np.ndarray) -> np.ndarray:
+    """Two workers per patch, closest patches first, then a third one on the closest patches."""
+    order = np.argsort(patch_distances, kind="stable")
+    slots = np.concatenate((np.repeat(order, 2), order))
+    return slots[np.arange(workers) % len(slots)] if workers > len(slots) else slots[:workers]
+
+
+def simulate(
+    layout: BaseLayout,
+    policies: Sequence[StackingPolicy],
+    workers: int = 16,
+    minutes: float = 5.0,
+    game_step: int = 1,
+    warmup_seconds: float = 20.0,
+    seed: int = 0,
+) -> np.ndarray:
+    """Mineral income per minute for every policy, after a warmup while the workers spread out."""
+    rng = np.random.default_rng(seed)
+    simulations, patches = len(policies), len(layout.patch_distances)
+    patch_of = assign_workers(patches, workers, layout.patch_distances)
+
+    mining_distance, contact_distance = trip_geometry(layout)
+    to_patch = travel_loops(mining_distance - contact_distance)
+    to_townhall = return_loops(layout, policies, game_step)
+
+    # Workers of every patch, patches with fewer workers padded with a worker that never arrives
+    slots = np.bincount(patch_of, minlength=patches).max(initial=0)
+    members = np.zeros((patches, slots), dtype=np.int64)
+    present = np.arange(slots) < np.bincount(patch_of, minlength=patches)[:, None]
+    members[present] = np.argsort(patch_of, kind="stable")
+    # Game loop every worker reaches its patch next, workers start next to the townhall with a bit of spread
+    start = to_patch[patch_of] + rng.uniform(0, 8, size=(simulations, workers))
+    arrival = np.where(present, start[:, members], np.inf)
+
+    free = np.zeros((simulations, patches))
+    collected = np.zeros(simulations)
+    warmup_loops = warmup_seconds * GAME_LOOPS_PER_SECOND
+    end_loop = warmup_loops + minutes * LOOPS_PER_MINUTE
+    simulation_index, patch_index = np.ogrid[:simulations, :patches]
+    while True:
+        # Every patch serves the worker that reached it first, once the previous one is done
+        slot = arrival.argmin(axis=2)
+        arrived = arrival[simulation_index, patch_index, slot]
+        active = arrived < end_loop
+        if not active.any():
+            break
+        mined = np.maximum(arrived, free) + MINING_LOOPS
+        dropped = mined + to_townhall
+        collected += MINERALS_PER_TRIP * (active & (dropped >= warmup_loops) & (dropped < end_loop)).sum(axis=1)
+        free = np.where(active, mined, free)
+        arrival[simulation_index, patch_index, slot] = np.where(active, dropped + to_patch, np.inf)
+
+    return collected / minutes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker stacking policies on a standard base")
+    parser.add_argument("--simulations", type=int, default=400, help="policies evaluated at once")
+    parser.add_argument("--minutes", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--game-step", type=int, default=1)
+    args = parser.parse_args()
+
+    layout = standard_layout()
+    side = int(math.sqrt(args.simulations))
+    thresholds = np.linspace(0.01, 1.0, side)
+    offsets = np.linspace(0.0, 1.0, side)
+    policies = [StackingPolicy()] + [StackingPolicy(t, o) for t in thresholds for o in offsets]
+
+    start = time.perf_counter()
+    income = simulate(layout, policies, args.workers, args.minutes, args.game_step)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Simulated {len(policies) * args.minutes:.0f} base minutes in {elapsed:.2f}s ({len(policies) * args.minutes / elapsed:.0f} per second)")
+
+    logger.info(f"No stacking: {income[0]:.0f} minerals per minute")
+    best = np.argsort(income[1:])[::-1][:10] + 1
+    for index in best:
+        policy = policies[index]
+        logger.info(f"threshold {policy.threshold:.3f} offset {policy.distance_offset:.3f}: {income[index]:.0f} minerals per minute")
+    stalled = sum(1 for value in income[1:] if value == 0)
+    if stalled:
+        logger.info(f"{stalled} policies stall (drop point plus threshold inside the townhall)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Zero-copy NumPy views of a pysc2 observation, with vectorized unit selectors.
+
+The agents treated every feature unit as a Python object: pick one at random, read
+`unit['assigned_harvesters']` or `unit.x`, try again next step if it did not fit. `ObservationView`
+keeps the arrays of the observation as they are and only changes how they are looked at:
+
+- `units` is the (N, K) `feature_units` array seen as N records with one field per
+  `features.FeatureUnit` column (`units['assigned_harvesters']`, `units['x']`), no copy made.
+- `screen` / `minimap` give the layers of `feature_screen` / `feature_minimap` by name
+  (`view.minimap.player_relative`), each a view into the observation array.
+- the selectors answer questions like "own drones on screen" or "extractors under 3
+  harvesters" with boolean masks over all units at once, starting from the rows of the wanted
+  types in the `FeatureUnitIndex` of the observation.
+
+    view = ObservationView(obs)
+    position = view.random_position(view.own(units.Zerg.Drone, on_screen=True))
+    extractors = view.under_harvesters(units.Zerg.Extractor, 3)
+"""
+
+import random
+from typing import Optional, Tuple
+
+import numpy as np
+from pysc2.lib import features
+
+from feature_unit_index import FeatureUnitIndex, UnitTypes
+
+
+def structured_view(array: np.ndarray, names) -> np.ndarray:
+    """(N, K) array as N records with the given field names, a view of the same memory when possible."""
+    array = np.asarray(array)
+    columns = array.shape[1] if array.ndim == 2 else len(names)
+    fields = [names[column] if column < len(names) else f"column_{column}" for column in range(columns)]
+    dtype = np.dtype([(name, array.dtype) for name in fields])
+    if array.ndim != 2 or not array.size:
+        return np.zeros(0, dtype=dtype)
+    # A view needs contiguous rows, only a sliced observation array is copied
+    return np.ascontiguousarray(array).view(dtype).reshape(-1)
+
+
+class LayerStack:
+    """Named layers of a (layers, height, width) feature array, every layer a view."""
+
+    def __init__(self, array, layer_features):
+        self.array = np.asarray(array)
+        self.indices = {feature.name: feature.index for feature in layer_features}
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        indices = self.__dict__.get("indices", {})
+        if name not in indices:
+            raise AttributeError(name)
+        return self.array[indices[name]]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.array[self.indices[name]]
+
+
+class ObservationView:
+    def __init__(self, obs):
+        observation = obs.observation
+        self.index = FeatureUnitIndex(observation.feature_units)
+        self.units = structured_view(self.index.array, [column.name for column in features.FeatureUnit])
+        self.screen = LayerStack(observation.feature_screen, features.SCREEN_FEATURES)
+        self.minimap = LayerStack(observation.feature_minimap, features.MINIMAP_FEATURES)
+
+    # Selectors, all return a boolean mask over self.units
+
+    def of_type(self, unit_types: UnitTypes) -> np.ndarray:
+        mask = np.zeros(len(self.units), dtype=bool)
+        mask[self.index.rows(unit_types)] = True
+        return mask
+
+    def own(self, unit_types: UnitTypes, on_screen: bool = False) -> np.ndarray:
+        """Own units of the given type(s), optionally only those with x, y >= 0."""
+        mask = self.of_type(unit_types) & (self.units["alliance"] == features.PlayerRelative.SELF)
+        if on_screen:
+            mask &= self.on_screen()
+        return mask
+
+    def on_screen(self) -> np.ndarray:
+        return (self.units["x"] >= 0) & (self.units["y"] >= 0)
+
+    def under_harvesters(self, unit_types: UnitTypes, limit: int) -> np.ndarray:
+        """Own townhalls / gas buildings of the given type(s) with fewer than `limit` assigned harvesters."""
+        return self.own(unit_types) & (self.units["assigned_harvesters"] < limit)
+
+    # Results
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        """Screen (x, y) of the selected units, one row per unit."""
+        selected = self.units[mask]
+        return np.stack([selected["x"], selected["y"]], axis=1)
+
+    def random_position(self, mask: np.ndarray) -> Optional[Tuple[int, int]]:
+        """Screen position of a random selected unit, None if the mask selects nothing."""
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return None
+        unit = self.units[rows[random.randrange(len(rows))]]
+        return int(unit["x"]), int(unit["y"])
@@ -0,0 +1,264 @@
+"""
+Parameter sweeps over the bot tunables.
+
+A sweep spec (JSON) names a backend and the parameters to search:
+
+    {
+        "backend": "fake",             # "sim" (mining_sim), "fake" (fake_game) or "game" (headless SC2)
+        "bot": "ZealotChargeBot",
+        "search": "random",            # "grid" or "random"
+        "samples": 200,                # random search only
+        "repeats": 1,
+        "seed": 0,
+        "settings": {"loops": 13440},  # passed to the backend
+        "params": {
+            "max_probes": [44, 55, 66],
+            "supply_buffer": {"min": 2, "max": 8, "int": true},
+            "townhall_distance_threshold": {"min": 0.01, "max": 0.5}
+        }
+    }
+
+Runs are fanned out over a process pool (one worker per core by default). Every finished run is
+written to SQLite right away, keyed by its parameters and repeat, so an interrupted sweep resumes
+where it stopped when started again with the same spec and database.
+
+    python param_sweep.py sweep.json --db sweeps/sweep.sqlite --metric minerals_collected
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+BACKENDS = ("sim", "fake", "game")
+
+
+def expand_runs(spec: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any], int]]:
+    """All (run id, params, repeat) of a spec, in a stable order so a resumed sweep finds its runs again."""
+    params = spec["params"]
+    names = sorted(params)
+    if spec.get("search", "grid") == "grid":
+        for name in names:
+            if not isinstance(params[name], list):
+                raise ValueError(f"Grid search needs a list of values for {name}")
+        combinations: Iterator[Dict[str, Any]] = (dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names)))
+    else:
+        rng = random.Random(spec.get("seed", 0))
+        combinations = (
+            {name: _sample(rng, params[name]) for name in names} for _ in range(spec.get("samples", 100))
+        )
+
+    runs = []
+    for combination in combinations:
+        for repeat in range(spec.get("repeats", 1)):
+            key = json.dumps({"params": combination, "repeat": repeat, "backend": spec["backend"], "bot": spec.get("bot")}, sort_keys=True)
+            runs.append((hashlib.sha1(key.encode()).hexdigest(), combination, repeat))
+    return runs
+
+
+def _sample(rng: random.Random, values):
+    if isinstance(values, list):
+        return rng.choice(values)
+    if values.get("int"):
+        return rng.randint(values["min"], values["max"])
+    return rng.uniform(values["min"], values["max"])
+
+
+def apply_params(bot, params: Dict[str, Any]):
+    """Set the tunables on a freshly constructed bot, including the helpers built from them in __init__."""
+    for name, value in params.items():
+        if not hasattr(bot, name):
+            raise ValueError(f"{type(bot).__name__} has no tunable {name}")
+        setattr(bot, name, value)
+    if "townhall_distance_threshold" in params:
+        threshold = params["townhall_distance_threshold"]
+        if hasattr(bot, "stacking_micro"):
+            bot.stacking_micro.threshold = threshold
+        # The bots place their drop points at the stacking threshold, keep both in sync
+        for cache in ("drop_points", "base_geometry"):
+            if hasattr(bot, cache):
+                getattr(bot, cache).distance_offset = threshold
+    if "supply_buffer" in params and hasattr(bot, "supply_planner"):
+        bot.supply_planner.buffer = params["supply_buffer"]
+    if "townhall_distance_factor" in params:
+        for cache in ("drop_points", "base_geometry"):
+            if hasattr(bot, cache):
+                getattr(bot, cache).distance_factor = params["townhall_distance_factor"]
+
+
+def run_one(backend: str, bot_name: str, params: Dict[str, Any], repeat: int, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Evaluate one parameter set, runs in a pool worker."""
+    if backend == "sim":
+        from mining_sim import StackingPolicy, simulate, standard_layout
+
+        # Same model as the bots (see apply_params): the drop point offset is the stacking threshold.
+        # Without a threshold the workers do not stack and the drop point sits on the townhall edge.
+        # "distance_offset" is a sim-only param to sweep the offset on its own.
+        threshold = params.get("townhall_distance_threshold")
+        policy = StackingPolicy(
+            threshold,
+            params.get("distance_offset", threshold if threshold is not None else 0.0),
+            params.get("townhall_distance_factor", 1.0),
+        )
+        income = simulate(
+            standard_layout(),
+            [policy],
+            workers=params.get("workers", settings.get("workers", 16)),
+            minutes=settings.get("minutes", 5.0),
+            game_step=settings.get("game_step", 1),
+            seed=repeat,
+        )
+        return {"income_per_minute": float(income[0])}
+
+    from fake_game import load_bot
+
+    bot = load_bot(bot_name)
+    apply_params(bot, params)
+    if backend == "fake":
+        from fake_game import FakeGame, run_fake_game
+
+        random.seed(repeat)
+        game, latencies = asyncio.run(
+            run_fake_game(bot, FakeGame(workers=settings.get("workers", 12)), settings.get("loops", 13440))
+        )
+        return {
+            "minerals_collected": game.minerals_collected,
+            "vespene_collected": game.vespene_collected,
+            "units": sum(1 for u in game.units.values() if u.alliance == 1),
+            "actions": len(game.actions),
+            "action_errors": game.action_errors,
+            "on_step_p95_ms": latencies.percentile(95) * 1000,
+        }
+
+    from sc2 import maps
+    from sc2.data import Difficulty, Race, Result
+    from sc2.main import run_game
+    from sc2.player import Bot, Computer
+
+    result = run_game(
+        maps.get(settings.get("map", "AbyssalReefLE")),
+        [Bot(Race.Protoss, bot), Computer(Race.Terran, Difficulty[settings.get("difficulty", "Hard")])],
+        realtime=False,
+        random_seed=repeat,
+    )
+    return {"victory": int(result == Result.Victory), "result": result.name, "game_time": bot.time}
+
+
+def _init_worker():
+    # The bots log every decision, a sweep only needs the metrics
+    logger.remove()
+
+
+class SweepStore:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, params TEXT, repeat INTEGER, status TEXT, metrics TEXT, "
+            "error TEXT, seconds REAL, finished_at REAL)"
+        )
+        self.connection.commit()
+
+    def finished(self) -> set:
+        return {row[0] for row in self.connection.execute("SELECT run_id FROM runs WHERE status = 'done'")}
+
+    def save(self, run_id: str, params: Dict[str, Any], repeat: int, metrics: Optional[Dict[str, Any]] = None, error: Optional[str] = None, seconds: float = 0.0):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                json.dumps(params, sort_keys=True),
+                repeat,
+                "failed" if error else "done",
+                json.dumps(metrics) if metrics is not None else None,
+                error,
+                seconds,
+                time.time(),
+            ),
+        )
+        self.connection.commit()
+
+    def results(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        rows = self.connection.execute("SELECT params, metrics FROM runs WHERE status = 'done'")
+        return [(json.loads(params), json.loads(metrics)) for params, metrics in rows]
+
+
+def _timed_run(backend: str, bot_name: str, params: Dict[str, Any], repeat: int, settings: Dict[str, Any]):
+    start = time.perf_counter()
+    metrics = run_one(backend, bot_name, params, repeat, settings)
+    return metrics, time.perf_counter() - start
+
+
+def run_sweep(spec: Dict[str, Any], db_path: str, workers: Optional[int] = None) -> SweepStore:
+    if spec["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown backend {spec['backend']}, expected one of {BACKENDS}")
+    store = SweepStore(db_path)
+    runs = expand_runs(spec)
+    done = store.finished()
+    pending = [run for run in runs if run[0] not in done]
+    logger.info(f"{len(runs)} runs in the sweep, {len(runs) - len(pending)} already done, {len(pending)} to go")
+    if not pending:
+        return store
+
+    workers = workers or os.cpu_count()
+    settings = spec.get("settings", {})
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(_timed_run, spec["backend"], spec.get("bot"), params, repeat, settings): (run_id, params, repeat)
+            for run_id, params, repeat in pending
+        }
+        for completed, future in enumerate(as_completed(futures), 1):
+            run_id, params, repeat = futures[future]
+            try:
+                metrics, seconds = future.result()
+                store.save(run_id, params, repeat, metrics=metrics, seconds=seconds)
+            except Exception as error:
+                logger.warning(f"Run {params} (repeat {repeat}) failed: {error!r}")
+                store.save(run_id, params, repeat, error=repr(error))
+            if completed % max(1, len(pending) // 20) == 0:
+                elapsed = time.perf_counter() - start
+                logger.info(f"{completed}/{len(pending)} runs done, {completed / elapsed:.1f} runs per second")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep bot tunables over a process pool")
+    parser.add_argument("spec", help="JSON sweep spec")
+    parser.add_argument("--db", default="sweeps/sweep.sqlite")
+    parser.add_argument("--workers", type=int, default=None, help="pool size, defaults to the number of cores")
+    parser.add_argument("--metric", default=None, help="metric to rank the parameter sets by")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    store = run_sweep(spec, args.db, args.workers)
+
+    results = store.results()
+    if not results:
+        return
+    metric = args.metric or next(iter(results[0][1]))
+    # Average the repeats of every parameter set
+    grouped: Dict[str, List[float]] = {}
+    for params, metrics in results:
+        grouped.setdefault(json.dumps(params, sort_keys=True), []).append(metrics[metric])
+    ranking = sorted(grouped.items(), key=lambda item: sum(item[1]) / len(item[1]), reverse=True)
+    for params, values in ranking[: args.top]:
+        logger.info(f"{metric} {sum(values) / len(values):.2f} ({len(values)} runs): {params}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Local placement engine.
+
+`find_placement` asks the server, and with a small placement step it probes many candidate
+points, each one a query. This engine keeps an occupancy grid built from
+`game_info.placement_grid`, mineral fields, geysers, destructables and all structures, and the
+power fields of ready pylons. The bot updates it when construction starts, completes or a
+structure dies. A placement lookup is then a few NumPy operations. Only the nearest candidates
+are confirmed with one `can_place_single` query each.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+from sc2.unit import Unit
+
+PYLON_POWER_RADIUS = 6.5
+# Buildings that can be placed without pylon power
+UNPOWERED_BUILDINGS = {UnitTypeId.PYLON, UnitTypeId.NEXUS, UnitTypeId.ASSIMILATOR}
+# Footprint sizes (width == height) of the buildings the bots place
+BUILDING_SIZE = {
+    UnitTypeId.PYLON: 2,
+    UnitTypeId.SHIELDBATTERY: 2,
+    UnitTypeId.PHOTONCANNON: 2,
+    UnitTypeId.DARKSHRINE: 2,
+    UnitTypeId.GATEWAY: 3,
+    UnitTypeId.WARPGATE: 3,
+    UnitTypeId.FORGE: 3,
+    UnitTypeId.CYBERNETICSCORE: 3,
+    UnitTypeId.TWILIGHTCOUNCIL: 3,
+    UnitTypeId.TEMPLARARCHIVE: 3,
+    UnitTypeId.ROBOTICSFACILITY: 3,
+    UnitTypeId.ROBOTICSBAY: 3,
+    UnitTypeId.STARGATE: 3,
+    UnitTypeId.FLEETBEACON: 3,
+    UnitTypeId.ASSIMILATOR: 3,
+    UnitTypeId.NEXUS: 5,
+}
+# A reserved spot is released if no construction started there after this many game loops
+RESERVATION_LOOPS = 448
+
+Footprint = Tuple[int, int, int, int]
+
+
+class PlacementGrid:
+    def __init__(self, bot):
+        self.bot = bot
+        # [y, x] grids, buildable terrain and the number of footprints covering each cell
+        self.buildable: Optional[np.ndarray] = None
+        self.occupied: Optional[np.ndarray] = None
+        # Footprint of every structure / resource / destructable by tag
+        self.footprints: Dict[int, Footprint] = {}
+        # Spots handed out to builders that have not started construction yet: footprint -> game loop
+        self.reservations: Dict[Footprint, int] = {}
+        # Ready pylons by tag
+        self.power_sources: Dict[int, Point2] = {}
+
+        self.lookups = 0
+        self.confirmations = 0
+        self.rejected = 0
+
+    def setup(self):
+        """Build the grids from the game info and the current units, call in on_start."""
+        self.buildable = self.bot.game_info.placement_grid.data_numpy.astype(bool)
+        self.occupied = np.zeros(self.buildable.shape, dtype=np.uint8)
+        self.footprints.clear()
+        self.reservations.clear()
+        self.power_sources.clear()
+        for unit in self.bot.mineral_field:
+            self.add_unit(unit)
+        for unit in self.bot.vespene_geyser:
+            self.add_unit(unit)
+        for unit in self.bot.destructables:
+            self.add_unit(unit)
+        for unit in self.bot.structures:
+            self.add_unit(unit)
+            if unit.is_ready:
+                self.add_power(unit)
+        for unit in self.bot.enemy_structures:
+            self.add_unit(unit)
+
+    def add_unit(self, unit: Unit):
+        """Mark the footprint of a structure, resource or destructable as occupied."""
+        if self.occupied is None or unit.tag in self.footprints:
+            return
+        footprint = self._unit_footprint(unit)
+        if footprint is None:
+            return
+        self.footprints[unit.tag] = footprint
+        self._mark(footprint, 1)
+
+    def add_power(self, unit: Unit):
+        """A structure finished, pylons start powering the area around them."""
+        if unit.type_id == UnitTypeId.PYLON:
+            self.power_sources[unit.tag] = unit.position
+
+    def remove_unit(self, unit_tag: int):
+        footprint = self.footprints.pop(unit_tag, None)
+        if footprint is not None:
+            self._mark(footprint, -1)
+        self.power_sources.pop(unit_tag, None)
+
+    def reserve(self, building: UnitTypeId, position: Point2):
+        """
+        Keep a spot free for a builder on its way, until construction starts or the reservation expires.
+        Reserving a spot again renews its reservation.
+        """
+        footprint = self._footprint(position, *self._size(building))
+        if self.occupied is None:
+            return
+        if footprint not in self.reservations:
+            self._mark(footprint, 1)
+        self.reservations[footprint] = self.bot.state.game_loop
+
+    def candidates(self, building: UnitTypeId, near: Union[Point2, Unit], max_distance: int = 15) -> List[Point2]:
+        """All locally valid positions for the building within max_distance, nearest first."""
+        self._expire_reservations()
+        near = near.position if isinstance(near, Unit) else Point2(near[:2])
+        width, height = self._size(building)
+        map_height, map_width = self.buildable.shape
+        x0, y0 = max(int(near.x) - max_distance, 0), max(int(near.y) - max_distance, 0)
+        x1, y1 = min(int(near.x) + max_distance + 1, map_width), min(int(near.y) + max_distance + 1, map_height)
+        if x1 - x0 < width or y1 - y0 < height:
+            return []
+
+        # Integral image of the free cells, every window of the footprint size that is fully free is a candidate
+        free = (self.buildable[y0:y1, x0:x1] & (self.occupied[y0:y1, x0:x1] == 0)).astype(np.int32)
+        integral = np.zeros((free.shape[0] + 1, free.shape[1] + 1), dtype=np.int32)
+        integral[1:, 1:] = free.cumsum(0).cumsum(1)
+        window = (
+            integral[height:, width:] - integral[:-height, width:] - integral[height:, :-width] + integral[:-height, :-width]
+        )
+        rows, columns = np.nonzero(window == width * height)
+        centers_x = x0 + columns + width / 2
+        centers_y = y0 + rows + height / 2
+
+        if building not in UNPOWERED_BUILDINGS:
+            if not self.power_sources:
+                return []
+            pylons = np.array([(p.x, p.y) for p in self.power_sources.values()])
+            distances = (centers_x[:, None] - pylons[:, 0]) ** 2 + (centers_y[:, None] - pylons[:, 1]) ** 2
+            powered = (distances <= PYLON_POWER_RADIUS**2).any(axis=1)
+            centers_x, centers_y = centers_x[powered], centers_y[powered]
+
+        distances = (centers_x - near.x) ** 2 + (centers_y - near.y) ** 2
+        in_range = distances <= max_distance**2
+        order = np.argsort(distances[in_range], kind="stable")
+        return [Point2((x, y)) for x, y in zip(centers_x[in_range][order].tolist(), centers_y[in_range][order].tolist())]
+
+    async def find_placement(
+        self, building: UnitTypeId, near: Union[Point2, Unit], max_distance: int = 15, confirmations: int = 3
+    ) -> Optional[Point2]:
+        """Nearest valid position, confirmed by the server. Falls back to BotAI.find_placement if the local grid is wrong."""
+        # BotAI.find_placement only takes a Point2
+        near = near.position if isinstance(near, Unit) else Point2(near[:2])
+        if self.occupied is None:
+            return await self.bot.find_placement(building, near, max_distance=max_distance, placement_step=1)
+        self.lookups += 1
+        for position in self.candidates(building, near, max_distance)[:confirmations]:
+            self.confirmations += 1
+            if await self.bot.can_place_single(building, position):
+                return position
+            # Something we do not track (e.g. a unit or creep) blocks it, keep it out of the next lookups for a while
+            self.rejected += 1
+            self.reserve(building, position)
+        return await self.bot.find_placement(building, near, max_distance=max_distance, placement_step=2)
+
+    def _expire_reservations(self):
+        game_loop = self.bot.state.game_loop
+        expired = [footprint for footprint, loop in self.reservations.items() if game_loop - loop > RESERVATION_LOOPS]
+        for footprint in expired:
+            del self.reservations[footprint]
+            self._mark(footprint, -1)
+
+    def _mark(self, footprint: Footprint, amount: int):
+        x0, y0, x1, y1 = footprint
+        height, width = self.occupied.shape
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if amount > 0:
+            self.occupied[y0:y1, x0:x1] += amount
+        else:
+            # Never wrap around below zero
+            area = self.occupied[y0:y1, x0:x1]
+            area[area > 0] -= 1
+
+    def _unit_footprint(self, unit: Unit) -> Optional[Footprint]:
+        if unit.is_mineral_field:
+            return self._footprint(unit.position, 2, 1)
+        if unit.is_vespene_geyser:
+            return self._footprint(unit.position, 3, 3)
+        size = BUILDING_SIZE.get(unit.type_id) or round(2 * (unit.footprint_radius or 0))
+        if not size:
+            return None
+        return self._footprint(unit.position, size, size)
+
+    @staticmethod
+    def _size(building: UnitTypeId) -> Tuple[int, int]:
+        size = BUILDING_SIZE.get(building, 3)
+        return size, size
+
+    @staticmethod
+    def _footprint(center: Point2, width: int, height: int) -> Footprint:
+        x0 = int(round(center.x - width / 2))
+        y0 = int(round(center.y - height / 2))
+        return x0, y0, x0 + width, y0 + height
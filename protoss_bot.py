@@ -1,82 +1,126 @@
-from typing import Dict, Optional, Set, Union
+from typing import Optional, Union
 
 from loguru import logger
 
-from collections import deque
+import time
 
 from sc2 import maps
 from sc2.bot_ai import BotAI
-from sc2.data import Difficulty, Race
+from sc2.data import Difficulty, Race, Result
 from sc2.main import run_game
 from sc2.player import Bot, Computer
 from sc2.position import Point2
 from sc2.unit import Unit
-from sc2.units import Units
+from sc2.game_state import GameState
+from sc2.unit_command import UnitCommand
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
 
+from build_order import BuildOrder, free_geyser
+from command_filter import CommandFilter
+from mining_geometry import BaseGeometryCache, DropPointCache
+from placement import PlacementGrid
+from stacking_micro import StackingMicro
+from manager_profiler import ManagerProfiler
+from step_scheduler import LOW, StepScheduler
+from supply_planner import SupplyPlanner
+from timeline import ResourceTimeline
+from unit_index import UnitIndex
+from worker_ledger import WorkerLedger
+
 class WorkerStackBot(BotAI):
     def __init__(self):
-        self.worker_to_mineral_patch_dict: Dict[int, int] = {}
-        self.mineral_patch_to_list_of_workers: Dict[int, Set[int]] = {}
-        self.minerals_sorted_by_distance: Units = Units([], self)
+        self.ledger = WorkerLedger()
         self.townhall_distance_threshold = 0.15
         self.townhall_distance_factor = 1
+        # Mineral patch -> nexus and drop point, rebuilt when a nexus finishes or dies
+        self.drop_points = DropPointCache(distance_offset=self.townhall_distance_threshold)
+        # Patch order, near / far rows and drop points of every base, analyzed once in on_start
+        self.base_geometry = BaseGeometryCache(distance_offset=self.townhall_distance_threshold)
+        # Decide the stacking orders of all mineral workers in one vectorized pass
+        self.batched_worker_micro = True
+        self.stacking_micro = StackingMicro(self.townhall_distance_threshold)
+        # Drops orders the units are already executing before they reach the game
+        self.command_filter = CommandFilter()
+        # Own units by (type, ready, idle), rebuilt once per game loop
+        self.unit_index = UnitIndex(self)
+        # Local occupancy / pylon power grid, the server only confirms the chosen building spot
+        self.placement = PlacementGrid(self)
         self.cybercore_started = False
         self.max_probes = 70
         self.supply_buffer = 4
+        # Projected income, and the pylons the production will need over the next seconds
+        self.timeline = ResourceTimeline()
+        self.supply_planner = SupplyPlanner(buffer=self.supply_buffer)
         self.builders = set()
 
-        self.build_order_queue = deque([
-            UnitTypeId.GATEWAY,
-            UnitTypeId.ASSIMILATOR,
-            UnitTypeId.CYBERNETICSCORE,
-            # Add more buildings as needed for your build order...
-        ])
+        # Build order from build_orders/worker_stack.json, steps are evaluated one at a time from the construction hooks
+        self.opening = BuildOrder.load("worker_stack")
+
+        # on_step managers with their cadence in game loops, low priority ones are deferred when the frame is over budget
+        # Per manager latency / round-trip histograms, logged every 60 game seconds and written to profiles/ on game end
+        self.profiler = ManagerProfiler(log_interval=60)
+        self.scheduler = StepScheduler(frame_budget=0.02, profiler=self.profiler)
+        self.scheduler.add(self.manage_worker_task, every=1)
+        self.scheduler.add(self.produce_probes, every=4)
+        self.scheduler.add(self.handle_idle_workers, every=4, priority=LOW)
+        self.scheduler.add(self.manage_supply, every=8, priority=LOW)
+        self.scheduler.add(self.manage_build_order, every=8)
 
     async def on_start(self):
         self.client.game_step = 1
+        self.profiler.attach(self.client)
         await self.chat_send("(glhf)")
+        self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+        self.base_geometry.analyze(self.expansion_locations_dict)
+        self.placement.setup()
+        self.opening.setup(self.structures)
         await self.assign_initial_workers()
         
+    def do(self, action: UnitCommand, subtract_cost: bool = False, subtract_supply: bool = False, can_afford_check: bool = False, ignore_warning: bool = False) -> bool:
+        # Redundant orders are dropped, the unit is already doing what was asked
+        if not self.command_filter.allow(action, self.state.game_loop):
+            return True
+        return super().do(action, subtract_cost, subtract_supply, can_afford_check, ignore_warning)
+
+    def _prepare_step(self, state: GameState, proto_game_info):
+        super()._prepare_step(state, proto_game_info)
+        # Group the units of the new observation once, the type queries of the frame are answered from it
+        self.unit_index.refresh()
+
     async def on_step(self, iteration: int):
-        await self.manage_worker_task()
-        await self.produce_probes()
-        await self.handle_idle_workers()
-        await self.manage_supply()
-        await self.manage_build_order()
-
-    async def build_next_building(self):
-        """Build the next building in the build order queue"""
-        if self.build_order_queue:  # Fix for possible IndexError
-            next_building = self.build_order_queue[0]
-            building_place = await self.get_next_building_placement(next_building)
-            logger.info(f"Building {next_building} at {building_place}")
-            self.build(next_building, near=building_place)
-        else:
-            logger.info("Build order queue is empty")
-            return
+        # Runs the managers registered in __init__ that are due this game loop
+        await self.scheduler.run(self.state.game_loop)
+        self.profiler.maybe_log(self.time)
+
+    async def on_end(self, game_result: Result):
+        self.profiler.dump(f"profiles/{type(self).__name__}_{int(time.time())}")
 
     async def manage_build_order(self):
-        """Manage build order queue"""
-        logger.info(f"Current build order queue: {self.build_order_queue}")
-
-        if self.build_order_queue and self.already_pending(self.build_order_queue[0]):
-            logger.info(f"Building {self.build_order_queue[0]} has been started. Removing from queue.")
-            self.build_order_queue.popleft()
-
-        if self.build_order_queue and self.can_afford(self.build_order_queue[0]):  
-            if self.build_order_queue[0] == UnitTypeId.ASSIMILATOR:
-                vgs = self.vespene_geyser.closer_than(10, self.townhalls.random)
-                if vgs:
-                    await self.build(self.build_order_queue[0], near=vgs.random)
-            elif self.build_order_queue[0] == UnitTypeId.PYLON:
-                await self.build(self.build_order_queue[0], near=self.townhalls.random.position.towards(self.game_info.map_center, 5))
-            else:
-                await self.build(self.build_order_queue[0], near=await self.find_placement(self.build_order_queue[0], self.townhalls.random.position.towards(self.game_info.map_center, 5)))
+        """Start the next step of the build order once it is affordable"""
+        step = self.opening.next_step(self)
+        if step is None or not self.can_afford(step.target):
+            return
 
+        if step.is_research:
+            for structure in self.unit_index(step.researched_from, ready=True, idle=True):
+                structure.research(step.target)
+                self.opening.issued(step, self.state.game_loop)
+                return
+            return
+
+        if step.target == UnitTypeId.ASSIMILATOR:
+            near = free_geyser(self)
+        else:
+            near = await self.placement.find_placement(step.target, self.townhalls.random.position.towards(self.game_info.map_center, 5))
+        if near is None:
+            logger.warning(f"No placement found for {step.target}")
+            return
+        if await self.build(step.target, near=near):
+            logger.info(f"Build order: {step.target} ({step.count}) started")
+            self.opening.issued(step, self.state.game_loop)
 
 
     async def build(self, building_type: UnitTypeId, near: Union[Point2, Unit] = None):
@@ -85,22 +129,27 @@ class WorkerStackBot(BotAI):
             if building_type == UnitTypeId.PYLON:
                 # build near nexus in a valid location
                 nexuses = self.townhalls.ready
-                near = await self.find_placement(building_type, nexuses.random.position.towards(self.game_info.map_center, 5), placement_step=1)
+                near = await self.placement.find_placement(building_type, nexuses.random.position.towards(self.game_info.map_center, 5))
            
             else:
                 # get pylon that is ready
-                pylons_ready = self.structures(UnitTypeId.PYLON).ready
+                pylons_ready = self.unit_index(UnitTypeId.PYLON, ready=True)
                 if not pylons_ready.exists:  # Check if we have any pylons that are ready
                     logger.warning("No pylon found")
                     return False
                 pylon = pylons_ready.closest_to(self.townhalls.random)
-                near = await self.find_placement(building_type, pylon, placement_step=10)
+                near = await self.placement.find_placement(building_type, pylon)
                 logger.info(f"Next building placement for {building_type} is {near}")
+            if near is None:
+                logger.warning(f"No placement found for {building_type}")
+                return False
         worker = self.select_build_worker(near)
         if worker:
             if self.can_afford(building_type):
                 self.builders.add(worker.tag)
-                worker.build(building_type, near) # TODO: check if building placement is valid
+                worker.build(building_type, near)
+                if isinstance(near, Point2):
+                    self.placement.reserve(building_type, near)
                 logger.info(f"Building {building_type} near {near}")
                 return True
             else:
@@ -111,27 +160,22 @@ class WorkerStackBot(BotAI):
 
 
          
-    async def get_next_building_placement(self, building_type: UnitTypeId):
-        # For now we'll just place the building next to the main Nexus
-        main_nexus = self.townhalls.ready.first
-        if main_nexus:
-            return await self.find_placement(building_type, main_nexus.position, placement_step=1)
-        else:
-            logger.error("No main Nexus found")
-            return None
-
     async def manage_supply(self):
-        if self.supply_left < self.supply_buffer and not self.already_pending(UnitTypeId.PYLON) and UnitTypeId.PYLON not in self.build_order_queue:
-            # add pylon to build order queue
-            self.build_order_queue.appendleft(UnitTypeId.PYLON)
-            logger.info(f"Added {UnitTypeId.PYLON} to build order queue")
-        elif self.supply_left > 2 * self.supply_buffer:
-            # remove pylon from build order queue
-            if UnitTypeId.PYLON in self.build_order_queue:
-                self.build_order_queue.remove(UnitTypeId.PYLON)
-                logger.info(f"Removed {UnitTypeId.PYLON} from build order queue")
-            
-                    
+        # Pylons for the supply production will need by the time they finish, several at once if needed
+        if not self.townhalls.ready:
+            return
+        self.timeline.refresh(self)
+        needed = self.supply_planner.pylons_needed(self, self.timeline.mineral_rate, self.max_probes)
+        if needed <= 0:
+            return
+        near = [townhall.position.towards(self.game_info.map_center, 5) for townhall in self.townhalls.ready]
+        workers = self.workers.filter(
+            lambda worker: worker.tag in self.ledger and worker.tag not in self.builders and (worker.is_gathering or worker.is_idle)
+        )
+        for worker in await self.supply_planner.build_pylons(self, self.placement, near, needed, workers):
+            self.builders.add(worker.tag)
+            logger.info(f"Worker {worker.tag} builds one of {needed} pylons needed")
+
     async def handle_idle_workers(self):
        for worker in self.workers.idle:
             if worker.tag in self.builders:
@@ -140,11 +184,10 @@ class WorkerStackBot(BotAI):
                 self.builders.discard(worker.tag)
 
             await self.assign_worker_to_mineral_patch(worker)
-            mineral_tag = self.worker_to_mineral_patch_dict.get(worker.tag, None)
+            mineral_tag = self.ledger.patch_of(worker.tag)
             if mineral_tag:
-                minerals_with_given_tag = self.mineral_field.filter(lambda m: m.tag == mineral_tag)
-                if minerals_with_given_tag:
-                    mineral = minerals_with_given_tag.first
+                mineral = self.unit_index.get(mineral_tag)
+                if mineral:
                     worker.gather(mineral)
                 else:
                     logger.warning(f"No mineral patch found with tag {mineral_tag}. Reassigning worker.")
@@ -158,42 +201,75 @@ class WorkerStackBot(BotAI):
                 if self.can_afford(UnitTypeId.PROBE):
                     nexus.train(UnitTypeId.PROBE)
 
+    def register_base(self, nexus: Unit):
+        """Add the mineral patches around a nexus to the ledger, closest patches are preferred."""
+        if nexus.tag in self.ledger.base_to_patches:
+            return
+        geometry = self.base_geometry.for_townhall(nexus)
+        if geometry is not None:
+            self.ledger.add_base(nexus.tag, geometry.ranked())
+            return
+        minerals_near_nexus = self.mineral_field.closer_than(10, nexus.position)
+        self.ledger.add_base(nexus.tag, ((mineral.tag, mineral.distance_to(nexus)) for mineral in minerals_near_nexus))
+
     async def assign_initial_workers(self):
         for nexus in self.townhalls:  # loop through all nexuses
-            minerals_near_nexus = self.mineral_field.closer_than(10, nexus.position).sorted_by_distance_to(nexus.position)
-            for mineral in minerals_near_nexus:
-                workers = self.workers.tags_not_in(self.worker_to_mineral_patch_dict).sorted_by_distance_to(mineral)
+            self.register_base(nexus)
+            geometry = self.base_geometry.for_townhall(nexus)
+            if geometry is None:
+                continue
+            # Patches are already ordered closest first
+            for patch in geometry.patches:
+                workers = self.workers.tags_not_in(self.ledger.worker_to_patch).sorted_by_distance_to(patch.position)
                 for worker in workers:
                     # set worker.is_builder to False to allow it to be assigned to mine
                     worker.is_builder = False
-                    if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, [])) < 2:
-                        self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                        self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
+                    if self.ledger.count(patch.tag) < 2:
+                        self.ledger.assign(worker.tag, patch.tag)
 
     async def assign_worker_to_mineral_patch(self, worker: Unit):
-        # Populate the list of minerals sorted by distance if it's empty
-        if not self.minerals_sorted_by_distance:
-            print("Sorting minerals by distance")
-            self.minerals_sorted_by_distance = self.mineral_field.sorted_by_distance_to(self.townhalls.closest_to(worker))
-        
+        if not self.townhalls:
+            return
         closest_nexus = self.townhalls.closest_to(worker)
-        minerals_near_nexus = self.mineral_field.closer_than(10, closest_nexus.position).sorted_by_distance_to(worker.position)
-        
-        # Try to assign optimally first
-        for mineral in minerals_near_nexus:
-            if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set())) < 2:
-                self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-                return
-                
-        # If everything is saturated, assign to the closest mineral for sub-optimal mining
-        closest_mineral = self.minerals_sorted_by_distance[0]
-        self.mineral_patch_to_list_of_workers.setdefault(closest_mineral.tag, set()).add(worker.tag)
-        self.worker_to_mineral_patch_dict[worker.tag] = closest_mineral.tag
+        self.register_base(closest_nexus)
+
+        # The least saturated patch of the closest nexus, even if it already has 2 workers (sub-optimal mining)
+        mineral_tag = self.ledger.least_saturated_patch(closest_nexus.tag)
+        if mineral_tag is not None:
+            self.ledger.assign(worker.tag, mineral_tag)
+
+    async def on_building_construction_started(self, unit: Unit):
+        self.placement.add_unit(unit)
+        self.opening.add_structure(unit)
+
+    async def on_building_construction_complete(self, unit: Unit):
+        self.placement.add_power(unit)
+        self.opening.complete_structure(unit)
+        if unit.type_id == UnitTypeId.NEXUS:
+            self.register_base(unit)
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+
+    async def on_unit_created(self, unit: Unit):
+        if unit.type_id == UnitTypeId.PROBE and self.townhalls:
+            await self.assign_worker_to_mineral_patch(unit)
+
+    async def on_unit_destroyed(self, unit_tag: int):
+        # drop the dead worker, mined out patch or destroyed nexus from the ledger
+        self.ledger.remove_unit(unit_tag)
+        self.drop_points.forget(unit_tag)
+        self.base_geometry.forget(unit_tag)
+        self.command_filter.forget(unit_tag)
+        self.placement.remove_unit(unit_tag)
+        self.opening.remove_structure(unit_tag)
+        self.builders.discard(unit_tag)
+        unit = self._structures_previous_map.get(unit_tag)
+        if unit and unit.type_id == UnitTypeId.NEXUS:
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
 
     async def manage_worker_task(self):
         # Handle worker to mineral/gas assignments
-        minerals: Dict[int, Unit] = {mineral.tag: mineral for mineral in self.mineral_field}
+        # Workers handled by the batched micro, with their patch and drop point
+        batch_workers, batch_minerals, batch_drop_points = [], [], []
         for worker in self.workers:
             if worker.tag in self.builders:
                 continue  # Don't interfere with builders
@@ -201,24 +277,37 @@ class WorkerStackBot(BotAI):
             if not self.townhalls:
                 logger.error("All townhalls died - can't return resources")
                 break
-            if worker.tag in self.worker_to_mineral_patch_dict:
-                mineral_tag = self.worker_to_mineral_patch_dict[worker.tag]
-                mineral = minerals.get(mineral_tag, None)
+            if worker.tag in self.ledger:
+                mineral_tag = self.ledger.patch_of(worker.tag)
+                mineral = self.unit_index.get(mineral_tag)
             else:
                 await self.assign_worker_to_mineral_patch(worker)
-                mineral_tag = self.worker_to_mineral_patch_dict.get(worker.tag, None)
-                mineral = minerals.get(mineral_tag, None)
+                mineral_tag = self.ledger.patch_of(worker.tag)
+                mineral = self.unit_index.get(mineral_tag)
+
+            if self.batched_worker_micro and mineral:
+                drop_point = self.drop_points.get(mineral_tag)
+                if drop_point:
+                    batch_workers.append(worker)
+                    batch_minerals.append(mineral)
+                    batch_drop_points.append(drop_point.position)
+                    continue
 
             if not worker.is_carrying_minerals:
-                if not worker.is_gathering or worker.order_target != mineral.tag:
+                if mineral and (not worker.is_gathering or worker.order_target != mineral.tag):
                     worker.gather(mineral)
             else:
                 if mineral:
                     if not worker.is_gathering or worker.order_target != mineral.tag:
                         worker.gather(mineral)
-                th = self.townhalls.closest_to(worker)
-                # Calculate the point just in front of the Nexus
-                pos: Point2 = th.position.towards(worker.position, th.radius + self.townhall_distance_threshold)
+                drop_point = self.drop_points.get(mineral_tag)
+                if drop_point:
+                    # Cached point just in front of the Nexus
+                    pos: Point2 = drop_point.position
+                else:
+                    th = self.townhalls.closest_to(worker)
+                    # Calculate the point just in front of the Nexus
+                    pos: Point2 = th.position.towards(worker.position, th.radius + self.townhall_distance_threshold)
 
                 # If the worker is further away from that point, move it to that point
                 if worker.distance_to(pos) > self.townhall_distance_threshold:
@@ -230,6 +319,8 @@ class WorkerStackBot(BotAI):
                     if mineral:
                         worker.gather(mineral, queue=True)
 
+        # This bot never treats a base as oversaturated
+        self.stacking_micro.run(batch_workers, batch_minerals, batch_drop_points, [False] * len(batch_workers))
     
 
     # ... [ Other functions including handle_expansions, manage_buildings, etc. ]
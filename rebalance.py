@@ -0,0 +1,100 @@
+"""
+Global rebalancing of mineral workers over the patches of all bases.
+
+`resaturate` used to move workers one at a time from oversaturated to undersaturated nexuses,
+scanning all workers for every move. Here every patch offers as many slots as workers it can
+use (2 on near patches, 3 on far patches) and the mineral workers are matched to the slots in
+one go, minimizing the total travel distance. A worker that keeps its current patch costs
+nothing, so only the workers that really have to change patch get a new order.
+
+The matching uses the Hungarian method of SciPy when it is installed, otherwise a greedy pass
+over the cost matrix, cheapest pairs first.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sc2.position import Point2
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Extra cost of the third slot of a far patch, larger than any walk across the map:
+# a base with free first and second slots is always filled first
+EXTRA_SLOT_COST = 250.0
+
+
+class Slot(NamedTuple):
+    patch_tag: int
+    position: Point2
+    cost: float
+
+
+class MineralWorker(NamedTuple):
+    tag: int
+    position: Point2
+    # Patch the worker is assigned to in the ledger, None for idle workers
+    patch_tag: Optional[int]
+
+
+def patch_slots(patches: Iterable[Tuple[int, Point2, int]]) -> List[Slot]:
+    """Slots of (patch tag, position, optimal workers) patches, the slots past the second one cost extra."""
+    slots = []
+    for patch_tag, position, optimal_workers in patches:
+        for index in range(optimal_workers):
+            slots.append(Slot(patch_tag, position, EXTRA_SLOT_COST if index >= 2 else 0.0))
+    return slots
+
+
+def cost_matrix(workers: Sequence[MineralWorker], slots: Sequence[Slot]) -> np.ndarray:
+    """Walking distance of every worker to every slot, zero for the slots of the worker's own patch."""
+    worker_positions = np.array([worker.position for worker in workers], dtype=float).reshape(-1, 2)
+    slot_positions = np.array([slot.position for slot in slots], dtype=float).reshape(-1, 2)
+    costs = np.linalg.norm(worker_positions[:, None, :] - slot_positions[None, :, :], axis=2)
+    worker_patches = np.array([-1 if worker.patch_tag is None else worker.patch_tag for worker in workers], dtype=np.int64)
+    slot_patches = np.array([slot.patch_tag for slot in slots], dtype=np.int64)
+    costs[worker_patches[:, None] == slot_patches[None, :]] = 0.0
+    return costs + np.array([slot.cost for slot in slots])[None, :]
+
+
+def greedy_assignment(costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Match rows to columns cheapest pair first, same output as linear_sum_assignment."""
+    rows, columns = costs.shape
+    heap = [(cost, row, column) for (row, column), cost in np.ndenumerate(costs)]
+    heapq.heapify(heap)
+    row_taken = np.zeros(rows, dtype=bool)
+    column_taken = np.zeros(columns, dtype=bool)
+    matched_rows, matched_columns = [], []
+    while heap and len(matched_rows) < min(rows, columns):
+        _, row, column = heapq.heappop(heap)
+        if row_taken[row] or column_taken[column]:
+            continue
+        row_taken[row] = column_taken[column] = True
+        matched_rows.append(row)
+        matched_columns.append(column)
+    return np.array(matched_rows, dtype=np.int64), np.array(matched_columns, dtype=np.int64)
+
+
+def rebalance(workers: Sequence[MineralWorker], slots: Sequence[Slot]) -> Dict[int, int]:
+    """
+    New patch of every worker that has to move. Workers left without a slot (more workers than
+    slots) keep their patch.
+    """
+    if not workers or not slots:
+        return {}
+    costs = cost_matrix(workers, slots)
+    if linear_sum_assignment is not None:
+        rows, columns = linear_sum_assignment(costs)
+    else:
+        rows, columns = greedy_assignment(costs)
+
+    moves = {}
+    for row, column in zip(rows, columns):
+        worker, slot = workers[row], slots[column]
+        if worker.patch_tag != slot.patch_tag:
+            moves[worker.tag] = slot.patch_tag
+    return moves
@@ -0,0 +1,341 @@
+"""
+Record real games and replay the bot's decision loop offline.
+
+Recording wraps `Client._execute` while `run_game` runs. Every request the bot sends and every
+response it gets back (game data, game info, observations, queries, actions, steps) is appended to
+a recording file as `(game loop, request field, request bytes, response bytes)`.
+
+Replaying maps the file with mmap and feeds the recorded responses to any BotAI subclass through
+`ReplayClient`, following the same calls as `sc2.main`. No game client is needed and frames run at
+full speed. Queries are answered with the recorded response of the same frame. Actions are compared
+with the actions that were recorded in that frame, so a performance change can be checked for
+changed decisions.
+
+    python recorder.py record ZealotChargeBot recordings/zealot.sc2rec
+    python recorder.py replay ZealotChargeBot recordings/zealot.sc2rec
+"""
+
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Tuple
+
+from loguru import logger
+from s2clientprotocol import error_pb2 as error_pb
+from s2clientprotocol import query_pb2 as query_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2 import maps
+from sc2.bot_ai import BotAI
+from sc2.client import Client
+from sc2.data import Difficulty, Race, Status
+from sc2.game_state import GameState
+from sc2.main import run_game
+from sc2.player import Bot, Computer
+
+from fake_game import load_bot
+from manager_profiler import LatencyHistogram
+
+MAGIC = b"SC2REC01"
+# game loop, request field number, request length, response length
+RECORD_HEADER = struct.Struct("<IHII")
+REQUEST_FIELDS = sc_pb.Request.DESCRIPTOR.fields_by_name
+REQUEST_NAMES = {field.number: name for name, field in REQUEST_FIELDS.items()}
+# Requests answered with the latest recorded response if the replayed bot sends them in another frame
+STATIC_REQUESTS = {"data", "game_info", "ping"}
+
+# ability id, sorted unit tags, target (tag or rounded point), queued
+ActionKey = Tuple[int, Tuple[int, ...], object, bool]
+
+
+class GameRecorder:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.game_loop = 0
+        self.records = 0
+
+    def write(self, name: str, request, response: sc_pb.Response):
+        if name == "observation":
+            self.game_loop = response.observation.observation.game_loop
+        request_bytes = request.SerializeToString()
+        response_bytes = response.SerializeToString()
+        self.file.write(RECORD_HEADER.pack(self.game_loop, REQUEST_FIELDS[name].number, len(request_bytes), len(response_bytes)))
+        self.file.write(request_bytes)
+        self.file.write(response_bytes)
+        self.records += 1
+        if name == "step":
+            # One flush per frame, a crashed game still leaves a readable recording
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    @contextmanager
+    def attach(self):
+        """Record every request of every Client while the context is active."""
+        execute = Client._execute
+        recorder = self
+
+        async def recording_execute(client, **kwargs):
+            response = await execute(client, **kwargs)
+            (name, request), = kwargs.items()
+            recorder.write(name, request, response)
+            return response
+
+        Client._execute = recording_execute
+        try:
+            yield self
+        finally:
+            Client._execute = execute
+            self.close()
+
+
+def record_game(path: str, map_settings, players, **kwargs):
+    """run_game with every request and response of the bot written to path."""
+    with GameRecorder(path).attach() as recorder:
+        result = run_game(map_settings, players, **kwargs)
+    logger.info(f"Recorded {recorder.records} requests to {path}")
+    return result
+
+
+class Record(NamedTuple):
+    game_loop: int
+    name: str
+    # Offsets into the recording file
+    request_start: int
+    response_start: int
+    end: int
+
+
+class Recording:
+    """Read-only view of a recording file, records are only offsets into the memory map."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        self.records: List[Record] = []
+        offset = len(MAGIC)
+        while offset + RECORD_HEADER.size <= len(self._map):
+            game_loop, number, request_length, response_length = RECORD_HEADER.unpack_from(self._map, offset)
+            offset += RECORD_HEADER.size
+            end = offset + request_length + response_length
+            if end > len(self._map):
+                # Last record of a game that was cut off
+                break
+            self.records.append(Record(game_loop, REQUEST_NAMES[number], offset, offset + request_length, end))
+            offset = end
+
+        # Frame 0 holds the requests before the first observation, every observation starts a new frame
+        self.frames: List[List[Record]] = [[]]
+        for record in self.records:
+            if record.name == "observation":
+                self.frames.append([])
+            self.frames[-1].append(record)
+
+    def request(self, record: Record) -> bytes:
+        return self._map[record.request_start : record.response_start]
+
+    def response(self, record: Record) -> sc_pb.Response:
+        return sc_pb.Response.FromString(self._map[record.response_start : record.end])
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class ReplayClient(Client):
+    """Client that answers requests from a recording instead of a game."""
+
+    def __init__(self, recording: Recording):
+        # Protocol asserts a websocket, nothing is ever sent on it since _execute is replaced
+        super().__init__(ws=object())
+        # _execute sets the status from the responses of the game, a recording is in game until its result
+        self._status = Status.in_game
+        self.recording = recording
+        self.frame_index = 0
+        # Recorded requests of the current frame not answered yet, by request field and bytes
+        self._pending: Dict[Tuple[str, bytes], List[Record]] = defaultdict(list)
+        self._latest: Dict[str, Record] = {}
+        self.recorded_actions: Dict[int, Counter] = {}
+        self.replayed_actions: Dict[int, Counter] = defaultdict(Counter)
+        self.unanswered = Counter()
+        self._index_frame(0)
+
+    @property
+    def has_next_frame(self) -> bool:
+        return self.frame_index + 1 < len(self.recording.frames)
+
+    @property
+    def game_loop(self) -> int:
+        frame = self.recording.frames[self.frame_index]
+        return frame[0].game_loop if frame else 0
+
+    def _index_frame(self, index: int):
+        self.frame_index = index
+        self._pending.clear()
+        actions = Counter()
+        for record in self.recording.frames[index]:
+            self._latest[record.name] = record
+            request = self.recording.request(record)
+            self._pending[(record.name, request)].append(record)
+            if record.name == "action":
+                actions.update(_action_keys(sc_pb.RequestAction.FromString(request)))
+        if index:
+            self.recorded_actions[self.game_loop] = actions
+
+    async def _execute(self, **kwargs):
+        (name, request), = kwargs.items()
+        if name == "observation":
+            if not self.has_next_frame:
+                raise EOFError("End of recording")
+            self._index_frame(self.frame_index + 1)
+            response = self.recording.response(self.recording.frames[self.frame_index][0])
+            if response.observation.player_result:
+                self._status = Status.ended
+            return response
+        if name == "action":
+            self.replayed_actions[self.game_loop].update(_action_keys(request))
+
+        matches = self._pending.get((name, request.SerializeToString()))
+        if matches:
+            return self.recording.response(matches.pop(0))
+        if name in STATIC_REQUESTS and name in self._latest:
+            return self.recording.response(self._latest[name])
+        if name not in {"action", "step", "debug"}:
+            self.unanswered[name] += 1
+        return _empty_response(name, request)
+
+    def action_diff(self) -> Dict[int, Tuple[Counter, Counter]]:
+        """Per game loop the actions only the recording had, and the actions only the replay emitted."""
+        diff = {}
+        for game_loop in sorted(set(self.recorded_actions) | set(self.replayed_actions)):
+            recorded = self.recorded_actions.get(game_loop, Counter())
+            replayed = self.replayed_actions.get(game_loop, Counter())
+            if recorded != replayed:
+                diff[game_loop] = (recorded - replayed, replayed - recorded)
+        return diff
+
+
+async def replay(bot: BotAI, recording: Recording, player_id: int = 1) -> Tuple[ReplayClient, LatencyHistogram]:
+    """Feed the recorded observations to the bot, returns the client (with the action diff) and the on_step wall times."""
+    client = ReplayClient(recording)
+    latencies = LatencyHistogram()
+
+    bot._initialize_variables()
+    game_data = await client.get_game_data()
+    game_info = await client.get_game_info()
+    ping = await client.ping()
+    bot._prepare_start(client, player_id, game_info, game_data, realtime=False, base_build=ping.ping.base_build)
+    state = await client.observation()
+    proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+    bot._prepare_step(GameState(state.observation), proto_game_info)
+    await bot.on_before_start()
+    bot._prepare_first_step()
+    await bot.on_start()
+
+    iteration = 0
+    result = None
+    while client.has_next_frame:
+        state = await client.observation()
+        if state.observation.player_result:
+            result = client._game_result[player_id]
+            break
+        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        bot._prepare_step(GameState(state.observation), proto_game_info)
+        start = time.perf_counter()
+        await bot.issue_events()
+        await bot.on_step(iteration)
+        await bot._after_step()
+        latencies.record(time.perf_counter() - start)
+        iteration += 1
+
+    await bot.on_end(result)
+    return client, latencies
+
+
+def _action_keys(request: sc_pb.RequestAction) -> List[ActionKey]:
+    keys = []
+    for action in request.actions:
+        if not action.HasField("action_raw") or not action.action_raw.HasField("unit_command"):
+            continue
+        command = action.action_raw.unit_command
+        if command.HasField("target_unit_tag"):
+            target = command.target_unit_tag
+        elif command.HasField("target_world_space_pos"):
+            target = (round(command.target_world_space_pos.x, 2), round(command.target_world_space_pos.y, 2))
+        else:
+            target = None
+        keys.append((command.ability_id, tuple(sorted(command.unit_tags)), target, command.queue_command))
+    return keys
+
+
+def _empty_response(name: str, request) -> sc_pb.Response:
+    """Response for a request the recording has no answer for, sized like the request."""
+    if name == "action":
+        return sc_pb.Response(action=sc_pb.ResponseAction(result=[error_pb.Success] * len(request.actions)))
+    if name == "query":
+        return sc_pb.Response(
+            query=query_pb.ResponseQuery(
+                pathing=[query_pb.ResponseQueryPathing(distance=0) for _ in request.pathing],
+                abilities=[query_pb.ResponseQueryAvailableAbilities(unit_tag=a.unit_tag) for a in request.abilities],
+                placements=[
+                    query_pb.ResponseQueryBuildingPlacement(result=error_pb.CantBuildLocationInvalid) for _ in request.placements
+                ],
+            )
+        )
+    if name == "step":
+        return sc_pb.Response(step=sc_pb.ResponseStep())
+    return sc_pb.Response()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a game, or replay a recording against a bot")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("bot", choices=["ZealotChargeBot", "WorkerStackBot", "WorkerRushBot"])
+    parser.add_argument("path")
+    parser.add_argument("--map", default="AbyssalReefLE")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record_game(
+            args.path,
+            maps.get(args.map),
+            [Bot(Race.Protoss, load_bot(args.bot)), Computer(Race.Terran, Difficulty.VeryHard)],
+            realtime=False,
+            random_seed=0,
+        )
+        return
+
+    recording = Recording(args.path)
+    client, latencies = asyncio.run(replay(load_bot(args.bot), recording))
+    diff = client.action_diff()
+    logger.info(
+        f"Replayed {latencies.count} frames, on_step p50 {latencies.percentile(50) * 1000:.3f}ms "
+        f"p95 {latencies.percentile(95) * 1000:.3f}ms p99 {latencies.percentile(99) * 1000:.3f}ms max {latencies.max * 1000:.3f}ms"
+    )
+    if client.unanswered:
+        logger.warning(f"Requests without a recorded answer: {dict(client.unanswered)}")
+    if not diff:
+        logger.info("Actions identical to the recording")
+    for game_loop, (missing, extra) in list(diff.items())[:20]:
+        logger.warning(f"Game loop {game_loop}: {sum(missing.values())} recorded actions missing, {sum(extra.values())} new actions")
+    if diff:
+        logger.warning(f"Actions differ in {len(diff)} of {len(client.recorded_actions)} frames")
+    recording.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,18 @@ from pysc2.env import sc2_env
 from pysc2.lib import actions, features, units
 from absl import app
 
-import random
+from observation_view import ObservationView
+from screen_placement import BuildSpots
 
 class ZergAgent(base_agent.BaseAgent):
+  def __init__(self):
+    super(ZergAgent, self).__init__()
+    # views of the observation and feature_units grouped by unit type, rebuilt at the start of every step
+    self.view = None
+    self.unit_index = None
+    # build spot searches, a structure that fit nowhere is skipped for a few steps
+    self.build_spots = BuildSpots()
+
   def unit_type_is_selected(self, obs, unit_type):
     if ((len(obs.observation.single_select) > 0 ) and 
       obs.observation.single_select[0].unit_type == unit_type):
@@ -15,47 +24,46 @@ class ZergAgent(base_agent.BaseAgent):
       return True 
     return False
 
-  def get_units_by_type(self, obs, unit_type):  
-      return [unit for unit in obs.observation.feature_units
-              if unit.unit_type == unit_type]
-
   def can_do(self, obs, action):
-    return action in obs.observation.available_actions            
+    return action in obs.observation.available_actions
 
   def step(self, obs):
     super(ZergAgent, self).step(obs)
+    # array views of the observation, the helpers select units from them instead of scanning the list
+    self.view = ObservationView(obs)
+    self.unit_index = self.view.index
 
-  def build_spawning_pool(self, obs):
-    spawning_pool = self.get_units_by_type(obs, units.Zerg.SpawningPool)
-    #if there is no spawning pool, build one
-    if len (spawning_pool) == 0:
-    #if drone is selected build spawning pool
-      if self.unit_type_is_selected(obs, units.Zerg.Drone):
-            if self.can_do(obs, actions.FUNCTIONS.Build_SpawningPool_screen.id):
-                x = random.randint(1, 63)
-                y = random.randint(1, 63)
-
-                return actions.FUNCTIONS.Build_SpawningPool_screen('now', (x, y))
-
+    spawning_pool = self.build_spawning_pool(obs)
+    if spawning_pool:
+      return spawning_pool
 
-      drones = self.get_units_by_type(obs, units.Zerg.Drone)         
-      if len(drones) > 0 :
-        drone_unit = random.choice(drones)
-        if drone.x >= 0 and drone.y >= 0:
-          return actions.FUNCTIONS.select_point('select_all_type',(drones.x, drones.y))
-
-  if self.unit_type_is_selected(obs, units.Zerg.Larva):  
+    if self.unit_type_is_selected(obs, units.Zerg.Larva):
       if self.can_do(obs, actions.FUNCTIONS.Train_Drone_quick.id):
         return actions.FUNCTIONS.Train_Drone_quick('now')
 
-  larva_units = self.get_units_by_type(units.Zerg.Larva)
+    larva = self.view.random_position(self.view.own(units.Zerg.Larva, on_screen=True))
+    if larva is not None:
+      return actions.FUNCTIONS.select_point('select_all_type', larva)
 
-  if len(larva_units) > 0:
-      larva_unit = random.choice(larva_units)
-      return actions.FUNCTIONS.select_point('select_all_type',(larva_unit.x, larva_unit.y))
+    return actions.FUNCTIONS.no_op()
 
+  def build_spawning_pool(self, obs):
+    #if there is no spawning pool, build one
+    if self.unit_index.count(units.Zerg.SpawningPool) == 0:
+      # no spot fitted a few steps ago, do not select another drone for it yet
+      if self.build_spots.waiting(units.Zerg.SpawningPool, self.steps):
+        return None
+      #if drone is selected build spawning pool
+      if self.unit_type_is_selected(obs, units.Zerg.Drone):
+        if self.can_do(obs, actions.FUNCTIONS.Build_SpawningPool_screen.id):
+          # free spot for the whole footprint, closest to the hatchery
+          spot = self.build_spots.find(self.view, units.Zerg.SpawningPool, self.steps)
+          if spot is not None:
+            return actions.FUNCTIONS.Build_SpawningPool_screen('now', spot)
 
-    return actions.FUNCTIONS.no_op()
+      drone = self.view.random_position(self.view.own(units.Zerg.Drone, on_screen=True))
+      if drone is not None:
+        return actions.FUNCTIONS.select_point('select_all_type', drone)
 
 def main(unused_argv):
   map = "AbyssalReef"
@@ -0,0 +1,126 @@
+"""
+Buildable screen locations for the pysc2 `Build_*_screen` actions.
+
+The agents used to build at `random.randint(0, 63)` screen coordinates, and most of those
+attempts failed (no creep, not buildable, a unit in the way), each costing a full environment
+step. `find_build_location` computes, for the footprint of the structure, every screen pixel
+where the whole footprint is free in one vectorized pass: the blocked pixels (not buildable,
+no creep for zerg buildings, any unit density, any unit in `player_relative`) are summed over
+every footprint-sized window with an integral image, the box convolution without a per-window
+loop. The free centre closest to the own hatchery, on the side away from the mineral line, is
+returned.
+
+When no spot fits, a new search on the next step (and a new drone selected for it) fails the same
+way until the screen changes. `BuildSpots` remembers the miss for a few agent steps, and the agents
+skip the structure, drone selection included, while it waits.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from pysc2.lib import features, units
+
+from observation_view import ObservationView
+
+# World units covered by the screen, the pysc2 default camera_width_world_units
+CAMERA_WIDTH = 24
+# Footprint side of the structures, in world units
+FOOTPRINTS = {
+    units.Zerg.Hatchery: 5,
+    units.Zerg.SpawningPool: 3,
+    units.Zerg.EvolutionChamber: 3,
+    units.Zerg.RoachWarren: 3,
+    units.Zerg.HydraliskDen: 3,
+    units.Zerg.LurkerDen: 3,
+    units.Zerg.Spire: 2,
+    units.Zerg.SpineCrawler: 2,
+    units.Zerg.SporeCrawler: 2,
+}
+# Buildings that do not need creep under them
+NO_CREEP_NEEDED = {units.Zerg.Hatchery}
+TOWNHALLS = (units.Zerg.Hatchery, units.Zerg.Lair, units.Zerg.Hive)
+MINERAL_FIELDS = (units.Neutral.MineralField, units.Neutral.MineralField750)
+# Agent steps before a structure that fit nowhere is searched for again
+RETRY_STEPS = 16
+
+
+def footprint_pixels(structure: int, screen_width: int) -> int:
+    return math.ceil(FOOTPRINTS.get(structure, 3) * screen_width / CAMERA_WIDTH)
+
+
+def free_centres(view: ObservationView, size: int, needs_creep: bool = True, padding: int = 1) -> np.ndarray:
+    """Boolean (height, width) mask of the screen pixels where a size x size footprint (plus padding) fits."""
+    screen = view.screen
+    blocked = (
+        (screen.buildable == 0)
+        | (screen.unit_density > 0)
+        | (screen.player_relative != features.PlayerRelative.NONE)
+    )
+    if needs_creep:
+        blocked |= screen.creep == 0
+    height, width = blocked.shape
+    window = size + 2 * padding
+    centres = np.zeros((height, width), dtype=bool)
+    if window > height or window > width:
+        return centres
+
+    # Integral image with a zero row and column in front, every window sum is four lookups
+    integral = np.zeros((height + 1, width + 1), dtype=np.int32)
+    integral[1:, 1:] = blocked.astype(np.int32).cumsum(axis=0).cumsum(axis=1)
+    sums = (
+        integral[window:, window:]
+        - integral[:-window, window:]
+        - integral[window:, :-window]
+        + integral[:-window, :-window]
+    )
+    offset = window // 2
+    centres[offset:offset + sums.shape[0], offset:offset + sums.shape[1]] = sums == 0
+    return centres
+
+
+def find_build_location(view: ObservationView, structure: int, padding: int = 1) -> Optional[Tuple[int, int]]:
+    """Screen (x, y) to build the structure at, None if its footprint fits nowhere on screen."""
+    height, width = view.screen.buildable.shape
+    centres = free_centres(view, footprint_pixels(structure, width), structure not in NO_CREEP_NEEDED, padding)
+    ys, xs = np.nonzero(centres)
+    if not len(xs):
+        return None
+
+    townhalls = view.positions(view.own(TOWNHALLS))
+    near = townhalls.mean(axis=0) if len(townhalls) else np.array([width / 2, height / 2])
+    offsets = np.stack([xs, ys], axis=1) - near
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+    # Keep the mineral line free: spots on the mineral side of the hatchery only if there is nothing else
+    minerals = view.positions(view.of_type(MINERAL_FIELDS))
+    if len(townhalls) and len(minerals):
+        mineral_side = offsets @ (minerals.mean(axis=0) - near) > 0
+        if not mineral_side.all():
+            distances[mineral_side] = np.inf
+    best = int(np.argmin(distances))
+    return int(xs[best]), int(ys[best])
+
+
+class BuildSpots:
+    """`find_build_location` that keeps a "no spot fits" result for retry_steps agent steps."""
+
+    def __init__(self, retry_steps: int = RETRY_STEPS):
+        self.retry_steps = retry_steps
+        # Structure -> agent step of its last failed search
+        self.misses: Dict[int, int] = {}
+
+    def waiting(self, structure: int, step: int) -> bool:
+        """True while the last search for the structure failed less than retry_steps steps ago."""
+        miss = self.misses.get(structure)
+        return miss is not None and step - miss < self.retry_steps
+
+    def find(self, view: ObservationView, structure: int, step: int) -> Optional[Tuple[int, int]]:
+        if self.waiting(structure, step):
+            return None
+        spot = find_build_location(view, structure)
+        if spot is None:
+            self.misses[structure] = step
+        else:
+            self.misses.pop(structure, None)
+        return spot
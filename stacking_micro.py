@@ -0,0 +1,94 @@
+"""
+Batched worker stacking micro.
+
+The per-worker loop in `manage_worker_task` used to compute one distance and take one decision
+per worker. `StackingMicro` takes the workers that have a mineral patch and a drop point, packs
+their positions, carry flags and targets into arrays, decides move vs. return vs. gather for all
+of them with a few NumPy operations and only then emits the unit commands.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+from sc2.position import Point2
+from sc2.unit import Unit
+
+# Decisions returned by plan_stacking_orders
+KEEP = 0    # worker already does the right thing
+GATHER = 1  # send the worker to its mineral patch
+MOVE = 2    # carrying, move in front of the townhall without decelerating
+RETURN = 3  # carrying and close enough (or base oversaturated), return cargo and queue gather
+
+
+def plan_stacking_orders(
+    positions: np.ndarray,
+    drop_points: np.ndarray,
+    carrying: np.ndarray,
+    on_target: np.ndarray,
+    oversaturated: np.ndarray,
+    threshold: float,
+) -> np.ndarray:
+    """
+    Decide the order of every worker at once.
+
+    positions, drop_points: (n, 2) float arrays
+    carrying: worker carries minerals, on_target: worker is already gathering its own patch
+    oversaturated: the townhall of the worker's patch has more workers than it needs
+    """
+    distance = np.hypot(positions[:, 0] - drop_points[:, 0], positions[:, 1] - drop_points[:, 1])
+    near = distance <= threshold
+
+    orders = np.full(len(positions), KEEP, dtype=np.int8)
+    orders[~carrying & ~on_target] = GATHER
+    orders[carrying & ~oversaturated & ~near] = MOVE
+    orders[carrying & (oversaturated | near)] = RETURN
+    return orders
+
+
+class StackingMicro:
+    def __init__(self, threshold: float):
+        # Distance to the drop point at which a carrying worker is ordered to return its cargo
+        self.threshold = threshold
+
+    def run(
+        self,
+        workers: Sequence[Unit],
+        minerals: Sequence[Unit],
+        drop_points: Sequence[Point2],
+        oversaturated: Sequence[bool],
+    ) -> np.ndarray:
+        """Issue the stacking orders for workers[i] mining minerals[i] and returning at drop_points[i]."""
+        n = len(workers)
+        if n == 0:
+            return np.zeros(0, dtype=np.int8)
+
+        positions = np.empty((n, 2), dtype=np.float64)
+        carrying = np.empty(n, dtype=bool)
+        on_target = np.empty(n, dtype=bool)
+        for i, (worker, mineral) in enumerate(zip(workers, minerals)):
+            positions[i] = worker.position
+            carrying[i] = worker.is_carrying_resource
+            on_target[i] = worker.is_gathering and worker.order_target == mineral.tag
+
+        orders = plan_stacking_orders(
+            positions,
+            np.array(drop_points, dtype=np.float64).reshape(n, 2),
+            carrying,
+            on_target,
+            np.fromiter(oversaturated, dtype=bool, count=n),
+            self.threshold,
+        )
+        self.emit(orders, workers, minerals, drop_points)
+        return orders
+
+    @staticmethod
+    def emit(orders: np.ndarray, workers: Sequence[Unit], minerals: Sequence[Unit], drop_points: Sequence[Point2]):
+        for i in np.flatnonzero(orders == GATHER):
+            workers[i].gather(minerals[i])
+        for i in np.flatnonzero(orders == MOVE):
+            workers[i].move(drop_points[i])
+        for i in np.flatnonzero(orders == RETURN):
+            # Return the cargo and make the worker gather its own patch again afterwards
+            workers[i].return_resource()
+            workers[i].gather(minerals[i], queue=True)
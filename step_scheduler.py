@@ -0,0 +1,142 @@
+"""
+Scheduler for the managers awaited in `on_step`.
+
+Every manager declares how often it runs: every N game loops (aligned to multiples of N, so a
+manager with every=224 runs each 10 game seconds), or only after an event was triggered. A
+manager also gets a priority and a soft time budget. High priority managers always run when they
+are due. Low priority managers are deferred to the next frame when the frame is already over its
+budget, unless they were deferred too often in a row.
+
+Per manager the scheduler counts runs, loops skipped because the manager was not due, deferrals
+and runs that went over the manager's own budget.
+"""
+
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from manager_profiler import ManagerProfiler
+
+HIGH = 0
+LOW = 1
+
+
+class ScheduledManager:
+    def __init__(
+        self,
+        name: str,
+        manager: Callable[[], Awaitable],
+        every: Optional[int],
+        event: Optional[str],
+        budget: float,
+        priority: int,
+    ):
+        self.name = name
+        self.manager = manager
+        # Run every N game loops, None means the manager only runs on its event
+        self.every = every
+        self.event = event
+        # Soft time budget in seconds for one run
+        self.budget = budget
+        self.priority = priority
+
+        self.last_run_loop: Optional[int] = None
+        # Triggered by the event, or deferred from an earlier frame
+        self.pending = False
+        self.deferred_in_a_row = 0
+        self.last_duration = 0.0
+
+        self.runs = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.over_budget = 0
+
+    def is_due(self, game_loop: int) -> bool:
+        if self.pending:
+            return True
+        if self.every is None:
+            return False
+        if self.last_run_loop is None:
+            return True
+        return game_loop // self.every != self.last_run_loop // self.every
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "deferred": self.deferred,
+            "over_budget": self.over_budget,
+            "last_duration_ms": self.last_duration * 1000,
+        }
+
+
+class StepScheduler:
+    def __init__(self, frame_budget: float = 0.02, max_deferrals: int = 8, profiler: Optional[ManagerProfiler] = None):
+        # Soft time budget for one on_step in seconds
+        self.frame_budget = frame_budget
+        # Records latency and round-trip histograms of every manager run, if given
+        self.profiler = profiler
+        # A low priority manager runs anyway after being deferred this many frames in a row
+        self.max_deferrals = max_deferrals
+        self.managers: List[ScheduledManager] = []
+        self.frames_over_budget = 0
+
+    def add(
+        self,
+        manager: Callable[[], Awaitable],
+        every: Optional[int] = 1,
+        event: Optional[str] = None,
+        budget: float = 0.002,
+        priority: int = HIGH,
+        name: Optional[str] = None,
+    ) -> ScheduledManager:
+        """Register a manager coroutine function, managers run in the order they were added."""
+        scheduled = ScheduledManager(name or manager.__name__, manager, every, event, budget, priority)
+        self.managers.append(scheduled)
+        return scheduled
+
+    def trigger(self, event: str):
+        """Run all managers waiting for this event during the next frame."""
+        for scheduled in self.managers:
+            if scheduled.event == event:
+                scheduled.pending = True
+
+    async def run(self, game_loop: int):
+        frame_start = time.perf_counter()
+        for scheduled in self.managers:
+            if not scheduled.is_due(game_loop):
+                scheduled.skipped += 1
+                continue
+
+            elapsed = time.perf_counter() - frame_start
+            if (
+                scheduled.priority != HIGH
+                and elapsed + max(scheduled.budget, scheduled.last_duration) > self.frame_budget
+                and scheduled.deferred_in_a_row < self.max_deferrals
+            ):
+                scheduled.pending = True
+                scheduled.deferred += 1
+                scheduled.deferred_in_a_row += 1
+                continue
+
+            # Clear the flag first, the manager itself may trigger its event again
+            scheduled.pending = False
+            scheduled.deferred_in_a_row = 0
+            scheduled.last_run_loop = game_loop
+            await self.run_manager(scheduled)
+
+        if time.perf_counter() - frame_start > self.frame_budget:
+            self.frames_over_budget += 1
+
+    async def run_manager(self, scheduled: ScheduledManager):
+        start = time.perf_counter()
+        if self.profiler:
+            await self.profiler.run(scheduled.name, scheduled.manager)
+        else:
+            await scheduled.manager()
+        scheduled.last_duration = time.perf_counter() - start
+        scheduled.runs += 1
+        if scheduled.last_duration > scheduled.budget:
+            scheduled.over_budget += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {scheduled.name: scheduled.stats() for scheduled in self.managers}
@@ -0,0 +1,130 @@
+"""
+Predictive supply: build pylons for the supply the production will use, not the supply used now.
+
+The bots used to start a pylon once `supply_left` dropped under a fixed buffer. With a dozen
+gateways and a few nexuses producing at once that buffer is gone long before the pylon finishes.
+`SupplyPlanner` projects the supply used at the end of a horizon (a pylon build time plus the walk)
+from the production structures, limited by what the mineral income can pay for, compares it to
+the supply cap including the pylons and nexuses under construction and asks for as many pylons as
+the gap needs. Their spots are picked together, spread out so they power different areas.
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+from placement import PlacementGrid
+
+GAME_LOOPS_PER_SECOND = 22.4
+SUPPLY_CAP = 200
+SUPPLY_PER_PYLON = 8
+SUPPLY_PER_NEXUS = 15
+PYLON_COST = 100
+# Supply of one produced unit and game loops per unit
+PRODUCTION = {
+    UnitTypeId.NEXUS: (1, 12 * GAME_LOOPS_PER_SECOND),  # probe
+    UnitTypeId.GATEWAY: (2, 27 * GAME_LOOPS_PER_SECOND),  # zealot
+    UnitTypeId.WARPGATE: (2, 20 * GAME_LOOPS_PER_SECOND),  # zealot, warp in cooldown
+}
+# Probes and zealots both cost 50 minerals per supply
+MINERALS_PER_SUPPLY = 50
+# Pylons planned together are at least this far apart
+PYLON_SPACING = 5
+
+
+class SupplyPlanner:
+    def __init__(self, horizon: float = 25.0, buffer: int = 2):
+        # Seconds of production to plan supply for (a pylon takes 18 seconds, plus the walk), and supply kept free on top
+        self.horizon = horizon
+        self.buffer = buffer
+        # Confirmed spots of the pylons planned but not started yet
+        self.spots: List[Point2] = []
+
+    @property
+    def horizon_loops(self) -> float:
+        return self.horizon * GAME_LOOPS_PER_SECOND
+
+    def projected_supply(self, bot, mineral_rate: float, worker_limit: int = 200) -> float:
+        """Supply used at the end of the horizon if every producer keeps producing and the income allows it."""
+        horizon = self.horizon_loops
+        capacity = 0.0
+        for structure in bot.unit_index(PRODUCTION, ready=True):
+            supply, build_loops = PRODUCTION[structure.type_id]
+            if structure.type_id == UnitTypeId.NEXUS and bot.supply_workers >= worker_limit:
+                continue
+            # Queued units already count in supply_used, only new cycles add supply
+            capacity += supply * math.floor(horizon / build_loops)
+        affordable = (bot.minerals + mineral_rate * horizon) / MINERALS_PER_SUPPLY
+        return bot.supply_used + min(capacity, affordable)
+
+    def supply_coming(self, bot) -> int:
+        """Supply of the pylons and nexuses that are under construction or ordered."""
+        nexuses = bot.unit_index(UnitTypeId.NEXUS, ready=False).amount
+        return int(bot.already_pending(UnitTypeId.PYLON)) * SUPPLY_PER_PYLON + nexuses * SUPPLY_PER_NEXUS
+
+    def pylons_needed(self, bot, mineral_rate: float, worker_limit: int = 200) -> int:
+        cap = bot.supply_cap + self.supply_coming(bot)
+        if cap >= SUPPLY_CAP:
+            return 0
+        missing = self.projected_supply(bot, mineral_rate, worker_limit) + self.buffer - cap
+        if missing <= 0:
+            return 0
+        needed = math.ceil(missing / SUPPLY_PER_PYLON)
+        return min(needed, math.ceil((SUPPLY_CAP - cap) / SUPPLY_PER_PYLON))
+
+    async def choose_spots(self, bot, placement: Optional[PlacementGrid], near: Sequence[Point2], count: int) -> List[Point2]:
+        """Up to count confirmed new pylon spots, away from the planned ones and cycling through the near points."""
+        spots: List[Point2] = list(self.spots)
+        for index in range(count * 2):
+            if len(spots) >= len(self.spots) + count or not near:
+                break
+            center = near[index % len(near)]
+            if placement is None:
+                # No local placement grid, one server search per spot
+                position = await bot.find_placement(UnitTypeId.PYLON, center, placement_step=2)
+                if position is not None and all(position.distance_to_point2(spot) >= PYLON_SPACING for spot in spots):
+                    spots.append(position)
+                continue
+            for position in placement.candidates(UnitTypeId.PYLON, center):
+                if all(position.distance_to_point2(spot) >= PYLON_SPACING for spot in spots):
+                    break
+            else:
+                continue
+            if await bot.can_place_single(UnitTypeId.PYLON, position):
+                spots.append(position)
+            # Reserved either way: taken by the plan, or blocked by something the grid does not know
+            placement.reserve(UnitTypeId.PYLON, position)
+        return spots[len(self.spots):]
+
+    async def build_pylons(self, bot, placement: Optional[PlacementGrid], near: Sequence[Point2], count: int, workers: Units) -> List[Unit]:
+        """
+        Plan spots for count pylons and start as many of them as the bank pays for, each with the
+        closest of the given workers. Returns the workers that were sent.
+        """
+        if placement is not None:
+            # The planned spots can wait longer than a reservation lasts, keep them out of the other lookups
+            for spot in self.spots:
+                placement.reserve(UnitTypeId.PYLON, spot)
+        missing = count - len(self.spots)
+        if missing > 0:
+            self.spots.extend(await self.choose_spots(bot, placement, near, missing))
+        builders: List[Unit] = []
+        affordable = min(count, int(bot.minerals // PYLON_COST))
+        while self.spots and len(builders) < affordable:
+            spot = self.spots[0]
+            sent = {builder.tag for builder in builders}
+            available = workers.filter(lambda worker: worker.tag not in sent and not worker.is_carrying_resource)
+            if not available:
+                break
+            self.spots.pop(0)
+            # Confirmed when it was planned, something may have been built on it since
+            if not await bot.can_place_single(UnitTypeId.PYLON, spot):
+                continue
+            worker = available.closest_to(spot)
+            worker.build(UnitTypeId.PYLON, spot)
+            builders.append(worker)
+        return builders
@@ -0,0 +1,170 @@
+"""
+Low overhead telemetry for the hot manager loops.
+
+Instead of formatting f-strings and writing log lines on the game loop, managers record typed
+events (event kind, unit tag, target tag and two numbers) into a preallocated ring buffer. A
+background thread flushes the buffer to a JSONL file, or to a compact binary file of raw records
+that `read_events` loads back as a NumPy structured array.
+
+Levels below the configured one are gated off: `telemetry.debug` / `telemetry.info` /
+`telemetry.warning` are replaced by a no-op, so a disabled call formats nothing and touches no
+buffer. Expensive arguments should still be guarded with `telemetry.debug_enabled` etc.
+"""
+
+import json
+import os
+import threading
+from enum import IntEnum
+from typing import Optional
+
+import numpy as np
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+
+class EventKind(IntEnum):
+    # Mineral assignment: tag = worker, target = mineral patch (or nexus), a = workers on the patch
+    WORKER_ASSIGNED = 1
+    WORKER_ASSIGN_SATURATED = 2
+    WORKER_ASSIGNED_FALLBACK = 3
+    # Gas: tag = assimilator or worker, target = assimilator, a = missing / excess workers
+    GAS_UNDERSATURATED = 10
+    GAS_OVERSATURATED = 11
+    WORKER_TO_GAS = 12
+    WORKER_FROM_GAS = 13
+    GAS_DONE = 14
+    # Scouting: tag = scout, target = enemy, a / b = position, shield or dps depending on the event
+    SCOUT_MOVE = 20
+    SCOUT_RESUME = 21
+    SCOUT_SIGHTED = 22
+    SCOUT_ENEMY = 23
+    SCOUT_OBSERVE = 24
+    SCOUT_ATTACK_WORKER = 25
+    SCOUT_FLEE = 26
+
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("game_loop", "<u4"),
+        ("kind", "<u2"),
+        ("level", "u1"),
+        ("tag", "<u8"),
+        ("target", "<u8"),
+        ("a", "<f4"),
+        ("b", "<f4"),
+    ]
+)
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class Telemetry:
+    def __init__(self, level: int = INFO, capacity: int = 1 << 16, flush_interval: float = 1.0):
+        self.level = level
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        # Total number of events recorded / written, the ring position is count % capacity
+        self.recorded = 0
+        self.flushed = 0
+        # Events overwritten before the writer could flush them
+        self.dropped = 0
+        # Set by the bot every frame, stored with every event
+        self.game_loop = 0
+
+        self._path: Optional[str] = None
+        self._binary = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.set_level(level)
+
+    def set_level(self, level: int):
+        self.level = level
+        self.debug_enabled = level <= DEBUG
+        self.info_enabled = level <= INFO
+        self.warning_enabled = level <= WARNING
+        self.debug = self._recorder(DEBUG) if self.debug_enabled else _noop
+        self.info = self._recorder(INFO) if self.info_enabled else _noop
+        self.warning = self._recorder(WARNING) if self.warning_enabled else _noop
+
+    def _recorder(self, level: int):
+        def record(kind: EventKind, tag: int = 0, target: int = 0, a: float = 0.0, b: float = 0.0):
+            with self._lock:
+                self.buffer[self.recorded % self.capacity] = (self.game_loop, kind, level, tag, target, a, b)
+                self.recorded += 1
+
+        return record
+
+    def open(self, path: str):
+        """Start the background writer. Paths ending in .bin get raw records, anything else JSONL."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._path = path
+        self._binary = path.endswith(".bin")
+        open(path, "wb").close()
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+        self._writer.start()
+
+    def close(self):
+        """Stop the writer and flush everything that is left."""
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join()
+        self._writer = None
+        self.flush()
+
+    def _write_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def take(self) -> np.ndarray:
+        """Copy the events that were not flushed yet out of the ring buffer, oldest first."""
+        with self._lock:
+            start = max(self.flushed, self.recorded - self.capacity)
+            self.dropped += start - self.flushed
+            end = self.recorded
+            self.flushed = end
+            if start == end:
+                return self.buffer[:0].copy()
+            first, last = start % self.capacity, end % self.capacity
+            if first < last:
+                return self.buffer[first:last].copy()
+            return np.concatenate((self.buffer[first:], self.buffer[:last]))
+
+    def flush(self):
+        events = self.take()
+        if self._path is None or not len(events):
+            return
+        if self._binary:
+            with open(self._path, "ab") as f:
+                f.write(events.tobytes())
+            return
+        with open(self._path, "a") as f:
+            for game_loop, kind, level, tag, target, a, b in events.tolist():
+                f.write(
+                    json.dumps(
+                        {
+                            "game_loop": game_loop,
+                            "kind": EventKind(kind).name,
+                            "level": level,
+                            "tag": tag,
+                            "target": target,
+                            "a": a,
+                            "b": b,
+                        }
+                    )
+                )
+                f.write("\n")
+
+
+def read_events(path: str) -> np.ndarray:
+    """Load a binary telemetry file written by Telemetry."""
+    return np.fromfile(path, dtype=EVENT_DTYPE)
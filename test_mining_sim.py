@@ -0,0 +1,37 @@
+"""
+Mining simulator checks: the policies it compares must come out different, and it must be fast
+enough to sweep them (thousands of simulated base minutes per second).
+
+    python -m pytest -q test_mining_sim.py
+"""
+
+import time
+
+import numpy as np
+
+from mining_sim import StackingPolicy, simulate, standard_layout
+
+# Simulated base minutes per second the sweeps need
+MIN_THROUGHPUT = 5000
+
+
+def test_stacking_beats_native_mining():
+    no_stacking, stacking, stalled = simulate(
+        standard_layout(), [StackingPolicy(), StackingPolicy(1.0, 0.5), StackingPolicy(0.01, -0.5)]
+    )
+    assert stacking > no_stacking * 1.03
+    assert stalled == 0
+
+
+def test_throughput_benchmark():
+    thresholds = np.linspace(0.01, 1.0, 20)
+    offsets = np.linspace(0.0, 1.0, 20)
+    policies = [StackingPolicy()] + [StackingPolicy(t, o) for t in thresholds for o in offsets]
+    minutes = 5.0
+    simulate(standard_layout(), policies[:2], minutes=0.1)
+
+    start = time.perf_counter()
+    simulate(standard_layout(), policies, minutes=minutes)
+    throughput = len(policies) * minutes / (time.perf_counter() - start)
+    print(f"{throughput:.0f} simulated base minutes per second")
+    assert throughput >= MIN_THROUGHPUT
@@ -0,0 +1,96 @@
+"""
+Record a short fake game session in the recording format and replay it against the same bot.
+
+    python -m pytest -q test_recorder.py
+"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+pytest.importorskip("sc2")
+
+from s2clientprotocol import error_pb2 as error_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+from sc2.action import combine_actions
+from sc2.data import Result
+from sc2.unit_command import UnitCommand
+
+from fake_game import FakeGame, load_bot, run_fake_game
+from recorder import GameRecorder, Recording, replay
+
+RECORDED_LOOPS = 300
+
+
+class RecordedFakeGame(FakeGame):
+    """FakeGame that writes the responses a real client would have sent to a GameRecorder."""
+
+    def __init__(self, recorder: GameRecorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+        self.commands: List[UnitCommand] = []
+
+    def game_info(self) -> sc_pb.ResponseGameInfo:
+        response = super().game_info()
+        self.recorder.write("game_info", sc_pb.RequestGameInfo(), sc_pb.Response(game_info=response))
+        return response
+
+    def game_data(self) -> sc_pb.ResponseData:
+        response = super().game_data()
+        self.recorder.write("data", sc_pb.RequestData(), sc_pb.Response(data=response))
+        self.recorder.write("ping", sc_pb.RequestPing(), sc_pb.Response(ping=sc_pb.ResponsePing(base_build=1)))
+        return response
+
+    def observation(self) -> sc_pb.ResponseObservation:
+        response = super().observation()
+        self.recorder.write("observation", sc_pb.RequestObservation(), sc_pb.Response(observation=response))
+        return response
+
+    def apply(self, action: UnitCommand):
+        self.commands.append(action)
+        super().apply(action)
+
+    def step(self, loops: int = 1):
+        if self.commands:
+            request = sc_pb.RequestAction(actions=[sc_pb.Action(action_raw=a) for a in combine_actions(self.commands)])
+            result = [error_pb.Success] * len(request.actions)
+            self.recorder.write("action", request, sc_pb.Response(action=sc_pb.ResponseAction(result=result)))
+            self.commands = []
+        self.recorder.write("step", sc_pb.RequestStep(count=loops), sc_pb.Response(step=sc_pb.ResponseStep()))
+        super().step(loops)
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    # The bots write their profiles and telemetry relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    recorder = GameRecorder(str(tmp_path / "session.sc2rec"))
+    game = RecordedFakeGame(recorder)
+    asyncio.run(run_fake_game(load_bot("WorkerStackBot"), game, RECORDED_LOOPS))
+    # The game ends with an observation that carries the result
+    final = FakeGame.observation(game)
+    final.player_result.add(player_id=1, result=Result.Victory.value)
+    recorder.write("observation", sc_pb.RequestObservation(), sc_pb.Response(observation=final))
+    recorder.close()
+    recording = Recording(recorder.path)
+    yield recording
+    recording.close()
+
+
+def test_replay_runs_every_recorded_frame(recording):
+    bot = load_bot("WorkerStackBot")
+    results = []
+
+    async def on_end(game_result):
+        results.append(game_result)
+
+    bot.on_end = on_end
+    client, latencies = asyncio.run(replay(bot, recording))
+    # Frame 0 holds the requests before the first observation, the first observation is on_start, the last the result
+    assert latencies.count == len(recording.frames) - 3
+    assert not client.has_next_frame
+    assert not client.in_game
+    assert results == [Result.Victory]
+    assert sum(map(sum, (counter.values() for counter in client.recorded_actions.values())))
+    assert sum(map(sum, (counter.values() for counter in client.replayed_actions.values())))
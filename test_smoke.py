@@ -0,0 +1,31 @@
+"""
+Smoke test of every bot against the offline fake game: a short game must run without an exception
+and the bot must mine.
+
+    python -m pytest -q test_smoke.py
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("sc2")
+
+from fake_game import FakeGame, load_bot, run_fake_game
+
+# python-sc2 warns when a command has the wrong target type for the ability, a bug in the bot
+pytestmark = pytest.mark.filterwarnings("error::RuntimeWarning")
+
+# Game loops to play, enough for the first build order steps and worker trips
+SMOKE_LOOPS = 1000
+
+
+@pytest.mark.parametrize("name", ["ZealotChargeBot", "WorkerStackBot", "WorkerRushBot"])
+def test_bot_runs_in_fake_game(name, tmp_path, monkeypatch):
+    # The bots write their profiles and telemetry relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    game, latencies = asyncio.run(run_fake_game(load_bot(name), FakeGame(), SMOKE_LOOPS))
+    assert game.game_loop >= SMOKE_LOOPS
+    assert latencies.count > 0
+    assert game.actions
+    assert game.minerals_collected > 0
@@ -0,0 +1,97 @@
+"""
+Per-frame index of the own units and structures by type.
+
+`self.structures(UnitTypeId.PYLON).ready` filters the whole structure list, and the bots ask the
+same questions (ready pylons, ready nexuses, zealots) dozens of times per frame. `UnitIndex`
+groups all own units by (type, ready, idle) in one pass right after the observation is parsed,
+and every query returns a `Units` view that is built once and cached until the next game loop:
+
+    self.unit_index(UnitTypeId.PYLON, ready=True)
+    self.unit_index({UnitTypeId.GATEWAY, UnitTypeId.WARPGATE}, ready=True, idle=True)
+
+`ready` / `idle` left to None match both. The same pass fills a tag -> Unit map of the own units,
+structures, mineral fields and geysers, so the managers look units up by tag in O(1) instead of
+`find_by_tag` / `filter` scans or a `{tag: unit}` dict rebuilt by every manager:
+
+    mineral = self.unit_index.get(self.ledger.patch_of(worker.tag))
+
+The bots refresh the index from `_prepare_step`; a query made on a later game loop without a
+refresh (e.g. a bot that does not override it) rebuilds the index first, so a stale view is never returned. The views are shared between
+callers and must not be modified in place.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+GroupKey = Tuple[UnitTypeId, bool, bool]
+QueryKey = Tuple[FrozenSet[UnitTypeId], Optional[bool], Optional[bool]]
+
+
+class UnitIndex:
+    def __init__(self, bot):
+        self.bot = bot
+        self.game_loop = -1
+        # (type, ready, idle) -> units, and the views already handed out this frame
+        self.groups: Dict[GroupKey, List[Unit]] = {}
+        self.views: Dict[QueryKey, Units] = {}
+        # Own units, structures and resources of the current observation by tag
+        self.by_tag: Dict[int, Unit] = {}
+        # Queries answered from the cache / by building a new view, over the whole game
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self):
+        """Group the own units and map the tags of the current observation, called once per game loop."""
+        self.game_loop = self.bot.state.game_loop
+        self.views = {}
+        groups: Dict[GroupKey, List[Unit]] = {}
+        by_tag: Dict[int, Unit] = {}
+        for unit in self.bot.all_own_units:
+            by_tag[unit.tag] = unit
+            key = (unit.type_id, unit.is_ready, unit.is_idle)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [unit]
+            else:
+                group.append(unit)
+        for resource in self.bot.resources:
+            by_tag[resource.tag] = resource
+        self.groups = groups
+        self.by_tag = by_tag
+
+    def get(self, tag: Optional[int]) -> Optional[Unit]:
+        """Own unit, structure or resource with this tag in the current observation."""
+        if self.game_loop != self.bot.state.game_loop:
+            self.refresh()
+        return self.by_tag.get(tag)
+
+    def tags_in(self, tags: Iterable[int]) -> Units:
+        """Units of the given tags that are still in the observation, in the order of the tags."""
+        if self.game_loop != self.bot.state.game_loop:
+            self.refresh()
+        return Units([self.by_tag[tag] for tag in tags if tag in self.by_tag], self.bot)
+
+    def __call__(
+        self, types: Union[UnitTypeId, Iterable[UnitTypeId]], ready: Optional[bool] = None, idle: Optional[bool] = None
+    ) -> Units:
+        """Own units of the given type(s), optionally only the (not) ready / (not) idle ones."""
+        if self.game_loop != self.bot.state.game_loop:
+            self.refresh()
+        types = frozenset((types,)) if isinstance(types, UnitTypeId) else frozenset(types)
+        query = (types, ready, idle)
+        view = self.views.get(query)
+        if view is not None:
+            self.hits += 1
+            return view
+        self.misses += 1
+        units = []
+        for type_id in types:
+            for is_ready in (True, False) if ready is None else (ready,):
+                for is_idle in (True, False) if idle is None else (idle,):
+                    units.extend(self.groups.get((type_id, is_ready, is_idle), ()))
+        view = Units(units, self.bot)
+        self.views[query] = view
+        return view
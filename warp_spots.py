@@ -0,0 +1,91 @@
+"""
+Pool of warp-in positions around powered pylons.
+
+Instead of one `find_placement` query per warp-in, all positions within the power field of the
+ready pylons are computed once per frame in one vectorized pass: cell centers in the power radius
+that are pathable, not covered by a structure footprint and not overlapping a unit on the ground.
+Cells are one apart, so spots handed out in the same frame never overlap. Warpgates `take` spots
+until the pool is empty, so a full warp round is issued in a single frame.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+
+from placement import PYLON_POWER_RADIUS, PlacementGrid
+
+# Radius of the warped in unit, spots closer than this to the edge of the power field are not used
+WARP_IN_RADIUS = 0.5
+
+
+class WarpSpotPool:
+    def __init__(self, bot, placement: Optional[PlacementGrid] = None):
+        self.bot = bot
+        # Structure footprints, so spots next to buildings under construction are excluded as well
+        self.placement = placement
+        self.spots: List[Point2] = []
+        self.game_loop = -1
+
+        # Offsets of the cell centers within the power field, relative to the cell of the pylon
+        radius = int(PYLON_POWER_RADIUS) + 1
+        offsets = np.arange(-radius, radius + 1)
+        dx, dy = np.meshgrid(offsets, offsets)
+        self.offsets_x, self.offsets_y = dx.ravel(), dy.ravel()
+
+        self.frames_built = 0
+        self.taken = 0
+
+    def refresh(self):
+        """Recompute the pool, once per frame."""
+        game_loop = self.bot.state.game_loop
+        if game_loop == self.game_loop:
+            return
+        self.game_loop = game_loop
+        self.spots = []
+        pylons = self.bot.unit_index(UnitTypeId.PYLON, ready=True)
+        if not pylons:
+            return
+        self.frames_built += 1
+
+        pathable = self.bot.game_info.pathing_grid.data_numpy.astype(bool)
+        if self.placement is not None and self.placement.occupied is not None:
+            pathable &= self.placement.occupied == 0
+        height, width = pathable.shape
+
+        # Candidate cells around every pylon, duplicates of overlapping power fields removed
+        pylon_positions = np.array([(pylon.position.x, pylon.position.y) for pylon in pylons])
+        cells_x = (np.floor(pylon_positions[:, 0])[:, None] + self.offsets_x).ravel().astype(np.int32)
+        cells_y = (np.floor(pylon_positions[:, 1])[:, None] + self.offsets_y).ravel().astype(np.int32)
+        inside = (cells_x >= 0) & (cells_x < width) & (cells_y >= 0) & (cells_y < height)
+        cells = np.unique(np.stack((cells_x[inside], cells_y[inside]), axis=1), axis=0)
+        cells = cells[pathable[cells[:, 1], cells[:, 0]]]
+        centers = cells + 0.5
+
+        # In the power field of at least one pylon
+        distances = ((centers[:, None, :] - pylon_positions[None, :, :]) ** 2).sum(axis=2)
+        centers = centers[(distances <= (PYLON_POWER_RADIUS - WARP_IN_RADIUS) ** 2).any(axis=1)]
+
+        # Not overlapping a ground unit
+        ground_units = [unit for unit in self.bot.units + self.bot.enemy_units if not unit.is_flying]
+        if ground_units and len(centers):
+            unit_positions = np.array([(unit.position.x, unit.position.y) for unit in ground_units])
+            unit_radii = np.array([unit.radius for unit in ground_units])
+            distances = ((centers[:, None, :] - unit_positions[None, :, :]) ** 2).sum(axis=2)
+            centers = centers[((distances >= (unit_radii + WARP_IN_RADIUS) ** 2)).all(axis=1)]
+
+        # Hand out the spots closest to the enemy first
+        target = self.bot.enemy_start_locations[0]
+        order = np.argsort(((centers - (target.x, target.y)) ** 2).sum(axis=1), kind="stable")
+        # Reversed, so take() pops from the end
+        self.spots = [Point2(center) for center in centers[order[::-1]].tolist()]
+
+    def take(self) -> Optional[Point2]:
+        """The next free warp-in spot of this frame, None when the pool is empty."""
+        self.refresh()
+        if not self.spots:
+            return None
+        self.taken += 1
+        return self.spots.pop()
@@ -6,14 +6,12 @@ This bot exists only to showcase how to keep track of mineral tag over multiple
 
 Task for the user who wants to enhance this bot:
 - Allow mining from vespene geysirs
-- Remove dead workers and re-assign (new) workers to that mineral patch, or pick a worker from a long distance mineral patch
 - Re-assign workers when new base is completed (or near complete)
 - Re-assign workers when base died
-- Re-assign workers when mineral patch mines out
 - Re-assign workers when gas mines out
 """
 
-from typing import Dict, Set
+from typing import Optional
 
 from loguru import logger
 
@@ -24,66 +22,112 @@ from sc2.main import run_game
 from sc2.player import Bot, Computer
 from sc2.position import Point2
 from sc2.unit import Unit
-from sc2.units import Units
+from sc2.game_state import GameState
+from sc2.unit_command import UnitCommand
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
-from sc2.ids.upgrade_id import UpgradeId
 
+from ability_cache import AbilityCache
+from build_order import BuildOrder, BuildStep, free_geyser
+from command_filter import CommandFilter
+from mining_geometry import BaseGeometryCache, DropPointCache
+from supply_planner import SupplyPlanner
+from timeline import ResourceTimeline
+from unit_index import UnitIndex
+from worker_ledger import WorkerLedger
 
 # pylint: disable=W0231
 class WorkerStackBot(BotAI):
 
     def __init__(self):
-        self.worker_to_mineral_patch_dict: Dict[int, int] = {}
-        self.mineral_patch_to_list_of_workers: Dict[int, Set[int]] = {}
-        self.minerals_sorted_by_distance: Units = Units([], self)
+        self.ledger = WorkerLedger()
+        # Tag of the nexus whose mineral line the workers are stacked on
+        self.main_base_tag: Optional[int] = None
         # Distance 0.01 to 0.1 seems fine
         self.townhall_distance_threshold = 0.01
         # Distance factor between 0.95 and 1.0 seems fine
         self.townhall_distance_factor = 1
-        self.cybercore_started = False
+        # Mineral patch -> nexus and drop point, rebuilt when a nexus finishes or dies
+        self.drop_points = DropPointCache(distance_factor=self.townhall_distance_factor)
+        # Patch order of every base, analyzed once in on_start
+        self.base_geometry = BaseGeometryCache(distance_factor=self.townhall_distance_factor)
+        # Drops orders the units are already executing before they reach the game
+        self.command_filter = CommandFilter()
+        # Own units by (type, ready, idle), rebuilt once per game loop
+        self.unit_index = UnitIndex(self)
+        # One batched available-abilities query per frame, nexuses without chrono energy are not queried
+        self.ability_cache = AbilityCache(self)
+        # Build order from build_orders/worker_rush.json, steps are evaluated one at a time from the construction hooks
+        self.opening = BuildOrder.load("worker_rush")
+        # Projected income and the pylons planned from it, no placement grid here so spots come from find_placement
+        self.timeline = ResourceTimeline()
+        self.supply_planner = SupplyPlanner()
 
     async def on_start(self):
         self.client.game_step = 1
+        self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+        self.base_geometry.analyze(self.expansion_locations_dict)
+        self.opening.setup(self.structures)
         await self.assign_workers()
 
     async def assign_workers(self):
-        self.minerals_sorted_by_distance = self.mineral_field.closer_than(10,
-                                                                          self.start_location).sorted_by_distance_to(
-                                                                              self.start_location
-                                                                          )
+        if not self.townhalls:
+            return
+        main_base = self.townhalls.closest_to(self.start_location)
+        self.main_base_tag = main_base.tag
+        geometry = self.base_geometry.for_townhall(main_base)
+        if geometry is None:
+            return
+        # Patches are ranked by distance so the closest ones are filled first
+        self.ledger.add_base(self.main_base_tag, geometry.ranked())
 
         # Assign workers to mineral patch, start with the mineral patch closest to base
-        for mineral in self.minerals_sorted_by_distance:
+        for patch in geometry.patches:
             # Assign workers closest to the mineral patch
-            workers = self.workers.tags_not_in(self.worker_to_mineral_patch_dict).sorted_by_distance_to(mineral)
+            workers = self.workers.tags_not_in(self.ledger.worker_to_patch).sorted_by_distance_to(patch.position)
             for worker in workers:
                 # Assign at most 2 workers per patch
-                # This dict is not really used further down the code, but useful to keep track of how many workers are assigned to this mineral patch - important for when the mineral patch mines out or a worker dies
-                if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, [])) < 2:
-                    if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, [])) == 0:
-                        self.mineral_patch_to_list_of_workers[mineral.tag] = {worker.tag}
-                    else:
-                        self.mineral_patch_to_list_of_workers[mineral.tag].add(worker.tag)
+                # The ledger keeps track of how many workers are assigned to this mineral patch - important for when the mineral patch mines out or a worker dies
+                if self.ledger.count(patch.tag) < 2:
                     # Keep track of which mineral patch the worker is assigned to - if the mineral patch mines out, reassign the worker to another patch
-                    self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
+                    self.ledger.assign(worker.tag, patch.tag)
                 else:
                     break
 
     async def assign_worker_to_mineral_patch(self, worker: Unit):
-        # Try to find a mineral patch that has less than 2 workers
-        for mineral in self.minerals_sorted_by_distance:
-            if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set())) < 2:
-                self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-                break
-        else:
-            # If all patches have 2 workers, just assign to the closest mineral patch
-            closest_mineral = self.minerals_sorted_by_distance[0]
-            self.mineral_patch_to_list_of_workers.setdefault(closest_mineral.tag, set()).add(worker.tag)
-            self.worker_to_mineral_patch_dict[worker.tag] = closest_mineral.tag
-            logger.warning(f"Could not find a mineral patch with less than 2 workers, assigning worker {worker.tag} to the closest mineral patch {closest_mineral.tag}")
+        # Take the mineral patch with the fewest workers, closest patches first
+        mineral_tag = self.ledger.least_saturated_patch(self.main_base_tag)
+        if mineral_tag is None:
+            logger.warning(f"No mineral patch left to assign worker {worker.tag} to")
+            return
+        if self.ledger.count(mineral_tag) >= 2:
+            logger.warning(f"Could not find a mineral patch with less than 2 workers, assigning worker {worker.tag} to the least saturated mineral patch {mineral_tag}")
+        self.ledger.assign(worker.tag, mineral_tag)
+
+    async def on_unit_created(self, unit: Unit):
+        if unit.type_id == UnitTypeId.PROBE:
+            await self.assign_worker_to_mineral_patch(unit)
+
+    async def on_building_construction_started(self, unit: Unit):
+        self.opening.add_structure(unit)
+
+    async def on_building_construction_complete(self, unit: Unit):
+        self.opening.complete_structure(unit)
+        if unit.type_id == UnitTypeId.NEXUS:
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+
+    async def on_unit_destroyed(self, unit_tag: int):
+        # Drop the dead worker, mined out patch or destroyed nexus, orphaned workers get reassigned in on_step
+        self.ledger.remove_unit(unit_tag)
+        self.drop_points.forget(unit_tag)
+        self.base_geometry.forget(unit_tag)
+        self.command_filter.forget(unit_tag)
+        self.ability_cache.forget(unit_tag)
+        self.opening.remove_structure(unit_tag)
+        unit = self._structures_previous_map.get(unit_tag)
+        if unit and unit.type_id == UnitTypeId.NEXUS:
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
 
     async def custom_distribute_workers(self):
         # Check for idle workers, and re-assign them to the closest mineral patch
@@ -96,50 +140,84 @@ class WorkerStackBot(BotAI):
                 await self.assign_worker_to_mineral_patch(gas_worker)
         else:
             # Assign workers to gas
-            for gas in self.structures(UnitTypeId.ASSIMILATOR).ready:
+            for gas in self.unit_index(UnitTypeId.ASSIMILATOR, ready=True):
                 if gas.assigned_harvesters < gas.ideal_harvesters:
                     worker = self.select_build_worker(gas.position)
                     if worker:
                         worker.gather(gas)
 
         # Get all mineral patches that have less than 2 workers
-        under_assigned_minerals = [mineral for mineral, workers in self.mineral_patch_to_list_of_workers.items() if len(workers) < 2]
+        under_assigned_minerals = [mineral for mineral, workers in self.ledger.patch_to_workers.items() if len(workers) < 2]
         
         # Redistribute workers from saturated bases to unsaturated ones
         for th in self.townhalls.ready:
             # print number of townhalls, number of workers assigned to it, and number of workers that should be assigned to it
-            logger.info(f"Townhall {th.tag} has {len(self.mineral_patch_to_list_of_workers.get(th.tag, []))} workers assigned, and should have {th.ideal_harvesters} workers assigned")
+            logger.info(f"Townhall {th.tag} has {self.ledger.base_count(th.tag)} workers assigned, and should have {th.ideal_harvesters} workers assigned")
             if th.assigned_harvesters > 16:
                 excess = th.assigned_harvesters - 16
                 for _ in range(excess):
                     worker = self.workers.closest_to(th.position)
                     if under_assigned_minerals:
                         target_mineral = under_assigned_minerals.pop()
-                        self.mineral_patch_to_list_of_workers[target_mineral].add(worker.tag)
-                        self.worker_to_mineral_patch_dict[worker.tag] = target_mineral
-                        worker.gather(self.mineral_field.find_by_tag(target_mineral))
+                        self.ledger.assign(worker.tag, target_mineral)
+                        worker.gather(self.unit_index.get(target_mineral))
                     else:
                         # All patches seem saturated, just assign to any patch
                         await self.assign_worker_to_mineral_patch(worker)
 
 
+    async def execute_build_step(self, step: BuildStep, nexus: Unit):
+        """Start a build order step and tell the engine, which then moves on to the next one."""
+        if not self.can_afford(step.target):
+            return
+        if step.is_research:
+            for structure in self.unit_index(step.researched_from, ready=True, idle=True):
+                structure.research(step.target)
+                self.opening.issued(step, self.state.game_loop)
+                return
+            return
+
+        if step.target == UnitTypeId.ASSIMILATOR:
+            geyser = free_geyser(self)
+            worker = self.select_build_worker(geyser.position) if geyser else None
+            if worker is None:
+                return
+            worker.build(UnitTypeId.ASSIMILATOR, geyser)
+        elif step.target == UnitTypeId.PYLON:
+            # make sure the pylon is not inside the mineral line
+            if not await self.build(UnitTypeId.PYLON, near=nexus.position.towards(self.game_info.map_center, 5)):
+                return
+        else:
+            pylons = self.unit_index(UnitTypeId.PYLON, ready=True)
+            if not pylons or not await self.build(step.target, near=pylons.random):
+                return
+        self.opening.issued(step, self.state.game_loop)
+
+    def do(self, action: UnitCommand, subtract_cost: bool = False, subtract_supply: bool = False, can_afford_check: bool = False, ignore_warning: bool = False) -> bool:
+        # Redundant orders are dropped, the unit is already doing what was asked
+        if not self.command_filter.allow(action, self.state.game_loop):
+            return True
+        return super().do(action, subtract_cost, subtract_supply, can_afford_check, ignore_warning)
+
+    def _prepare_step(self, state: GameState, proto_game_info):
+        super()._prepare_step(state, proto_game_info)
+        # Group the units of the new observation once, the type queries of the frame are answered from it
+        self.unit_index.refresh()
+
     async def on_step(self, iteration: int):
         nexus = self.townhalls.ready.random
 
-        # Check if the number of mineral patches we are tracking is different from actual mineral patches in the game
-        if len(self.minerals_sorted_by_distance) != self.mineral_field.amount:
-            await self.assign_workers()
-
         # If this random nexus is not idle and has not chrono buff, chrono it with one of the nexuses we have
         if not nexus.is_idle and not nexus.has_buff(BuffId.CHRONOBOOSTENERGYCOST):
-            nexuses = self.structures(UnitTypeId.NEXUS)
-            abilities = await self.get_available_abilities(nexuses)
-            for loop_nexus, abilities_nexus in zip(nexuses, abilities):
-                if AbilityId.EFFECT_CHRONOBOOSTENERGYCOST in abilities_nexus:
+            nexuses = self.unit_index(UnitTypeId.NEXUS)
+            await self.ability_cache.refresh(nexuses, AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, energy_cost=50)
+            for loop_nexus in nexuses:
+                if self.ability_cache.available(loop_nexus, AbilityId.EFFECT_CHRONOBOOSTENERGYCOST):
                     loop_nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, nexus)
+                    self.ability_cache.invalidate(loop_nexus.tag)
                     break
 
-        unassigned_workers = self.workers.tags_not_in(self.worker_to_mineral_patch_dict)
+        unassigned_workers = self.workers.tags_not_in(self.ledger.worker_to_patch)
         for worker in unassigned_workers:
             await self.assign_worker_to_mineral_patch(worker)
 
@@ -153,80 +231,34 @@ class WorkerStackBot(BotAI):
         #await self.custom_distribute_workers()
         
 
-        # Build pylon when on low supply
-        if self.supply_left < 4 and self.already_pending(UnitTypeId.PYLON) == 0:
-            # Always check if you can afford something before you build it
-            if self.can_afford(UnitTypeId.PYLON):
-                # make sure the pylon is not inside the mineral line
-                await self.build(UnitTypeId.PYLON, near=nexus.position.towards(self.game_info.map_center, 5))
-                #await self.build(UnitTypeId.PYLON, near=nexus)
-            return
+        # Build the pylons the production will need by the time they finish
+        self.timeline.refresh(self)
+        needed = self.supply_planner.pylons_needed(self, self.timeline.mineral_rate, self.townhalls.amount * 22)
+        if needed > 0:
+            # make sure the pylons are not inside the mineral lines
+            near = [townhall.position.towards(self.game_info.map_center, 5) for townhall in self.townhalls.ready]
+            await self.supply_planner.build_pylons(self, None, near, needed, self.workers.gathering)
+            # Save the minerals for the pylons when supply is really short
+            if self.supply_left < 4:
+                return
 
         # If we have less than 22 workers, and a nexus is ready, train a worker
         if self.supply_workers + self.already_pending(UnitTypeId.PROBE) < self.townhalls.amount * 22 and nexus.is_idle:
             if self.can_afford(UnitTypeId.PROBE):
                 nexus.train(UnitTypeId.PROBE)
 
-        # Once we have a pylon
-        if self.structures(UnitTypeId.PYLON).ready:
-            pylon = self.structures(UnitTypeId.PYLON).ready.random
-            # If we have no gateways, build one
-            if not self.structures(UnitTypeId.GATEWAY):
-                if self.can_afford(UnitTypeId.GATEWAY):
-                    await self.build(UnitTypeId.GATEWAY, near=pylon)
-                return
-            else:
-                # If we have no cybernetics core, build one
-                if not self.structures(UnitTypeId.CYBERNETICSCORE):
-                    if self.can_afford(UnitTypeId.CYBERNETICSCORE):
-                        await self.build(UnitTypeId.CYBERNETICSCORE, near=pylon)
-                        self.cybercore_started = True
-                    return
-                else:
-                    if self.cybercore_started: #TODO: Change to 'cybernetics_core progress > 0'
-
-                        # start two gases when affordable
-                        if self.can_afford(UnitTypeId.ASSIMILATOR) and self.structures(UnitTypeId.ASSIMILATOR).amount < 2:
-                            vgs = self.vespene_geyser.closer_than(15, nexus)
-                            for vg in vgs:
-                                if self.can_afford(UnitTypeId.ASSIMILATOR):
-                                    worker = self.select_build_worker(vg.position)
-                                    if worker is None:
-                                        break
-                                    worker.build(UnitTypeId.ASSIMILATOR, vg)
-                                    worker.stop(queue=True)
-                                    break
-                    # build a twilight council when affordable
-                    if self.structures(UnitTypeId.CYBERNETICSCORE).ready and not self.structures(UnitTypeId.TWILIGHTCOUNCIL):
-                        if self.can_afford(UnitTypeId.TWILIGHTCOUNCIL):
-                            await self.build(UnitTypeId.TWILIGHTCOUNCIL, near=pylon)
-                            return
-                                    
-
-        # Research warp gate if cybercore is completed
-        if (
-            self.structures(UnitTypeId.CYBERNETICSCORE).ready and self.can_afford(AbilityId.RESEARCH_WARPGATE)
-            and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 0
-        ):
-            ccore = self.structures(UnitTypeId.CYBERNETICSCORE).ready.first
-            ccore.research(UpgradeId.WARPGATERESEARCH)
-
-        # Once we are researching warp gate, start a twilight council if we can afford it
-        # and if we don't have one already
-        if (
-            self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready and self.can_afford(AbilityId.RESEARCH_CHARGE)
-            and self.already_pending_upgrade(UpgradeId.CHARGE) == 0
-        ):
-            twilight = self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.first
-            twilight.research(UpgradeId.CHARGE)
+        # Next step of the build order, the engine only looks at that one step
+        step = self.opening.next_step(self)
+        if step is not None:
+            await self.execute_build_step(step, nexus)
 
         # If gate way is done, make zealots
-        if self.structures(UnitTypeId.GATEWAY).ready:
-            gateway = self.structures(UnitTypeId.GATEWAY).ready.random
+        if self.unit_index(UnitTypeId.GATEWAY, ready=True):
+            gateway = self.unit_index(UnitTypeId.GATEWAY, ready=True).random
             if self.can_afford(UnitTypeId.ZEALOT) and gateway.is_idle:
                 # if warp gate is done, warp in zealots near random pylon near a nexus 
-                if self.structures(UnitTypeId.WARPGATE).ready:
-                    pylon = self.structures(UnitTypeId.PYLON).ready.random
+                if self.unit_index(UnitTypeId.WARPGATE, ready=True):
+                    pylon = self.unit_index(UnitTypeId.PYLON, ready=True).random
                     placement = await self.find_placement(UnitTypeId.ZEALOT, pylon.position.to2, placement_step=1)
                     if placement is None:
                         #return ActionResult.CantFindPlacementLocation
@@ -235,15 +267,12 @@ class WorkerStackBot(BotAI):
                     gateway.warp_in(UnitTypeId.ZEALOT, placement)
 
         # if there is more than 10 zealots, attack
-        if self.units(UnitTypeId.ZEALOT).amount > 10:
-            for zealot in self.units(UnitTypeId.ZEALOT):
+        if self.unit_index(UnitTypeId.ZEALOT).amount > 10:
+            for zealot in self.unit_index(UnitTypeId.ZEALOT):
                 zealot.attack(self.enemy_start_locations[0])
 
 
-        if self.worker_to_mineral_patch_dict:
-            # Quick-access cache mineral tag to mineral Unit
-            minerals: Dict[int, Unit] = {mineral.tag: mineral for mineral in self.mineral_field}
-
+        if self.ledger.worker_to_patch:
             for worker in self.workers:
                 if not self.townhalls:
                     logger.error("All townhalls died - can't return resources")
@@ -252,22 +281,21 @@ class WorkerStackBot(BotAI):
                 worker: Unit
                 
                 # Check if worker's tag exists in the dictionary
-                if worker.tag in self.worker_to_mineral_patch_dict:
-                    mineral_tag = self.worker_to_mineral_patch_dict[worker.tag]
-                    mineral = minerals.get(mineral_tag, None)
+                if worker.tag in self.ledger:
+                    mineral_tag = self.ledger.patch_of(worker.tag)
+                    mineral = self.unit_index.get(mineral_tag)
                 else:
-                    # Handle the case where the worker's tag doesn't exist in the dictionary.
+                    # Handle the case where the worker's tag doesn't exist in the ledger.
                     await self.assign_worker_to_mineral_patch(worker)
-                    mineral_tag = self.worker_to_mineral_patch_dict.get(worker.tag, None)
+                    mineral_tag = self.ledger.patch_of(worker.tag)
                     if mineral_tag is None:
                         logger.error(f"Failed to assign worker with tag {worker.tag} to a mineral patch")
                         continue
                 
                 if mineral_tag is None:
                     logger.error(f"Worker with tag {worker.tag} has no mineral patch assigned")
-                else:
-                    mineral = minerals.get(mineral_tag, None)
                     continue
+                mineral = self.unit_index.get(mineral_tag)
 
                 if mineral is None:
                     logger.error(f"Mined out mineral with tag {mineral_tag} for worker {worker.tag}")
@@ -279,11 +307,17 @@ class WorkerStackBot(BotAI):
                         worker.gather(mineral)
                 # Order worker to return minerals if carrying minerals
                 else:
-                    th = self.townhalls.closest_to(worker)
+                    drop_point = self.drop_points.get(mineral_tag)
+                    if drop_point:
+                        th_position, th_radius = drop_point.townhall_position, drop_point.townhall_radius
+                        pos: Point2 = drop_point.position
+                    else:
+                        th = self.townhalls.closest_to(worker)
+                        th_position, th_radius = th.position, th.radius
+                        pos: Point2 = th_position.towards(worker, th_radius * self.townhall_distance_factor)
                     # Move worker in front of the nexus to avoid deceleration until the last moment
-                    if worker.distance_to(th) > th.radius + worker.radius + self.townhall_distance_threshold:
-                        pos: Point2 = th.position
-                        worker.move(pos.towards(worker, th.radius * self.townhall_distance_factor))
+                    if worker.distance_to(th_position) > th_radius + worker.radius + self.townhall_distance_threshold:
+                        worker.move(pos)
                         worker.return_resource(queue=True)
                     else:
                         worker.return_resource()
@@ -292,6 +326,7 @@ class WorkerStackBot(BotAI):
         # Print info every 30 game-seconds
         if self.state.game_loop % (22.4 * 30) == 0:
             logger.info(f"{self.time_formatted} Mined a total of {int(self.state.score.collected_minerals)} minerals")
+            logger.info(self.command_filter.summary())
 
 
 def main():
@@ -0,0 +1,172 @@
+"""
+Bookkeeping for which worker mines which mineral patch, and which base owns that patch.
+
+The bots used to keep two hand maintained dicts (worker -> patch and patch -> workers) and
+scan them linearly whenever a worker moved. The ledger keeps both directions plus the
+patch -> base mapping in sync, so assigning, unassigning and moving a worker is O(1), and
+"least saturated patch of base X" is answered from a per-base heap in O(log n).
+
+Stale tags are dropped through `remove_unit`, which the bots call from `on_unit_destroyed`
+for dead workers, mined out patches and destroyed townhalls alike.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class WorkerLedger:
+    def __init__(self):
+        self.worker_to_patch: Dict[int, int] = {}
+        self.patch_to_workers: Dict[int, Set[int]] = {}
+        self.patch_to_base: Dict[int, int] = {}
+        self.base_to_patches: Dict[int, Set[int]] = {}
+        # Number of workers assigned to all patches of a base
+        self.base_worker_count: Dict[int, int] = {}
+        # Tie breaker between patches with the same amount of workers, lower is preferred
+        self._patch_rank: Dict[int, float] = {}
+        # Per base heap of (worker count, rank, patch tag), entries are invalidated lazily
+        self._base_heaps: Dict[int, List[Tuple[int, float, int]]] = {}
+
+    def __contains__(self, worker_tag: int) -> bool:
+        return worker_tag in self.worker_to_patch
+
+    def __len__(self) -> int:
+        return len(self.worker_to_patch)
+
+    # Bases and patches
+
+    def add_base(self, base_tag: int, patches: Iterable[Tuple[int, float]]):
+        """Register a base and its (patch tag, rank) pairs. Patches already known are kept."""
+        self.base_to_patches.setdefault(base_tag, set())
+        self.base_worker_count.setdefault(base_tag, 0)
+        self._base_heaps.setdefault(base_tag, [])
+        for patch_tag, rank in patches:
+            self.add_patch(patch_tag, base_tag, rank)
+
+    def add_patch(self, patch_tag: int, base_tag: int, rank: float = 0.0):
+        """Register a mineral patch as belonging to a base."""
+        previous_base = self.patch_to_base.get(patch_tag)
+        if previous_base == base_tag:
+            return
+        if previous_base is not None:
+            self._detach_patch(patch_tag)
+
+        self.base_to_patches.setdefault(base_tag, set()).add(patch_tag)
+        self.base_worker_count.setdefault(base_tag, 0)
+        self.patch_to_base[patch_tag] = base_tag
+        self._patch_rank[patch_tag] = rank
+        workers = self.patch_to_workers.setdefault(patch_tag, set())
+        self.base_worker_count[base_tag] += len(workers)
+        self._push(patch_tag)
+
+    def remove_patch(self, patch_tag: int) -> Set[int]:
+        """Forget a patch (e.g. mined out). Returns the workers that lost their assignment."""
+        workers = self.patch_to_workers.pop(patch_tag, set())
+        if patch_tag in self.patch_to_base:
+            base_tag = self.patch_to_base.pop(patch_tag)
+            self.base_to_patches[base_tag].discard(patch_tag)
+            self.base_worker_count[base_tag] -= len(workers)
+        self._patch_rank.pop(patch_tag, None)
+        for worker_tag in workers:
+            del self.worker_to_patch[worker_tag]
+        return workers
+
+    def remove_base(self, base_tag: int) -> Set[int]:
+        """Forget a base (e.g. destroyed townhall). Returns the workers that lost their assignment."""
+        orphaned_workers: Set[int] = set()
+        for patch_tag in list(self.base_to_patches.get(base_tag, ())):
+            orphaned_workers |= self.remove_patch(patch_tag)
+        self.base_to_patches.pop(base_tag, None)
+        self.base_worker_count.pop(base_tag, None)
+        self._base_heaps.pop(base_tag, None)
+        return orphaned_workers
+
+    def remove_unit(self, tag: int) -> Set[int]:
+        """Drop any worker, patch or base with this tag. Returns the workers that lost their assignment."""
+        if tag in self.worker_to_patch:
+            self.unassign(tag)
+            return set()
+        if tag in self.base_to_patches:
+            return self.remove_base(tag)
+        if tag in self.patch_to_workers or tag in self.patch_to_base:
+            return self.remove_patch(tag)
+        return set()
+
+    # Workers
+
+    def assign(self, worker_tag: int, patch_tag: int):
+        """Assign a worker to a patch, moving it away from its previous patch if needed."""
+        previous_patch = self.worker_to_patch.get(worker_tag)
+        if previous_patch == patch_tag:
+            return
+        if previous_patch is not None:
+            self.unassign(worker_tag)
+
+        self.worker_to_patch[worker_tag] = patch_tag
+        self.patch_to_workers.setdefault(patch_tag, set()).add(worker_tag)
+        base_tag = self.patch_to_base.get(patch_tag)
+        if base_tag is not None:
+            self.base_worker_count[base_tag] += 1
+            self._push(patch_tag)
+
+    def unassign(self, worker_tag: int) -> Optional[int]:
+        """Remove a worker from its patch. Returns the patch tag it was assigned to."""
+        patch_tag = self.worker_to_patch.pop(worker_tag, None)
+        if patch_tag is None:
+            return None
+        self.patch_to_workers[patch_tag].discard(worker_tag)
+        base_tag = self.patch_to_base.get(patch_tag)
+        if base_tag is not None:
+            self.base_worker_count[base_tag] -= 1
+            self._push(patch_tag)
+        return patch_tag
+
+    # Queries
+
+    def patch_of(self, worker_tag: int) -> Optional[int]:
+        return self.worker_to_patch.get(worker_tag)
+
+    def base_of_worker(self, worker_tag: int) -> Optional[int]:
+        patch_tag = self.worker_to_patch.get(worker_tag)
+        if patch_tag is None:
+            return None
+        return self.patch_to_base.get(patch_tag)
+
+    def workers_on(self, patch_tag: int) -> Set[int]:
+        return self.patch_to_workers.get(patch_tag, set())
+
+    def count(self, patch_tag: int) -> int:
+        return len(self.patch_to_workers.get(patch_tag, ()))
+
+    def base_count(self, base_tag: int) -> int:
+        return self.base_worker_count.get(base_tag, 0)
+
+    def least_saturated_patch(self, base_tag: int) -> Optional[int]:
+        """Patch of the given base with the fewest workers (ties go to the lowest rank)."""
+        heap = self._base_heaps.get(base_tag)
+        if not heap:
+            return None
+        while heap:
+            count, _rank, patch_tag = heap[0]
+            if self.patch_to_base.get(patch_tag) == base_tag and self.count(patch_tag) == count:
+                return patch_tag
+            heapq.heappop(heap)
+        return None
+
+    # Heap maintenance
+
+    def _push(self, patch_tag: int):
+        base_tag = self.patch_to_base[patch_tag]
+        heap = self._base_heaps.setdefault(base_tag, [])
+        heapq.heappush(heap, (self.count(patch_tag), self._patch_rank.get(patch_tag, 0.0), patch_tag))
+        # Outdated entries pile up with every count change, compact once they dominate the heap
+        if len(heap) > 4 * len(self.base_to_patches[base_tag]) + 16:
+            self._base_heaps[base_tag] = [
+                (self.count(tag), self._patch_rank.get(tag, 0.0), tag) for tag in self.base_to_patches[base_tag]
+            ]
+            heapq.heapify(self._base_heaps[base_tag])
+
+    def _detach_patch(self, patch_tag: int):
+        base_tag = self.patch_to_base.pop(patch_tag)
+        self.base_to_patches[base_tag].discard(patch_tag)
+        self.base_worker_count[base_tag] -= self.count(patch_tag)
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Set, Union
+from typing import Dict, Optional, Set, Tuple, Union
 
 from loguru import logger
 
@@ -6,12 +6,13 @@ from collections import deque
 
 from sc2 import maps
 from sc2.bot_ai import BotAI
-from sc2.data import Difficulty, Race
+from sc2.data import Difficulty, Race, Result
 from sc2.main import run_game
 from sc2.player import Bot, Computer
 from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
+from sc2.unit_command import UnitCommand
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
@@ -21,7 +22,24 @@ from sc2.game_info import GameInfo
 from sc2.game_state import GameState
 from sc2.client import Client
 
-import random
+import time
+
+from ability_cache import WARP_IN_COOLDOWN, AbilityCache
+from build_order import BuildOrder, BuildStep, free_geyser
+from command_filter import CommandFilter
+from gas_manager import WORKERS_PER_ASSIMILATOR, Assimilator, GasCandidate, GasManager
+from mining_geometry import BaseGeometryCache, DropPointCache
+from placement import PlacementGrid
+from rebalance import MineralWorker, patch_slots, rebalance
+from stacking_micro import StackingMicro
+from manager_profiler import ManagerProfiler
+from step_scheduler import LOW, StepScheduler
+from supply_planner import SupplyPlanner
+from telemetry import INFO, EventKind, Telemetry
+from timeline import WORKER_SPEED, Cost, ResourceTimeline
+from unit_index import UnitIndex
+from warp_spots import WarpSpotPool
+from worker_ledger import WorkerLedger
 
 class ZealotChargeBot(BotAI):
     """
@@ -54,97 +72,147 @@ class ZealotChargeBot(BotAI):
         self.charge_researched = False
 
         # Reusing the mining optimization attributes
-        self.worker_to_mineral_patch_dict = {}
-        self.mineral_patch_to_list_of_workers = {}
+        self.ledger = WorkerLedger()
 
-        self.minerals_sorted_by_distance = []
         self.townhall_distance_threshold = 0.15
         self.townhall_distance_factor = 1
+        # Mineral patch -> nexus and drop point, rebuilt when a nexus finishes or dies
+        self.drop_points = DropPointCache(distance_offset=self.townhall_distance_threshold)
+        # Patch order, near / far rows and drop points of every base, analyzed once in on_start
+        self.base_geometry = BaseGeometryCache(distance_offset=self.townhall_distance_threshold)
+        # Decide the stacking orders of all mineral workers in one vectorized pass
+        self.batched_worker_micro = True
+        self.stacking_micro = StackingMicro(self.townhall_distance_threshold)
+        # Drops orders the units are already executing before they reach the game
+        self.command_filter = CommandFilter()
+        # Own units by (type, ready, idle), rebuilt once per game loop
+        self.unit_index = UnitIndex(self)
+        # One batched available-abilities query per frame, warpgates on cooldown are not queried
+        self.ability_cache = AbilityCache(self)
+        # Local occupancy / pylon power grid, the server only confirms the chosen building spot
+        self.placement = PlacementGrid(self)
+        # Warp-in positions around powered pylons, computed once per frame
+        self.warp_spots = WarpSpotPool(self, self.placement)
+        # Typed events of the hot manager loops, written to telemetry/ by a background thread
+        self.telemetry = Telemetry(level=INFO)
         self.worker_to_nexus_dict: Dict[int, int] = {}
         self.builders = set()
         self.scouts = set()
-        #workers mining vespene
-        self.workers_mining_vespene = set()
+        # Workers mining each assimilator
+        self.gas = GasManager()
+        # Opening build order, steps are evaluated one at a time from the construction hooks
+        self.opening = BuildOrder.load("zealot_charge")
+        # Projected bank, the builder of the next step leaves early enough to arrive when it is affordable
+        self.timeline = ResourceTimeline()
+        self.prepared_step: Optional[Tuple[BuildStep, Optional[Point2]]] = None
 
         # Additional attributes for our Zealot Charge Bot
-        self.assimilator_started = False
-        self.twilight_started = False
         self.scout_fleeing = False
 
         self.max_probes = 55    # Maximum number of probes to produce
         self.supply_buffer = 5  # supply buffer
         self.max_nexus = 3      # max nexus
         self.max_gateways = 16   # max gateways
-        self.max_assimilators = 1 # number of assimilators to build
+        self.gas_worker_target = 3 # workers on gas while Charge / Warpgate are not done, everyone else mines minerals
+        self.zealot_attack_threshold = 25 # zealots needed (with charge) before attacking
+        # Pylons for the supply the production will use over the next seconds
+        self.supply_planner = SupplyPlanner(buffer=self.supply_buffer)
+
+        # on_step managers with their cadence in game loops, low priority ones are deferred when the frame is over budget
+        # Per manager latency / round-trip histograms, logged every 60 game seconds and written to profiles/ on game end
+        self.profiler = ManagerProfiler(log_interval=60)
+        self.scheduler = StepScheduler(frame_budget=0.02, profiler=self.profiler)
+        self.scheduler.add(self.rebalance_workers, every=None, event="resaturate")  # Only after a nexus or probe event
+        self.scheduler.add(self.scout_with_zealot, every=2)         # Scout with Zealot
+        self.scheduler.add(self.train_zealots, every=4)             # Train Zealots
+        self.scheduler.add(self.check_for_idle_workers, every=4, priority=LOW)  # Check for idle workers
+        self.scheduler.add(self.manage_worker_task, every=1)        # Our worker logic
+        self.scheduler.add(self.manage_gas, every=8, priority=LOW)  # Our gas logic
+        self.scheduler.add(self.build_order, every=4)               # Our building logic
+        self.scheduler.add(self.build_pylon, every=8)               # Build Pylons if we are low
+        self.scheduler.add(self.manage_chrono_boost, every=16, priority=LOW)  # Manage Chrono Boost
+        self.scheduler.add(self.logs, every=224, priority=LOW)      # Log for debugging every 10 game seconds
 
     async def on_start(self):
         self.client.game_step = 1
+        self.profiler.attach(self.client)
+        self.telemetry.open(f"telemetry/{type(self).__name__}_{int(time.time())}.jsonl")
         await self.chat_send("(glhf)")
+        self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+        self.base_geometry.analyze(self.expansion_locations_dict)
+        self.placement.setup()
+        self.opening.setup(self.structures)
         await self.assign_initial_workers()
 
         # DEBUG
         #await self.client.debug_fast_build()
         #await self.client.debug_all_resources()
  
-    async def on_step(self, iteration: int):
-        #await self.distribute_workers()        # For general worker distribution (replaced by our own logic)
+    def do(self, action: UnitCommand, subtract_cost: bool = False, subtract_supply: bool = False, can_afford_check: bool = False, ignore_warning: bool = False) -> bool:
+        # Redundant orders are dropped, the unit is already doing what was asked
+        if not self.command_filter.allow(action, self.state.game_loop):
+            return True
+        return super().do(action, subtract_cost, subtract_supply, can_afford_check, ignore_warning)
 
-        await self.scout_with_zealot()          # Scout with Zealot
-        await self.train_zealots()              # Train Zealots
+    def _prepare_step(self, state: GameState, proto_game_info):
+        super()._prepare_step(state, proto_game_info)
+        # Group the units of the new observation once, the type queries of the frame are answered from it
+        self.unit_index.refresh()
 
-        await self.check_for_idle_workers()     # Check for idle workers
-        await self.manage_worker_task()         # Our worker logic
-        await self.manage_gas()                 # Our gas logic
+    async def on_step(self, iteration: int):
+        #await self.distribute_workers()        # For general worker distribution (replaced by our own logic)
 
-        await self.build_order()                # Our building logic
-    
-        await self.build_pylon()                # Build Pylons if we are low
-        await self.manage_chrono_boost()        # Manage Chrono Boost
+        self.telemetry.game_loop = self.state.game_loop
+        # Runs the managers registered in __init__ that are due this game loop
+        await self.scheduler.run(self.state.game_loop)
+        self.profiler.maybe_log(self.time)
 
-        await self.logs()                       # Log for debugging
+    async def on_end(self, game_result: Result):
+        self.profiler.dump(f"profiles/{type(self).__name__}_{int(time.time())}")
+        self.telemetry.close()
 
     # Logging for debugging
     async def logs(self):
 
         all_logs = False
-        # Every 10 seconds print these logs
-        if self.time % 10 == 0:
-            
-            logger.warning("======================== LOG INFO ========================")
-            # time elapsed
-            logger.info(f"Time elapsed: {self.time}(s)")
-            logger.info(f"Builders: {self.builders}")
-
-            if all_logs:
-                logger.info(f"Worker to Nexus: {self.worker_to_nexus_dict}")
-                # idle workers
-                logger.info(f"Idle workers: {self.workers.idle.amount}")
-                # idle worker ids
-                logger.info(f"Idle worker ids: {[worker.tag for worker in self.workers.idle]}")
-                # log nexuses and their ids as well as their ideal harvesters and assigned harvesters
-                # nexus count
-                logger.warning("======================== NEXUS INFO ========================")
-                logger.info(f"Nexus count: {self.townhalls.amount}")
-                logger.info(f"Nexuses: {self.townhalls}")
-                logger.info(f"Nexus ids: {[nexus.tag for nexus in self.townhalls]}")
-                logger.info(f"Nexus ideal harvesters: {[nexus.ideal_harvesters for nexus in self.townhalls]}")
-                logger.info(f"Nexus assigned harvesters: {[nexus.assigned_harvesters for nexus in self.townhalls]}")
-            
-                # get game state
-                alerts = self.state.alerts
-                action_errors = self.state.action_errors
-                if alerts:
-                    logger.warning(f"Alerts: {alerts}")
-                if action_errors:
-                    logger.warning(f"Action Errors: {action_errors}")
+        
+        logger.warning("======================== LOG INFO ========================")
+        # time elapsed
+        logger.info(f"Time elapsed: {self.time}(s)")
+        logger.info(f"Builders: {self.builders}")
+        logger.info(self.command_filter.summary())
+        logger.info(f"Scheduler: {self.scheduler.frames_over_budget} frames over budget, managers: {self.scheduler.stats()}")
+
+        if all_logs:
+            logger.info(f"Worker to Nexus: {self.worker_to_nexus_dict}")
+            # idle workers
+            logger.info(f"Idle workers: {self.workers.idle.amount}")
+            # idle worker ids
+            logger.info(f"Idle worker ids: {[worker.tag for worker in self.workers.idle]}")
+            # log nexuses and their ids as well as their ideal harvesters and assigned harvesters
+            # nexus count
+            logger.warning("======================== NEXUS INFO ========================")
+            logger.info(f"Nexus count: {self.townhalls.amount}")
+            logger.info(f"Nexuses: {self.townhalls}")
+            logger.info(f"Nexus ids: {[nexus.tag for nexus in self.townhalls]}")
+            logger.info(f"Nexus ideal harvesters: {[nexus.ideal_harvesters for nexus in self.townhalls]}")
+            logger.info(f"Nexus assigned harvesters: {[nexus.assigned_harvesters for nexus in self.townhalls]}")
+        
+            # get game state
+            alerts = self.state.alerts
+            action_errors = self.state.action_errors
+            if alerts:
+                logger.warning(f"Alerts: {alerts}")
+            if action_errors:
+                logger.warning(f"Action Errors: {action_errors}")
 
     async def scout_with_zealot(self):
         # If no Zealots exist, use a Probe to scout
-        if not self.units(UnitTypeId.ZEALOT):
+        if not self.unit_index(UnitTypeId.ZEALOT):
             return
         # If we have no scout yet, assign the first zealot as a scout
         if not self.scouts:
-            zealots = self.units(UnitTypeId.ZEALOT)
+            zealots = self.unit_index(UnitTypeId.ZEALOT)
             if zealots:  # If there is at least one zealot
                 scout = zealots.first
                 self.scouts.add(scout.tag)
@@ -154,7 +222,7 @@ class ZealotChargeBot(BotAI):
         else:
             # If we already have a scout, we will continue to issue scouting orders
             for tag in self.scouts:
-                scout = self.units.find_by_tag(tag)
+                scout = self.unit_index.get(tag)
                 if scout:
                         # Issue scouting orders, e.g., move to various enemy expansions
                         await self.issue_scouting_orders(scout)
@@ -164,7 +232,7 @@ class ZealotChargeBot(BotAI):
         if self.scout_fleeing:
             if scout.shield == scout.shield_max:  # Scout has regenerated shields
                 self.scout_fleeing = False
-                logger.info(f"Scout {scout.tag} has regenerated shields. Resuming scouting.")
+                self.telemetry.info(EventKind.SCOUT_RESUME, scout.tag, a=scout.shield)
                 scout.stop() 
             else:
                 return  # Continue fleeing until fully regenerated
@@ -175,52 +243,41 @@ class ZealotChargeBot(BotAI):
             # Move to a point that's within the Zealot's vision range of the enemy's start location
             safe_distance_point = self.enemy_start_locations[0].towards(self.start_location, scout.sight_range)
             scout.move(safe_distance_point)
-            logger.info(f"Scout {scout.tag} is cautiously moving to {safe_distance_point}")
+            self.telemetry.info(EventKind.SCOUT_MOVE, scout.tag, a=safe_distance_point.x, b=safe_distance_point.y)
 
         if scout:
             # Check for enemies in sight range
             enemies_in_sight = self.enemy_units.filter(lambda unit: unit.can_be_attacked and unit.is_visible)
             if enemies_in_sight:
-                logger.info(f"Scout {scout.tag} has sighted {len(enemies_in_sight)} enemies")
-                # Log detailed information about each enemy in sight
-                for enemy in enemies_in_sight:
-                    logger.info(f"Scout {scout.tag} has sighted enemy {enemy.type_id} with tag {enemy.tag} at {enemy.position}")
-                    if enemy.can_attack:  # If the enemy can attack, log its range and dps
-                        logger.info(f"Enemy {enemy.type_id} with tag {enemy.tag} has range {enemy.ground_range} and DPS {enemy.calculate_dps_vs_target(scout)}")
+                self.telemetry.info(EventKind.SCOUT_SIGHTED, scout.tag, a=len(enemies_in_sight))
+                # Record detailed information about each enemy in sight (type id and its DPS vs the scout)
+                if self.telemetry.debug_enabled:
+                    for enemy in enemies_in_sight:
+                        enemy_dps = enemy.calculate_dps_vs_target(scout) if enemy.can_attack else 0
+                        self.telemetry.debug(EventKind.SCOUT_ENEMY, enemy.tag, scout.tag, a=enemy.type_id.value, b=enemy_dps)
                 # Choose an enemy to move towards or observe
                 target = enemies_in_sight.closest_to(scout)
                 observation_point = target.position.towards(scout, scout.sight_range)
                 scout.move(observation_point)
-                logger.info(f"Scout {scout.tag} is moving to observe {target.type_id} at {observation_point}")
-                logger.warning("INFO ABOUT OBSERVATION TARGET: ")
-                # log the enemy target
-                logger.warning(f"Enemy target: {target.tag} at {target.position} of type {target.type_id}")
-                # potential dps of the enemy target
-                logger.warning(f"DPS of scout vs target: {scout.calculate_dps_vs_target(target)}")
-                # potential dps of the scout
-                logger.warning(f"DPS of target vs scout: {target.calculate_dps_vs_target(scout)}")
-                # targets range
-                logger.warning(f"Target range: {target.ground_range}")
-                # scouts range
-                logger.warning(f"Scout range: {scout.ground_range}")
-                # target in range of scout
-                logger.warning(f"Target in range of scout? {scout.target_in_range(target)}")
-                # scout in range of target
-                logger.warning(f"Scout in range of target? {target.target_in_range(scout)}")
+                # DPS of scout vs target and of target vs scout
+                if self.telemetry.debug_enabled:
+                    self.telemetry.debug(
+                        EventKind.SCOUT_OBSERVE, scout.tag, target.tag,
+                        a=scout.calculate_dps_vs_target(target), b=target.calculate_dps_vs_target(scout)
+                    )
                 # if the target is a worker, attack it
                 if target.type_id == UnitTypeId.PROBE or target.type_id == UnitTypeId.SCV or target.type_id == UnitTypeId.DRONE:
-                    logger.warning(f"Target is a worker. Attacking...")
+                    self.telemetry.info(EventKind.SCOUT_ATTACK_WORKER, scout.tag, target.tag)
                     scout.attack(target)
 
 
             # Check if the scout is being attacked by comparing its current shield with its shield in the last step
             if scout.shield < self.prev_scout_shield:
-                logger.warning(f"Scout {scout.tag} is being attacked. Moving away... Shield: {scout.shield}/{scout.shield_max}")
                 # Move away towards a nexus
                 flee_position = self.townhalls.closest_to(scout).position.towards(scout, 5)
                 scout.move(flee_position)
                 self.scout_fleeing = True
-                logger.info(f"Scout {scout.tag} is fleeing to {flee_position}")
+                self.telemetry.warning(EventKind.SCOUT_FLEE, scout.tag, a=scout.shield, b=scout.shield_max)
 
             # Update the previous shield value for the next iteration
             self.prev_scout_shield = scout.shield
@@ -228,12 +285,12 @@ class ZealotChargeBot(BotAI):
     # Move zealots to our ramp
     async def move_zealots_to_ramp(self):
         # If we have zealots, move them to our ramp
-        if self.units(UnitTypeId.ZEALOT):
+        if self.unit_index(UnitTypeId.ZEALOT):
             # if its not a scouting zealot, move it to the ramp
-            for zealot in self.units(UnitTypeId.ZEALOT):
+            for zealot in self.unit_index(UnitTypeId.ZEALOT):
                 if zealot.tag not in self.scouts:
                     # if charge is done, attack the enemy
-                    if self.already_pending_upgrade(UpgradeId.CHARGE) == 1 and len(self.units(UnitTypeId.ZEALOT)) >= 25:
+                    if self.already_pending_upgrade(UpgradeId.CHARGE) == 1 and len(self.unit_index(UnitTypeId.ZEALOT)) >= self.zealot_attack_threshold:
                         # if we have a target, attack it
                         if self.enemy_units:
                             # compare enemy units to our zealots
@@ -255,26 +312,33 @@ class ZealotChargeBot(BotAI):
 
     # Train Zealots
     async def train_zealots(self):
-        
-        if self.structures(UnitTypeId.WARPGATE).ready.exists and self.can_afford(UnitTypeId.ZEALOT) and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 1:
-            for warpgate in self.structures(UnitTypeId.WARPGATE).ready:
-                abilities = await self.get_available_abilities(warpgate)
-                if AbilityId.WARPGATETRAIN_ZEALOT in abilities:
-                    pylon = self.structures(UnitTypeId.PYLON).ready.random
-                    pos = pylon.position.to2.random_on_distance(4)
-                    placement = await self.find_placement(AbilityId.WARPGATETRAIN_ZEALOT, pos, placement_step=1)
+        zealots_trained = False
+
+        if self.unit_index(UnitTypeId.WARPGATE, ready=True).exists and self.can_afford(UnitTypeId.ZEALOT) and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 1:
+            warpgates = self.unit_index(UnitTypeId.WARPGATE, ready=True)
+            await self.ability_cache.refresh(warpgates, AbilityId.WARPGATETRAIN_ZEALOT)
+            for warpgate in warpgates:
+                if self.ability_cache.available(warpgate, AbilityId.WARPGATETRAIN_ZEALOT):
+                    if not self.can_afford(UnitTypeId.ZEALOT):
+                        break
+                    placement = self.warp_spots.take()
                     if placement is None:
-                        logger.warning(f"Cannot warp in Zealot. Invalid placement location")
-                        return
+                        logger.warning("Cannot warp in Zealot. No free warp-in spot")
+                        break
                     warpgate.warp_in(UnitTypeId.ZEALOT, placement)
-                    await self.move_zealots_to_ramp()
+                    self.ability_cache.start_cooldown(warpgate.tag, AbilityId.WARPGATETRAIN_ZEALOT, WARP_IN_COOLDOWN[UnitTypeId.ZEALOT])
+                    zealots_trained = True
 
         # If we have a Gateway and can afford a Zealot, train one if warpgate is not researched
-        if self.structures(UnitTypeId.GATEWAY).ready.exists and self.can_afford(UnitTypeId.ZEALOT) and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 0:
-            for gateway in self.structures(UnitTypeId.GATEWAY).ready.idle:
+        if self.unit_index(UnitTypeId.GATEWAY, ready=True).exists and self.can_afford(UnitTypeId.ZEALOT) and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 0:
+            for gateway in self.unit_index(UnitTypeId.GATEWAY, ready=True, idle=True):
                 if gateway.is_idle:
                     gateway.train(UnitTypeId.ZEALOT)
-                    await self.move_zealots_to_ramp()
+                    zealots_trained = True
+
+        # Give the army its orders once per round of production, not once per zealot
+        if zealots_trained:
+            await self.move_zealots_to_ramp()
         
     # Manage Chrono Boost
     async def manage_chrono_boost(self):
@@ -282,12 +346,12 @@ class ZealotChargeBot(BotAI):
         # 1. If we have a nexus with chrono boost available
         # 2. If we arent researching charge, use it on the nexus (If we have enough supply (supply_buffer-2))
         # 3. If we are researching charge, use on twilight council (no need to check supply)
-        if self.structures(UnitTypeId.NEXUS).ready.exists:
+        if self.unit_index(UnitTypeId.NEXUS, ready=True).exists:
             
-            for nexus in self.structures(UnitTypeId.NEXUS).ready:
+            for nexus in self.unit_index(UnitTypeId.NEXUS, ready=True):
                 if nexus.energy >= 50:
-                    if self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.exists:
-                            tc = self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.first
+                    if self.unit_index(UnitTypeId.TWILIGHTCOUNCIL, ready=True).exists:
+                            tc = self.unit_index(UnitTypeId.TWILIGHTCOUNCIL, ready=True).first
                             if not tc.is_idle:
                                 logger.warning(f"Chrono Boosting Twilight Council")
                                 nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, tc)
@@ -303,126 +367,102 @@ class ZealotChargeBot(BotAI):
                 if self.can_afford(UnitTypeId.PROBE):
                     nexus.train(UnitTypeId.PROBE)
 
-    async def resaturate(self):
-        workers_that_have_been_reassigned = set()
-        total_workers_needed = sum(nexus.ideal_harvesters for nexus in self.townhalls)
-        total_workers_assigned = sum(len(workers) for workers in self.mineral_patch_to_list_of_workers.values())
-
-        if total_workers_assigned == total_workers_needed:
-            return  # Early exit if we're already perfectly saturated
+    async def rebalance_workers(self):
+        # Several nexus / probe events in the same frame only cause one rebalance
+        await self.resaturate()
 
-        # Calculate the worker distribution only once
-        nexus_worker_info = []
+    async def resaturate(self):
+        # Match all mineral workers to the patch slots of the finished nexuses, only workers that change patch get an order
+        start = time.perf_counter()
+        patches = []
         for nexus in self.townhalls:
             if nexus.build_progress < 0.9:  # Skip nexuses that aren't finished
                 continue
-            workers_on_this_nexus = sum(len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set()))
-                                        for mineral in self.mineral_field.closer_than(10, nexus.position))
-            nexus_worker_info.append({
-                "nexus": nexus,
-                "workers_needed": nexus.ideal_harvesters,
-                "workers_current": workers_on_this_nexus,
-                "oversaturated": workers_on_this_nexus > nexus.ideal_harvesters
-            })
-
-        # Sort based on saturation level
-        undersaturated_nexuses = sorted((info for info in nexus_worker_info if not info["oversaturated"]),
-                                        key=lambda x: x["workers_needed"] - x["workers_current"])
-        oversaturated_nexuses = sorted((info for info in nexus_worker_info if info["oversaturated"]),
-                                    key=lambda x: x["workers_current"] - x["workers_needed"], reverse=True)
-
-        # Rebalance workers from oversaturated to undersaturated nexuses
-        for over_info in oversaturated_nexuses:
-            for under_info in undersaturated_nexuses:
-                while over_info["workers_current"] > over_info["workers_needed"] and under_info["workers_current"] < under_info["workers_needed"]:
-                    # Find an available worker from the oversaturated nexus
-                    worker = next((w for w in self.workers if w.tag not in workers_that_have_been_reassigned and w.position.distance_to(over_info["nexus"].position) < 10), None)
-                    if worker:
-                        await self.assign_worker_to_another_nexus(worker)
-                        workers_that_have_been_reassigned.add(worker.tag)
-                        over_info["workers_current"] -= 1
-                        under_info["workers_current"] += 1
-                    else:
-                        break  # Break if no available worker is found in the oversaturated nexus
-
-        # Now, assign workers to minerals at undersaturated Nexuses
-        for under_info in undersaturated_nexuses:
-            while under_info["workers_current"] < under_info["workers_needed"]:
-                # Find an available worker
-                worker = next((w for w in self.workers if w.tag not in workers_that_have_been_reassigned), None)
-                if not worker:
-                    logger.warning(f"No available workers to assign to Nexus {under_info['nexus'].tag}")
-                    break  # No workers available to assign
-
-                # Find an unassigned mineral patch
-                minerals_near_nexus = self.mineral_field.closer_than(10, under_info['nexus'].position).sorted_by_distance_to(under_info['nexus'].position)
-                for mineral in minerals_near_nexus:
-                    if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set())) < 2:  # Assuming 2 workers per mineral patch is ideal
-                        # Assign the worker to the mineral patch
-                        self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                        self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-                        # command the worker to gather the mineral
-                        worker.gather(mineral)
-                        workers_that_have_been_reassigned.add(worker.tag)
-                        under_info["workers_current"] += 1
-                        break  # Break after assigning one worker
-
-                # If we didn't break, it means no unassigned mineral patch was found
-                if under_info["workers_current"] < under_info["workers_needed"]:
-                    logger.warning(f"No unassigned mineral patches near Nexus {under_info['nexus'].tag}")
-                    break  # No unassigned mineral patches to assign
-
-
-
-
+            self.register_base(nexus)
+            geometry = self.base_geometry.for_townhall(nexus)
+            if geometry is not None:
+                patches.extend((patch.tag, patch.position, patch.optimal_workers) for patch in geometry.patches)
+            else:
+                patches.extend(
+                    (mineral.tag, mineral.position, 2) for mineral in self.unit_index.tags_in(self.ledger.base_to_patches[nexus.tag])
+                )
+
+        mineral_workers = {
+            worker.tag: worker
+            for worker in self.workers
+            if (worker.tag in self.ledger or worker.is_idle) and worker.tag not in self.builders and worker.tag not in self.scouts
+            and worker.tag not in self.gas
+        }
+        workers = [
+            MineralWorker(worker.tag, worker.position, self.ledger.patch_of(worker.tag)) for worker in mineral_workers.values()
+        ]
+        moves = rebalance(workers, patch_slots(patches))
+        if not moves:
+            return
 
-       
-    async def assign_worker_to_another_nexus(self, worker: Unit):
-        alternative_nexuses = [nexus for nexus in self.townhalls.sorted_by_distance_to(worker.position) if nexus.is_ready]  # filter for completed nexuses
+        for worker_tag, mineral_tag in moves.items():
+            self.ledger.assign(worker_tag, mineral_tag)
+            mineral = self.unit_index.get(mineral_tag)
+            if mineral:
+                mineral_workers[worker_tag].gather(mineral)
+        logger.info(f"Rebalanced {len(moves)} of {len(workers)} workers in {(time.perf_counter() - start) * 1000:.2f}ms")
 
-        # Log if there are no completed Nexuses available.
-        if not alternative_nexuses:
-            logger.warning(f"No completed Nexuses available to assign worker {worker.tag}.")
+    def register_base(self, nexus: Unit):
+        """Add the mineral patches around a nexus to the ledger, closest patches are preferred."""
+        if nexus.tag in self.ledger.base_to_patches:
             return
-
-        for alternative_nexus in reversed(alternative_nexuses):  # Reverse to get from furthest to closest
-            minerals_near_nexus = self.mineral_field.closer_than(10, alternative_nexus.position).sorted_by_distance_to(worker.position)
-            logger.warning(f"Assigning worker {worker.tag} to nexus {alternative_nexus.tag}")
-            for mineral in minerals_near_nexus:
-                
-                if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set())) < 2:
-                    self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                    self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-                    logger.warning(f"Worker {worker.tag} assigned to mineral patch {mineral.tag} at nexus {alternative_nexus.tag}")
-                    worker.gather(mineral)
-                    return  # Break out after assigning
+        geometry = self.base_geometry.for_townhall(nexus)
+        if geometry is not None:
+            self.ledger.add_base(nexus.tag, geometry.ranked())
+            return
+        minerals_near_nexus = self.mineral_field.closer_than(10, nexus.position)
+        self.ledger.add_base(nexus.tag, ((mineral.tag, mineral.distance_to(nexus)) for mineral in minerals_near_nexus))
 
     async def assign_initial_workers(self):
         for nexus in self.townhalls:  # loop through all nexuses
-            minerals_near_nexus = self.mineral_field.closer_than(10, nexus.position).sorted_by_distance_to(nexus.position)
-            for mineral in minerals_near_nexus:
-                workers = self.workers.tags_not_in(self.worker_to_mineral_patch_dict).sorted_by_distance_to(mineral)
+            self.register_base(nexus)
+            geometry = self.base_geometry.for_townhall(nexus)
+            if geometry is None:
+                continue
+            # Patches are already ordered closest first
+            for patch in geometry.patches:
+                workers = self.workers.tags_not_in(self.ledger.worker_to_patch).sorted_by_distance_to(patch.position)
                 for worker in workers:
                     # set worker.is_builder to False to allow it to be assigned to mine
                     worker.is_builder = False
-                    if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, [])) < 2:
-                        self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                        self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
+                    if self.ledger.count(patch.tag) < 2:
+                        self.ledger.assign(worker.tag, patch.tag)
 
     async def on_building_construction_complete(self, unit: Unit):
         # Log when a building is completed
         logger.warning(f"Building {unit.type_id} completed at {unit.position}.")
+        self.placement.add_power(unit)
+        self.opening.complete_structure(unit)
         if unit.type_id == UnitTypeId.NEXUS:
-            await self.resaturate()
-            # after resaturating, call the initial worker assignment function to recalibrate
-            await self.assign_initial_workers()
+            self.register_base(unit)
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+            self.scheduler.trigger("resaturate")
+
+    async def on_building_construction_started(self, unit: Unit):
+        self.placement.add_unit(unit)
+        self.opening.add_structure(unit)
 
     async def on_unit_destroyed(self, unit_tag):
         # Log when a unit is destroyed
         logger.warning(f"Unit {unit_tag} destroyed.")
-        unit = self._units_previous_map.get(unit_tag)
+        # drop the dead worker, mined out patch or destroyed nexus from the ledger
+        self.ledger.remove_unit(unit_tag)
+        self.gas.remove_unit(unit_tag)
+        self.drop_points.forget(unit_tag)
+        self.base_geometry.forget(unit_tag)
+        self.command_filter.forget(unit_tag)
+        self.ability_cache.forget(unit_tag)
+        self.placement.remove_unit(unit_tag)
+        self.opening.remove_structure(unit_tag)
+        unit = self._structures_previous_map.get(unit_tag)
         if unit and unit.type_id == UnitTypeId.NEXUS:
-            await self.resaturate()
+            self.drop_points.rebuild(self.townhalls.ready, self.mineral_field)
+            self.scheduler.trigger("resaturate")
         # if it was a scout, remove it from the scouts set
         if unit_tag in self.scouts:
             self.scouts.remove(unit_tag)
@@ -436,67 +476,75 @@ class ZealotChargeBot(BotAI):
         # if its a probe and we are at max probes, resaturate
         if unit.type_id == UnitTypeId.PROBE and self.workers.amount >= self.max_probes:
             logger.warning(f"Reached max probes. Resaturating...")
-            await self.resaturate()
-             # after resaturating, call the initial worker assignment function to recalibrate
-            await self.assign_initial_workers()
+            self.scheduler.trigger("resaturate")
+        elif unit.type_id == UnitTypeId.PROBE and self.townhalls:
+            await self.assign_worker_to_mineral_patch(unit)
 
 
     # Gas Manager
-    # If an assimilator is completed and ready, assign 3 workers to it.
+    # Keep gas_worker_target workers on the ready assimilators until Charge and Warpgate are done, then release all of them.
     async def manage_gas(self):
-        # check if we have any assimilators
-        if self.structures(UnitTypeId.ASSIMILATOR).ready.exists:
-            for assimilator in self.structures(UnitTypeId.ASSIMILATOR).ready:
-                if assimilator.assigned_harvesters < assimilator.ideal_harvesters:
-                    logger.warning(f"Assimilator {assimilator.tag} is not saturated (needs {assimilator.ideal_harvesters - assimilator.assigned_harvesters} more workers.)")
-                    workers = self.workers.closer_than(10, assimilator)
-        
-                    for worker in workers:
-                        logger.warning(f"Assigning worker {worker.tag} to assimilator {assimilator.tag}")
-                        # if worker is carrying resources, return them
-                        if worker.is_carrying_minerals or worker.is_carrying_vespene:
-                            logger.warning(f"Worker {worker.tag} is carrying resources. Returning resources before gathering gas")
-                            worker.return_resource(queue=False)
-                        # remove from builder set if it is in there
-                        if worker.tag in self.builders:
-                            self.builders.remove(worker.tag)
-                        # remove any orders / previous assignments
-                        worker.stop(queue=False)
-                        logger.warning(f"Worker {worker.tag} is gathering? {worker.is_gathering}")
-                        logger.warning(f"Worker {worker.tag} is carrying minerals? {worker.is_carrying_minerals}")
-                        # is the geyser valid?
-                        logger.warning(f"Assimilator {assimilator.tag} is valid? {assimilator.is_vespene_geyser}")
-                        worker.gather(assimilator)
-                        self.workers_mining_vespene.add(worker.tag)
-                        break
-                # else if over saturated, remove workers
-                if assimilator.assigned_harvesters > assimilator.ideal_harvesters:
-                    logger.error("Assimilator is over saturated. Removing workers...")
-                    workers = self.workers.closer_than(10, assimilator)
-
-                    num_workers_to_remove = assimilator.assigned_harvesters - assimilator.ideal_harvesters
-                    logger.error(f"Number of workers to remove: {num_workers_to_remove}. TODO: add code to remove these workers.")
-                    #TODO : Remove workers from the assimilator
-                    for worker in workers:
-                        if worker.tag in self.workers_mining_vespene:
-                            self.workers_mining_vespene.remove(worker.tag)
-                        worker.stop(queue=False)
-                        worker.gather(self.mineral_field.closest_to(worker.position))
-                        await self.assign_worker_to_mineral_patch(worker)
-                        break
-                # if charge and warpgate are done, stop mining gas
-                if self.already_pending_upgrade(UpgradeId.CHARGE) == 1 and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 1:
-                    logger.warning(f"Charge and Warpgate are done. Removing workers from gas...")
-                    workers = self.workers.closer_than(10, assimilator)
-
-                    for worker in workers:
-                        if worker.tag in self.workers_mining_vespene:
-                            self.workers_mining_vespene.remove(worker.tag)
-                        worker.stop(queue=False)
-                        worker.gather(self.mineral_field.closest_to(worker.position))
-                        await self.assign_worker_to_mineral_patch(worker)
-                        break
-
+        gas_done = self.already_pending_upgrade(UpgradeId.CHARGE) == 1 and self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH) == 1
+        target = 0 if gas_done else self.gas_worker_target
+        assimilators = {
+            assimilator.tag: assimilator
+            for assimilator in self.unit_index(UnitTypeId.ASSIMILATOR, ready=True)
+            if assimilator.vespene_contents > 0
+        }
+        if not assimilators and not self.gas:
+            return
+        if gas_done and self.gas:
+            for assimilator_tag in assimilators:
+                self.telemetry.info(EventKind.GAS_DONE, assimilator_tag)
+
+        candidates = [
+            GasCandidate(worker.tag, worker.position)
+            for worker in self.workers
+            if worker.tag in self.ledger and not worker.is_carrying_resource and worker.tag not in self.builders and worker.tag not in self.scouts
+        ]
+        sent, released = self.gas.plan(
+            [Assimilator(a.tag, a.position, min(a.ideal_harvesters, WORKERS_PER_ASSIMILATOR)) for a in assimilators.values()],
+            candidates,
+            target,
+        )
+
+        for assimilator in assimilators.values():
+            if assimilator.assigned_harvesters > assimilator.ideal_harvesters:
+                self.telemetry.warning(EventKind.GAS_OVERSATURATED, assimilator.tag, a=assimilator.assigned_harvesters - assimilator.ideal_harvesters)
+            missing = min(assimilator.ideal_harvesters, max(target, 0)) - len(self.gas.roster(assimilator.tag))
+            if missing > 0:
+                # Not enough free mineral workers this time
+                self.telemetry.info(EventKind.GAS_UNDERSATURATED, assimilator.tag, a=missing)
+            target -= len(self.gas.roster(assimilator.tag))
+
+        for worker_tag, assimilator_tag in sent:
+            worker = self.unit_index.get(worker_tag)
+            self.telemetry.info(EventKind.WORKER_TO_GAS, worker_tag, assimilator_tag)
+            self.ledger.unassign(worker_tag)
+            worker.gather(assimilators[assimilator_tag])
+
+        for worker_tag, assimilator_tag in released:
+            worker = self.unit_index.get(worker_tag)
+            if worker is None:
+                continue
+            self.telemetry.info(EventKind.WORKER_FROM_GAS, worker_tag, assimilator_tag)
+            await self.assign_worker_to_mineral_patch(worker)
+            mineral = self.unit_index.get(self.ledger.patch_of(worker_tag))
+            if worker.is_carrying_vespene:
+                # Drop the gas first, then walk to the patch
+                worker.return_resource()
+                if mineral:
+                    worker.gather(mineral, queue=True)
+            elif mineral:
+                worker.gather(mineral)
+
+        # Roster workers that lost their order (e.g. after building something) go back to their assimilator
+        for assimilator_tag, roster in self.gas.rosters.items():
+            for worker_tag in roster:
+                worker = self.unit_index.get(worker_tag)
+                # The index also holds structures and resources, only own probes are sent
+                if worker and worker.is_mine and worker.type_id == UnitTypeId.PROBE and worker.is_idle:
+                    worker.gather(assimilators[assimilator_tag])
 
     async def assign_worker_to_mineral_patch(self, worker: Unit):
         """Assign a worker to a mineral patch."""
@@ -504,74 +552,69 @@ class ZealotChargeBot(BotAI):
         if worker.orders:
             worker.stop(queue=True)
 
-        logger.info(f"Assigning worker {worker.tag} to mineral patch")
-        # Populate the list of minerals sorted by distance if it's empty
-        if not self.minerals_sorted_by_distance:
-            print("Sorting minerals by distance")
-            self.minerals_sorted_by_distance = self.mineral_field.sorted_by_distance_to(self.townhalls.closest_to(worker))
-        
-        closest_nexus = self.townhalls.closest_to(worker)
-        minerals_near_nexus = self.mineral_field.closer_than(10, closest_nexus.position).sorted_by_distance_to(worker.position)
-        
         # Remove the worker from any other mineral patch it might be assigned to
-        for patch, workers in self.mineral_patch_to_list_of_workers.items():
-            if worker.tag in workers:
-                workers.remove(worker.tag)
-
-        # Try to assign optimally first
-        for mineral in minerals_near_nexus:
-            current_workers = self.mineral_patch_to_list_of_workers.get(mineral.tag, set())
-
-            if len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set())) < 2:
-                logger.success(f"Number of workers assigned to mineral patch {mineral.tag}: {len(self.mineral_patch_to_list_of_workers.get(mineral.tag, set()))}. (Under 2 workers, Trying to mine optimally...)")
-                self.mineral_patch_to_list_of_workers.setdefault(mineral.tag, set()).add(worker.tag)
-                self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-                return
+        self.ledger.unassign(worker.tag)
+
+        # Try the closest nexus first, then the others from closest to furthest
+        nexuses = self.townhalls.sorted_by_distance_to(worker)
+        for nexus in nexuses:
+            self.register_base(nexus)
+            mineral_tag = self.ledger.least_saturated_patch(nexus.tag)
+            if mineral_tag is None:
+                continue
+            current_workers = self.ledger.count(mineral_tag)
 
-            # If the mineral is over-saturated, try and assign to the next mineral
-            if len(current_workers) >= 3:
-                logger.error(f"Mineral patch {mineral.tag} is over-saturated. Skipping... (There are already {len(current_workers)} workers assigned to it))")
+            # If the least saturated mineral is over-saturated, try the next nexus
+            if current_workers >= 3:
+                self.telemetry.debug(EventKind.WORKER_ASSIGN_SATURATED, worker.tag, nexus.tag, a=current_workers)
                 continue
-            
-            current_workers.add(worker.tag)
-            self.mineral_patch_to_list_of_workers[mineral.tag] = current_workers
-            self.worker_to_mineral_patch_dict[worker.tag] = mineral.tag
-            # Add worker to the mineral patch
-            logger.success(f"Worker {worker.tag} assigned to mineral patch {mineral.tag} (There are now {len(current_workers)} workers assigned to it))")
+
+            self.ledger.assign(worker.tag, mineral_tag)
+            self.telemetry.info(EventKind.WORKER_ASSIGNED, worker.tag, mineral_tag, a=current_workers + 1)
             return
-                
-        # If everything is saturated, assign to the closest mineral for sub-optimal mining
-        closest_mineral = self.minerals_sorted_by_distance[0]
-        self.mineral_patch_to_list_of_workers.setdefault(closest_mineral.tag, set()).add(worker.tag)
-        self.worker_to_mineral_patch_dict[worker.tag] = closest_mineral.tag
 
-        logger.warning(f"Worker {worker.tag} assigned to mineral patch {closest_mineral.tag}")
-        logger.info(f"Is the worker mining? {worker.is_gathering}")
-        # log worker orders
-        logger.warning(f"Worker {worker.tag} orders: {worker.orders}")
+        # If everything is saturated, assign to the least saturated mineral of the closest nexus for sub-optimal mining
+        if not nexuses:
+            return
+        closest_mineral_tag = self.ledger.least_saturated_patch(nexuses.first.tag)
+        if closest_mineral_tag is None:
+            return
+        self.ledger.assign(worker.tag, closest_mineral_tag)
+        self.telemetry.warning(EventKind.WORKER_ASSIGNED_FALLBACK, worker.tag, closest_mineral_tag, a=self.ledger.count(closest_mineral_tag))
 
     # Manage mineral workers: Optimized mining to avoid deceleration
     async def manage_worker_task(self):
         # Handle worker to mineral/gas assignments
-        minerals: Dict[int, Unit] = {mineral.tag: mineral for mineral in self.mineral_field}
+        # Workers handled by the batched micro, with their patch, drop point and base saturation
+        batch_workers, batch_minerals, batch_drop_points, batch_oversaturated = [], [], [], []
 
         for worker in self.workers:
-            if worker.tag in self.builders or worker.tag in self.workers_mining_vespene:
+            if worker.tag in self.builders or worker.tag in self.gas:
                 continue  # Don't interfere with builders or vespeen workers
 
             if not self.townhalls:
                 logger.error("All townhalls died - can't return resources")
                 break
 
-            if worker.tag in self.worker_to_mineral_patch_dict:
-                mineral_tag = self.worker_to_mineral_patch_dict[worker.tag]
-                mineral = minerals.get(mineral_tag, None)
+            if worker.tag in self.ledger:
+                mineral_tag = self.ledger.patch_of(worker.tag)
+                mineral = self.unit_index.get(mineral_tag)
             else:
                 await self.assign_worker_to_mineral_patch(worker)
-                mineral_tag = self.worker_to_mineral_patch_dict.get(worker.tag, None)
-                mineral = minerals.get(mineral_tag, None)
-
-            if not worker.is_carrying_minerals and not worker.is_carrying_vespene and worker.tag not in self.workers_mining_vespene:
+                mineral_tag = self.ledger.patch_of(worker.tag)
+                mineral = self.unit_index.get(mineral_tag)
+
+            if self.batched_worker_micro and mineral:
+                drop_point = self.drop_points.get(mineral_tag)
+                th = self.unit_index.get(drop_point.townhall_tag) if drop_point else None
+                if th:
+                    batch_workers.append(worker)
+                    batch_minerals.append(mineral)
+                    batch_drop_points.append(drop_point.position)
+                    batch_oversaturated.append(th.assigned_harvesters >= th.ideal_harvesters)
+                    continue
+
+            if not worker.is_carrying_minerals and not worker.is_carrying_vespene and worker.tag not in self.gas:
                 if mineral and (not worker.is_gathering or worker.order_target != mineral.tag):
                     worker.gather(mineral)
 
@@ -580,12 +623,18 @@ class ZealotChargeBot(BotAI):
                     if not worker.is_gathering or worker.order_target != mineral.tag:
                         worker.gather(mineral)
 
-                th = self.townhalls.closest_to(worker)
+                # Look up the nexus and the point just in front of it for this patch
+                drop_point = self.drop_points.get(mineral_tag)
+                th = self.unit_index.get(drop_point.townhall_tag) if drop_point else None
+                if th:
+                    pos: Point2 = drop_point.position
+                else:
+                    # Patch is not cached (e.g. nexus not finished yet), calculate the point just in front of the Nexus
+                    th = self.townhalls.closest_to(worker)
+                    pos: Point2 = th.position.towards(worker.position, th.radius + self.townhall_distance_threshold)
 
                 # if the base is not oversaturated,
                 if th.assigned_harvesters < th.ideal_harvesters:
-                    # Calculate the point just in front of the Nexus
-                    pos: Point2 = th.position.towards(worker.position, th.radius + self.townhall_distance_threshold)
 
                     # If the worker is further away from that point, move it to that point
                     if worker.distance_to(pos) > self.townhall_distance_threshold:
@@ -604,18 +653,25 @@ class ZealotChargeBot(BotAI):
                     else:
                         await self.assign_worker_to_mineral_patch(worker)
 
+        self.stacking_micro.run(batch_workers, batch_minerals, batch_drop_points, batch_oversaturated)
+
     # Check for idle workers (not gathering minerals or gas and not building anything)
     async def check_for_idle_workers(self):
         for worker in self.workers.idle:
+            if worker.tag in self.gas:
+                continue  # manage_gas sends idle gas workers back to their assimilator
             logger.warning(f"Worker {worker.tag} is idle")
             worker.stop(queue=True)
-            if worker.tag not in self.worker_to_mineral_patch_dict:
+            if worker.tag not in self.ledger:
                 logger.warning(f"Worker {worker.tag} is not assigned to a mineral patch. Assigning...")
                 await self.assign_worker_to_mineral_patch(worker)
             else:
-                logger.warning(f"Idle Worker {worker.tag} is assigned to mineral patch {self.worker_to_mineral_patch_dict[worker.tag]}. Sending to mine...")
-                mineral_tag = self.worker_to_mineral_patch_dict[worker.tag]
-                mineral = self.mineral_field.find_by_tag(mineral_tag)
+                logger.warning(f"Idle Worker {worker.tag} is assigned to mineral patch {self.ledger.patch_of(worker.tag)}. Sending to mine...")
+                mineral_tag = self.ledger.patch_of(worker.tag)
+                mineral = self.unit_index.get(mineral_tag)
+                if mineral is None:
+                    logger.warning(f"No mineral patch found with tag {mineral_tag} for idle worker {worker.tag}. Skipping...")
+                    continue
                 worker.gather(mineral, queue=True)
             # if its a builder, remove it from the builders set
             if worker.tag in self.builders:
@@ -624,81 +680,67 @@ class ZealotChargeBot(BotAI):
                 # send it to mine
                 await self.assign_worker_to_mineral_patch(worker)
         # Check for builders that arent building anything
-        for worker in self.workers.tags_in(self.builders):
+        for worker in self.unit_index.tags_in(self.builders):
             if not worker.orders and worker.tag in self.builders:
                 # log any orders that the worker has
                 logger.warning(f"No orders. Orders: {worker.orders} Is Idle? {worker.is_idle}")
                 self.builders.remove(worker.tag)
 
+    async def build_structure(self, building: UnitTypeId, near: Union[Point2, Unit], worker: Unit) -> bool:
+        """Build at the nearest spot the local placement grid finds, the server only confirms it."""
+        if not self.can_afford(building):
+            return False
+        position = await self.placement.find_placement(building, near)
+        if position is None:
+            logger.warning(f"No placement found for {building} near {near}")
+            return False
+        worker.build(building, position)
+        self.placement.reserve(building, position)
+        return True
+
     # Supply Manager
     async def build_pylon(self):
-        # Check if there's enough supply or a pylon is already pending
-        if self.supply_left >= 5 or self.already_pending(UnitTypeId.PYLON):
-            return
-
-        # Check for available nexuses
+        # Pylons for the supply production will need by the time they finish, several at once if needed
         if not self.townhalls.ready.exists:
             logger.warning("No nexuses found. Skipping building pylon...")
             return
+        self.timeline.refresh(self)
+        needed = self.supply_planner.pylons_needed(self, self.timeline.mineral_rate, self.max_probes)
+        if needed <= 0:
+            return
 
-        # Select the nexus to build near
-        nexus = self.townhalls.ready.sorted_by_distance_to(self.enemy_start_locations[0]).first
-
-        # Select a worker from builders or get a new one
-        worker = None
-        if self.builders:
-            worker_tag = random.choice(list(self.builders))
-            worker = self.workers.find_by_tag(worker_tag)
-            if not worker:
-                logger.info("Selected builder not found in the worker pool. Selecting a new worker.")
-            elif worker.orders and worker.orders[0].ability.id not in [AbilityId.MOVE, AbilityId.HARVEST_GATHER, AbilityId.HARVEST_RETURN]:
-                logger.info(f"Selected builder {worker.tag} is busy. Selecting a new worker.")
-                worker = None
-
-        if not worker:
-            worker = self.select_build_worker(nexus.position)
-            if not worker:
-                logger.warning("No available workers to build. Skipping building pylon...")
-                return
-
-        # Queue resource return if the worker is carrying resources
-        if worker.is_carrying_resource:
-            worker.return_resource(queue=True)
-
-        # Build the pylon
-        build_position = nexus.position.towards(self.game_info.map_center, 5)
-        # make sure the build position is not near another pylon or nexus
-        
-        await self.build(UnitTypeId.PYLON, near=build_position, build_worker=worker, placement_step=1)
-
-        # Add worker to builders to prevent reassignment
-        self.builders.add(worker.tag)
+        # Spots in front of the nexuses, the one closest to the enemy first
+        nexuses = self.townhalls.ready.sorted_by_distance_to(self.enemy_start_locations[0])
+        near = [nexus.position.towards(self.game_info.map_center, 5) for nexus in nexuses]
+        workers = self.workers.filter(
+            lambda worker: worker.tag in self.ledger and worker.tag not in self.scouts and (worker.is_gathering or worker.is_idle)
+        )
+        for worker in await self.supply_planner.build_pylons(self, self.placement, near, needed, workers):
+            # Add worker to builders to prevent reassignment
+            self.builders.add(worker.tag)
+            logger.info(f"Worker {worker.tag} builds one of {needed} pylons needed")
 
 
     async def build_order(self):
         if not self.townhalls:  # No Nexus means probably the end of the game
             return
         
-        # Get worker to build structures if there are no builders
-        if self.builders:
-            # get a builder from the set of builders
-            worker = self.workers.find_by_tag(random.choice(list(self.builders)))
-            if not worker:
-                logger.warning("No builders currently (in the builders set)")
-                return
-        else:
+        # A builder still holding a build order would drop it for the new one, so use a free builder or a new worker
+        worker = None
+        for tag in self.builders:
+            builder = self.unit_index.get(tag)
+            if builder is not None and not self.opening.builder_busy(builder, self.state.game_loop):
+                worker = builder
+                break
+        if worker is None:
             worker = self.select_build_worker(self.townhalls.first.position)
-            # if worker is holding resources, return them
-            if worker:
-                if worker.is_carrying_minerals or worker.is_carrying_vespene:
-                    worker.return_resource(queue=False)
-            elif worker:
-                # add to builders to prevent interference with worker to mineral assignments
-                self.builders.add(worker.tag)
-            else:
-                logger.warning(f"No workers available to build (in the select_build_worker function)")
+            if not worker or self.opening.builder_busy(worker, self.state.game_loop):
+                logger.warning(f"No free workers available to build")
                 return
-        
+            # if worker is holding resources, return them
+            if worker.is_carrying_minerals or worker.is_carrying_vespene:
+                worker.return_resource(queue=False)
+
         if worker and worker.orders and worker.orders[0].ability.id not in [AbilityId.MOVE, AbilityId.HARVEST_GATHER, AbilityId.HARVEST_RETURN]:
             # return resources before building if the worker is carrying resources
             if worker.is_carrying_minerals or worker.is_carrying_vespene:
@@ -718,76 +760,85 @@ class ZealotChargeBot(BotAI):
             if self.can_afford(UnitTypeId.PROBE) and self.workers.amount < self.max_probes:
                 nexus.train(UnitTypeId.PROBE)
 
-        # If no Pylon, build one
-        if not self.structures(UnitTypeId.PYLON) and self.can_afford(UnitTypeId.PYLON):
-            await self.build(UnitTypeId.PYLON, near=self.start_location.towards(self.game_info.map_center, 5), build_worker=worker)
-        
-        # If no Gateway and we have a Pylon, build Gateway
-        elif not self.already_pending(UnitTypeId.GATEWAY) and self.can_afford(UnitTypeId.GATEWAY) and self.structures(UnitTypeId.PYLON).ready.exists and not self.structures(UnitTypeId.GATEWAY).ready.exists:
-            pylon = self.structures(UnitTypeId.PYLON).ready.random
-            await self.build(UnitTypeId.GATEWAY, near=pylon, build_worker=worker)
-
-        # If no Cybernetics Core and we have a Gateway, build Cybernetics Core
-        elif not self.structures(UnitTypeId.CYBERNETICSCORE) and self.structures(UnitTypeId.GATEWAY).ready.exists and self.can_afford(UnitTypeId.CYBERNETICSCORE) and not self.already_pending(UnitTypeId.CYBERNETICSCORE):
-            pylon = self.structures(UnitTypeId.PYLON).ready.random
-            await self.build(UnitTypeId.CYBERNETICSCORE, near=pylon, build_worker=worker)
-
-        # TODO: Expand to a new base if we have enough minerals and probes
-        # If we have enough minerals and probes, expand to a new base
-        if self.can_afford(UnitTypeId.NEXUS) and self.townhalls.amount < self.max_nexus and self.structure_type_build_progress(UnitTypeId.ASSIMILATOR) > 0.1: # and self.workers.amount > self.townhalls.amount * 16 #Add this for less greed (expand later)
+        # Opening from build_orders/zealot_charge.json, the engine only looks at its next pending step
+        step = self.opening.next_step(self)
+        if step is not None:
+            await self.execute_build_step(step, worker)
+        if not self.opening.done:
+            return
+
+        # After the opening, expand up to max_nexus
+        if self.can_afford(UnitTypeId.NEXUS) and self.townhalls.amount < self.max_nexus and not self.already_pending(UnitTypeId.NEXUS):
             # use our worker to build a nexus at the next expansion location
-            # find next expansion location
             next_expansion_location = await self.get_next_expansion()
             logger.warning(f"Next expansion location: {next_expansion_location}")
-            logger.warning(f"Worker status before building: {worker.orders}")
-            # build nexus
-            worker.stop(queue=False)
-            worker.build(UnitTypeId.NEXUS, next_expansion_location)
-            logger.warning(f"Worker status after building: {worker.orders}")
-   
-        # If no Assimilators, build them
-        if self.already_pending(UnitTypeId.ASSIMILATOR) < self.max_assimilators and not self.assimilator_started and self.structure_type_build_progress(UnitTypeId.CYBERNETICSCORE) > 0.3:
-
-            for vg in self.vespene_geyser.closer_than(15, self.start_location):
-                if not self.can_afford(UnitTypeId.ASSIMILATOR):
-                    break
-                if worker is None:
-                    break
-                worker.stop(queue=False)
-                worker.build(UnitTypeId.ASSIMILATOR, vg)
-                logger.warning(f"Worker {worker.tag} is building an assimilator at {vg.position}")
-
-                # check assimilator construction progress
-                if self.structure_type_build_progress(UnitTypeId.ASSIMILATOR) > 0:
-                    logger.info(f"Assimilator construction progress: {self.structure_type_build_progress(UnitTypeId.ASSIMILATOR)} Setting to started...")
-                    self.assimilator_started = True
-                # gather minerals after building
-                await self.assign_worker_to_mineral_patch(worker)
-
-        # Once Cybernetics Core is done, if no Twilight Council, build it
-        if not self.twilight_started and self.structures(UnitTypeId.CYBERNETICSCORE).ready.exists and self.can_afford(UnitTypeId.TWILIGHTCOUNCIL):
-            pylon = self.structures(UnitTypeId.PYLON).ready.random
-            await self.build(UnitTypeId.TWILIGHTCOUNCIL, near=pylon, build_worker=worker)
-            self.twilight_started = True
-            await self.assign_worker_to_mineral_patch(worker)
-            
-        # If Twilight Council is ready, research Zealot Charge
-        if self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.exists:
-            tc = self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.first
-            if self.can_afford(UpgradeId.CHARGE) and not self.already_pending_upgrade(UpgradeId.CHARGE):
-                tc.research(UpgradeId.CHARGE)
-
-        # If Charge is researching, research warp gate when possible
-        if self.structures(UnitTypeId.TWILIGHTCOUNCIL).ready.exists and self.already_pending_upgrade(UpgradeId.CHARGE):
-            cc = self.structures(UnitTypeId.CYBERNETICSCORE).ready.first
-            if self.can_afford(UpgradeId.WARPGATERESEARCH) and not self.already_pending_upgrade(UpgradeId.WARPGATERESEARCH):
-                cc.research(UpgradeId.WARPGATERESEARCH)
+            if next_expansion_location:
+                worker.build(UnitTypeId.NEXUS, next_expansion_location)
 
         # Once on max_bases build gateways to max_gateways
-        if self.townhalls.amount >= self.max_nexus and self.structures(UnitTypeId.GATEWAY).amount <= self.max_gateways and self.can_afford(UnitTypeId.GATEWAY):
+        if self.townhalls.amount >= self.max_nexus and self.unit_index(UnitTypeId.GATEWAY).amount <= self.max_gateways and self.can_afford(UnitTypeId.GATEWAY):
             # find a position near a pylon thats not in the mineral line that a gateway can be built
-            pylon = self.structures(UnitTypeId.PYLON).ready.random
-            await self.build(UnitTypeId.GATEWAY, near=pylon, build_worker=worker)
+            pylon = self.unit_index(UnitTypeId.PYLON, ready=True).random
+            await self.build_structure(UnitTypeId.GATEWAY, pylon, worker)
+
+    async def execute_build_step(self, step: BuildStep, worker: Unit):
+        """Start a build order step and tell the engine, which then moves on to the next one."""
+        if not self.can_afford(step.target):
+            await self.prepare_build_step(step, worker)
+            return
+        if step.is_research:
+            for structure in self.unit_index(step.researched_from, ready=True, idle=True):
+                structure.research(step.target)
+                self.opening.issued(step, self.state.game_loop)
+                return
+            return
+
+        # The builder may already be on its way to the spot picked in prepare_build_step
+        if self.prepared_step is not None and self.prepared_step[0] == step:
+            position = self.prepared_step[1]
+        else:
+            position = await self.build_step_position(step)
+        if position is None:
+            return
+        if step.target == UnitTypeId.NEXUS:
+            worker.build(UnitTypeId.NEXUS, position)
+        elif step.target == UnitTypeId.ASSIMILATOR:
+            geyser = self.vespene_geyser.closest_to(position)
+            worker.build(UnitTypeId.ASSIMILATOR, geyser)
+        elif not await self.build_structure(step.target, position, worker):
+            return
+        logger.info(f"Build order: {step.target} ({step.count}) started by worker {worker.tag}")
+        self.opening.issued(step, self.state.game_loop, worker.tag)
+        self.prepared_step = None
+
+    async def prepare_build_step(self, step: BuildStep, worker: Unit):
+        """Walk the builder to the spot of the next step so it arrives when the bank covers the cost."""
+        if step.is_research:
+            return
+        if self.prepared_step is None or self.prepared_step[0] != step:
+            self.prepared_step = (step, await self.build_step_position(step))
+        position = self.prepared_step[1]
+        if position is None:
+            return
+        self.timeline.refresh(self)
+        cost = self.calculate_cost(step.target)
+        affordable_at = self.timeline.affordable_at([Cost(cost.minerals, cost.vespene)])[0]
+        distance = worker.distance_to(position)
+        if affordable_at is None or distance < 3:
+            return
+        if affordable_at - self.state.game_loop <= distance / WORKER_SPEED:
+            worker.move(position)
+
+    async def build_step_position(self, step: BuildStep) -> Optional[Point2]:
+        if step.target == UnitTypeId.NEXUS:
+            return await self.get_next_expansion()
+        if step.target == UnitTypeId.ASSIMILATOR:
+            geyser = free_geyser(self)
+            return geyser.position if geyser else None
+        if step.target == UnitTypeId.PYLON:
+            return await self.placement.find_placement(UnitTypeId.PYLON, self.start_location.towards(self.game_info.map_center, 5))
+        pylons = self.unit_index(UnitTypeId.PYLON, ready=True)
+        return await self.placement.find_placement(step.target, pylons.random) if pylons else None
 
     
 def main():